@@ -20,15 +20,73 @@ def create_app(config_name='default'):
     # 加载配置
     app.config.from_object(config[config_name])
     
-    # 初始化扩展
+    # 初始化扩展（SQLite 连接参数须在首次连接前加载）
+    from app import pragmas
+    pragmas.init_app(app)
     db.init_app(app)
     
+    # 请求计时与运行指标（先于其他钩子注册，计时覆盖整个请求）
+    from app import metrics
+    metrics.init_app(app)
+    
+    # 加载爬虫限速策略、出站连接池及响应缓存配置
+    from app.ratelimit import scheduler
+    from app.http_client import client
+    from app.http_cache import response_cache
+    scheduler.init_app(app)
+    client.init_app(app)
+    response_cache.init_app(app)
+    
+    # HTML 解析后端
+    from app import parsing
+    parsing.init_app(app)
+    
+    # 任务进度存储
+    from app.progress import progress
+    progress.init_app(app)
+    
+    # 列表分页的总数缓存
+    from app import pagination
+    pagination.init_app(app)
+    
     # 注册蓝图/路由
     from app.views import main_bp
     app.register_blueprint(main_bp)
     
-    # 创建数据库表
+    # 后台任务队列（导入 tasks 以注册任务处理函数）及其写操作的串行写入线程
+    from app.jobs import queue
+    from app.writer import writer
+    from app import tasks
+    queue.init_app(app)
+    writer.init_app(app)
+    
+    # 关键词监控的定时调度
+    from app.monitor import monitors
+    monitors.init_app(app)
+    
+    # 周期维护（汇总压缩、采集数据清理），导入模块即注册其周期任务
+    from app.maintenance import maintenance
+    from app import rollup, retention
+    maintenance.init_app(app)
+    
+    # 创建数据库表，并为旧库补齐新增的列
+    # search_index、dedup 在导入时为 SQLite 连接注册 SQL 函数，须先于建表导入
+    from app import search_index, dedup
     with app.app_context():
         db.create_all()
+        from app.database import upgrade_schema
+        added = upgrade_schema()
+        # 旧库的正文列迁移到压缩存储的正文表
+        from app import content
+        content.migrate(log=app.logger.info)
+        content.create_schema()
+        # 旧库新增 url_hash 列时只回填不重复的链接，重复数据须执行 manage.py dedup 合并
+        for table in [table for table, column in added if column == 'url_hash']:
+            filled, groups = dedup.backfill(table, log=app.logger.info)
+            if groups:
+                app.logger.warning(f'[{table}] 存在 {groups} 组重复链接，请执行 python manage.py dedup --dry-run 查看后合并')
+        search_index.create_schema()
+        from app import rollup
+        rollup.create_schema()
     
     return app
@@ -0,0 +1,213 @@
+"""
+批量持久化模块 - 爬取/采集结果的批量写入
+按配置的批大小使用 executemany 插入，按 IN (...) 批量读取和更新，
+避免逐条 ORM 对象带来的大量往返；按规范化链接哈希 upsert，重复抓到的链接只更新不新增
+"""
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import case, func, insert, literal_column, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import db
+from app.dedup import url_hash
+from app.models import SearchResult, CollectedData, CollectedContent, ArticleData, ArticleContent
+
+
+def chunk_size(size=None):
+    """批大小：显式传入优先，否则读取 BULK_CHUNK_SIZE 配置"""
+    return size or current_app.config.get('BULK_CHUNK_SIZE', 500)
+
+
+def chunked(items, size):
+    """把列表按 size 切分"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def insert_chunks(model, rows, size=None, stmt=None):
+    """
+    分批插入，每批一条 executemany 语句；每批写入后产出累计写入行数（ON CONFLICT 跳过的行不计），
+    调用方可在此提交或更新进度
+    :param model: 模型类
+    :param rows: 字典列表，各行的键须一致
+    :param size: 批大小
+    :param stmt: 自定义 INSERT 语句（如带 ON CONFLICT 子句），默认普通插入
+    """
+    # render_nulls: 值为 None 的列也照常写入，各行键一致时每批只生成一条语句
+    stmt = (stmt if stmt is not None else insert(model)).execution_options(render_nulls=True)
+    total = 0
+    for batch in chunked(rows, chunk_size(size)):
+        # 走连接执行（而不是 ORM 批量插入），结果带 rowcount
+        total += db.session.connection().execute(stmt, batch).rowcount
+        yield total
+
+
+def bulk_insert(model, rows, size=None, stmt=None):
+    """
+    批量插入（不提交）
+    :return: 写入行数（ON CONFLICT 跳过的行不计，更新的行计入）
+    """
+    total = 0
+    for total in insert_chunks(model, rows, size, stmt):
+        pass
+    return total
+
+
+def upsert_search_results():
+    """
+    search_results 的 upsert 语句：同一关键词下链接已存在时，更新爬取时间并记录新的来源引擎
+    """
+    stmt = sqlite_insert(SearchResult)
+    # 来源引擎集合中没有本次引擎时追加
+    merged = literal_column(
+        "CASE WHEN excluded.engine IS NULL OR instr(',' || coalesce(engines, engine, '') || ',', "
+        "',' || excluded.engine || ',') > 0 THEN coalesce(engines, engine) "
+        "ELSE coalesce(coalesce(engines, engine) || ',', '') || excluded.engine END"
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=['keyword', 'url_hash'],
+        set_={'crawl_time': stmt.excluded.crawl_time, 'engines': merged}
+    )
+
+
+def insert_collected():
+    """collected_data 的插入语句：同一批次内重复的链接直接跳过"""
+    return sqlite_insert(CollectedData).on_conflict_do_nothing(index_elements=['task_id', 'url_hash'])
+
+
+def upsert_articles():
+    """article_data 的 upsert 语句：链接已保存过时补齐封面，并刷新更新时间（正文见 copy_article_content）"""
+    stmt = sqlite_insert(ArticleData)
+    return stmt.on_conflict_do_update(
+        index_elements=['url_hash'],
+        set_={
+            'cover': func.coalesce(stmt.excluded.cover, ArticleData.cover),
+            'updated_at': stmt.excluded.updated_at,
+        }
+    )
+
+
+def copy_article_content(ids, article_ids=None):
+    """
+    把采集数据的正文复制为对应文章的正文，已有正文的覆盖（不提交）
+    直接复制压缩后的字节，不解压再压缩
+    :param ids: 采集数据ID列表，按链接哈希关联文章
+    :param article_ids: {采集数据ID: 文章ID}，没有链接（无法按哈希关联）的数据须直接给出对应文章
+    :return: 复制条数
+    """
+    source = (
+        select(ArticleData.id, CollectedContent.content)
+        .join(CollectedData, CollectedData.id == CollectedContent.data_id)
+        .join(ArticleData, ArticleData.url_hash == CollectedData.url_hash)
+        .where(CollectedContent.data_id.in_(ids), CollectedContent.content.isnot(None))
+    )
+    if article_ids:
+        source = source.union_all(
+            select(case(article_ids, value=CollectedContent.data_id), CollectedContent.content)
+            .where(CollectedContent.data_id.in_(list(article_ids)), CollectedContent.content.isnot(None))
+        )
+    stmt = sqlite_insert(ArticleContent).from_select(['article_id', 'content'], source)
+    stmt = stmt.on_conflict_do_update(index_elements=['article_id'], set_={'content': stmt.excluded.content})
+    return db.session.execute(stmt).rowcount
+
+
+def search_result_rows(keyword, results, analyzer):
+    """
+    把爬虫结果转换为 search_results 行，并批量做情感分析
+    :param keyword: 关键词
+    :param results: 爬虫返回的结果列表
+    :param analyzer: SentimentAnalyzer
+    :return: 字典列表
+    """
+    scores = analyzer.analyze_many([item['title'] + ' ' + item['abstract'] for item in results])
+    now = datetime.utcnow()
+    return [{
+        'keyword': keyword,
+        'title': item['title'],
+        'link': item['link'],
+        'abstract': item['abstract'],
+        'source': item['source'],
+        'engine': item['engine'],
+        'engines': item['engine'],
+        'sentiment': score['sentiment'],
+        'sentiment_score': score['score'],
+        'crawl_time': now,
+        'url_hash': url_hash(item['link'])
+    } for item, score in zip(results, scores)]
+
+
+def collected_rows(task_id, keyword, results, cover_of=None):
+    """
+    把爬虫结果转换为 collected_data 行
+    :param cover_of: 根据链接提取封面的函数
+    :return: 字典列表
+    """
+    return [{
+        'task_id': task_id,
+        'keyword': keyword,
+        'title': item.get('title', ''),
+        'link': item.get('link', ''),
+        'cover': cover_of(item.get('link', '')) if cover_of else None,
+        'source': item.get('source', ''),
+        'abstract': item.get('abstract', ''),
+        'deep_crawled': False,
+        'is_saved': False,
+        'url_hash': url_hash(item.get('link', ''))
+    } for item in results]
+
+
+# 从采集表复制到文章表的字段（正文在正文表之间复制）
+_ARTICLE_FIELDS = ('keyword', 'title', 'link', 'cover', 'source', 'abstract', 'publish_time', 'author')
+
+
+def save_collected(ids, analyzer, size=None):
+    """
+    把选中的采集数据保存为正式文章（不提交）
+    每批先用一条 UPDATE ... RETURNING 把未保存的行标记为已保存（并发保存同一批数据时不会重复写入），
+    再用一条 IN 查询取出这些行，一条 executemany 写入文章表（链接已保存过的只补齐封面），最后复制正文；
+    没有链接的数据无法按链接哈希关联，逐条插入并用 RETURNING 取得文章ID
+    :param ids: 采集数据ID列表
+    :param analyzer: SentimentAnalyzer
+    :param size: 批大小
+    :return: 保存条数
+    """
+    columns = [getattr(CollectedData, name) for name in _ARTICLE_FIELDS]
+    saved = 0
+    for batch in chunked(list(dict.fromkeys(ids)), chunk_size(size)):
+        claimed = db.session.execute(
+            update(CollectedData)
+            .where(CollectedData.id.in_(batch), CollectedData.is_saved.is_not(True))
+            .values(is_saved=True)
+            .returning(CollectedData.id)
+        ).scalars().all()
+        if not claimed:
+            continue
+
+        records = db.session.execute(
+            select(CollectedData.id, *columns).where(CollectedData.id.in_(claimed)).order_by(CollectedData.id)
+        ).mappings().all()
+
+        scores = analyzer.analyze_many([(r['title'] or '') + ' ' + (r['abstract'] or '') for r in records])
+        rows = []
+        unlinked = {}
+        for record, score in zip(records, scores):
+            row = dict(record)
+            data_id = row.pop('id')
+            row['sentiment'] = score['sentiment']
+            row['sentiment_score'] = score['score']
+            row['updated_at'] = datetime.utcnow()
+            row['url_hash'] = url_hash(record['link'])
+            if row['url_hash'] is None:
+                unlinked[data_id] = row
+            else:
+                rows.append(row)
+        saved += bulk_insert(ArticleData, rows, size, upsert_articles())
+
+        article_ids = {}
+        for data_id, row in unlinked.items():
+            article_ids[data_id] = db.session.execute(
+                insert(ArticleData).values(**row).returning(ArticleData.id)
+            ).scalar_one()
+        saved += len(article_ids)
+        copy_article_content(claimed, article_ids)
+
+    return saved
@@ -0,0 +1,132 @@
+"""
+正文存储模块 - 大文本列的压缩类型与正文分表
+正文 (content) 存放在单独的一对一表 collected_content / article_content 中，列表查询只读主表，
+访问 CollectedData.content / ArticleData.content 时才加载；正文以 CompressedText 存储：
+以 BLOB 保存，超过阈值的文本 zlib 压缩、较短的不压缩，首字节标记编码方式。
+SQL 中可用 zdecompress() 读取（供全文索引触发器使用）
+"""
+import sqlite3
+import zlib
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.types import LargeBinary, TypeDecorator
+from app import db
+
+# 编码标记
+RAW = b'\x00'
+ZLIB = b'\x01'
+
+# 短于该字节数的文本不压缩
+COMPRESS_MIN_BYTES = 256
+COMPRESS_LEVEL = 6
+
+# 主表 -> (正文表, 外键列)
+CONTENT_TABLES = {
+    'collected_data': ('collected_content', 'data_id'),
+    'article_data': ('article_content', 'article_id'),
+}
+
+
+def compress_text(value):
+    """:return: 编码后的字节串，None 原样返回"""
+    if value is None:
+        return None
+    data = value.encode('utf-8')
+    if len(data) < COMPRESS_MIN_BYTES:
+        return RAW + data
+    return ZLIB + zlib.compress(data, COMPRESS_LEVEL)
+
+
+def decompress_text(value):
+    """
+    解码 compress_text 的结果
+    :return: 文本；None 原样返回，未编码的旧文本直接返回
+    """
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    if value[:1] == ZLIB:
+        return zlib.decompress(value[1:]).decode('utf-8')
+    return value[1:].decode('utf-8')
+
+
+class CompressedText(TypeDecorator):
+    """透明压缩的文本列"""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
+
+
+@event.listens_for(Engine, 'connect')
+def _register_functions(dbapi_connection, connection_record):
+    """为每个 SQLite 连接注册解压函数，供触发器和运维 SQL 调用"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function('zdecompress', 1, decompress_text, deterministic=True)
+
+
+def _cleanup_trigger_sql(table, content_table, key):
+    # 主表行被批量删除（去重、过期清理等直接执行的 SQL）时同步删除正文
+    return (
+        f'''CREATE TRIGGER IF NOT EXISTS {content_table}_cleanup AFTER DELETE ON {table} BEGIN
+            DELETE FROM {content_table} WHERE {key} = old.id;
+        END'''
+    )
+
+
+def create_schema():
+    """创建正文清理触发器"""
+    with db.engine.begin() as conn:
+        for table, (content_table, key) in CONTENT_TABLES.items():
+            conn.execute(text(_cleanup_trigger_sql(table, content_table, key)))
+
+
+def migrate(chunk_size=2000, log=None):
+    """
+    把旧库主表中的 content 列压缩后迁移到正文表，再删除该列
+    删除列前先删除引用它的全文索引触发器，之后按新定义重建（索引内容不变，无需重建索引）
+    :param chunk_size: 每批迁移的行数
+    :param log: 进度输出函数
+    :return: {表名: 迁移行数}，没有需要迁移的表时为空字典
+    """
+    from app import search_index
+
+    inspector = inspect(db.engine)
+    migrated = {}
+    for table, (content_table, key) in CONTENT_TABLES.items():
+        if 'content' not in {column['name'] for column in inspector.get_columns(table)}:
+            continue
+
+        content = db.metadata.tables[content_table]
+        last_id = 0
+        total = 0
+        while True:
+            with db.engine.begin() as conn:
+                rows = conn.execute(text(
+                    f'SELECT id, content FROM {table} WHERE id > :last AND content IS NOT NULL ORDER BY id LIMIT :n'
+                ), {'last': last_id, 'n': chunk_size}).all()
+                if not rows:
+                    break
+                conn.execute(content.insert().prefix_with('OR IGNORE'),
+                             [{key: row_id, 'content': value} for row_id, value in rows])
+            total += len(rows)
+            last_id = rows[-1][0]
+            if log:
+                log(f'[{table}] 已迁移正文 {total} 行')
+
+        with db.engine.begin() as conn:
+            indexed = table in search_index.FTS_TABLES
+            if indexed:
+                search_index.drop_triggers(conn, table)
+            conn.execute(text(f'ALTER TABLE {table} DROP COLUMN content'))
+            # 索引表已存在时立即按新定义重建触发器（之后的去重迁移等删除须同步索引）
+            if indexed and inspector.has_table(search_index.FTS_TABLES[table][0]):
+                search_index.create_triggers(conn, table)
+        migrated[table] = total
+        if log:
+            log(f'[{table}] 正文已迁移到 {content_table}，共 {total} 行（执行 VACUUM 后回收空间）')
+    return migrated
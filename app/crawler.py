@@ -1,18 +1,28 @@
 """
 舆情数据抓取模块 - 爬取搜索引擎结果
 """
-import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
-import time
-import random
 import re
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
 from urllib.parse import quote
+from app.http_client import fetch
+from app.http_cache import response_cache
+from app.dedup import url_hash
+from app.matcher import MultiPatternMatcher
+from app.parsing import make_soup
+
 
 class SearchCrawler:
     """搜索引擎爬虫"""
     
-    def __init__(self, custom_headers=None):
+    # 各搜索引擎的站点地址，可在构造时覆盖（如指向本地基准测试服务器）
+    BASE_URLS = {
+        'baidu': 'https://www.baidu.com',
+        'bing': 'https://cn.bing.com',
+    }
+    
+    def __init__(self, custom_headers=None, max_workers=4, base_urls=None, cache_max_age=None):
         # 默认请求头 - 模拟真实浏览器
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36 Edg/131.0.0.0',
@@ -34,8 +44,13 @@ class SearchCrawler:
         if custom_headers:
             self.headers.update(custom_headers)
         
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        # 并发抓取的线程数
+        self.max_workers = max_workers
+        
+        self.base_urls = dict(self.BASE_URLS, **(base_urls or {}))
+        
+        # 结果页缓存的新鲜期，None 使用配置值，0 表示每次都向搜索引擎重新验证
+        self.cache_max_age = cache_max_age
     
     def search_baidu(self, keyword, pages=1):
         """
@@ -44,54 +59,74 @@ class SearchCrawler:
         :param pages: 爬取页数
         :return: 搜索结果列表
         """
-        results = []
+        return self._run([[(self.fetch_baidu_page, keyword, page) for page in range(pages)]])
+    
+    def fetch_baidu_page(self, keyword, page):
+        """
+        爬取百度单页搜索结果
+        :param keyword: 搜索关键词
+        :param page: 页码（从0开始）
+        :return: 该页搜索结果列表
+        """
+        encoded_keyword = quote(keyword)
+        url = f"{self.base_urls['baidu']}/s?wd={encoded_keyword}&pn={page * 10}"
         
-        for page in range(pages):
-            encoded_keyword = quote(keyword)
-            url = f'https://www.baidu.com/s?wd={encoded_keyword}&pn={page * 10}'
+        try:
+            # 经全局调度器限速并复用共享连接池，避免被封
+            response = fetch(url, headers=self.headers, timeout=10, cache='baidu', cache_max_age=self.cache_max_age)
+            response.encoding = 'utf-8'
+            
+            if response.status_code == 200:
+                results = self.parse_baidu(response.text, keyword)
+                if not results:
+                    # 验证码页、空结果页不缓存
+                    response_cache.invalidate(url)
+                return results
             
+        except Exception as e:
+            print(f'爬取百度第{page+1}页失败: {e}')
+        
+        return []
+    
+    def parse_baidu(self, html, keyword):
+        """
+        解析百度搜索结果页
+        :param html: 页面HTML
+        :param keyword: 搜索关键词
+        :return: 搜索结果列表
+        """
+        results = []
+        # 只解析结果容器
+        soup = make_soup(html, only='baidu')
+        
+        # 解析搜索结果
+        items = soup.select('.result.c-container')
+        for item in items:
             try:
-                response = self.session.get(url, timeout=10)
-                response.encoding = 'utf-8'
+                # 标题
+                title_elem = item.select_one('h3 a')
+                title = title_elem.get_text(strip=True) if title_elem else ''
+                link = title_elem.get('href', '') if title_elem else ''
                 
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # 解析搜索结果
-                    items = soup.select('.result.c-container')
-                    for item in items:
-                        try:
-                            # 标题
-                            title_elem = item.select_one('h3 a')
-                            title = title_elem.get_text(strip=True) if title_elem else ''
-                            link = title_elem.get('href', '') if title_elem else ''
-                            
-                            # 摘要
-                            abstract_elem = item.select_one('.c-abstract') or item.select_one('.content-right_8Zs40')
-                            abstract = abstract_elem.get_text(strip=True) if abstract_elem else ''
-                            
-                            # 来源
-                            source_elem = item.select_one('.c-showurl') or item.select_one('.source_1Vdff')
-                            source = source_elem.get_text(strip=True) if source_elem else ''
-                            
-                            if title:
-                                results.append({
-                                    'title': title,
-                                    'link': link,
-                                    'abstract': abstract,
-                                    'source': source,
-                                    'keyword': keyword,
-                                    'engine': 'baidu',
-                                    'crawl_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                                })
-                        except Exception as e:
-                            continue
+                # 摘要
+                abstract_elem = item.select_one('.c-abstract') or item.select_one('.content-right_8Zs40')
+                abstract = abstract_elem.get_text(strip=True) if abstract_elem else ''
                 
-                # 随机延时，避免被封
-                time.sleep(random.uniform(1, 3))
+                # 来源
+                source_elem = item.select_one('.c-showurl') or item.select_one('.source_1Vdff')
+                source = source_elem.get_text(strip=True) if source_elem else ''
                 
+                if title:
+                    results.append({
+                        'title': title,
+                        'link': link,
+                        'abstract': abstract,
+                        'source': source,
+                        'keyword': keyword,
+                        'engine': 'baidu',
+                        'crawl_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    })
             except Exception as e:
-                print(f'爬取百度第{page+1}页失败: {e}')
                 continue
         
         return results
@@ -103,8 +138,15 @@ class SearchCrawler:
         :param pages: 爬取页数
         :return: 搜索结果列表
         """
-        results = []
-        
+        return self._run([[(self.fetch_bing_page, keyword, page) for page in range(pages)]])
+    
+    def fetch_bing_page(self, keyword, page):
+        """
+        爬取必应单页搜索结果
+        :param keyword: 搜索关键词
+        :param page: 页码（从0开始）
+        :return: 该页搜索结果列表
+        """
         # 简化请求头
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -112,87 +154,175 @@ class SearchCrawler:
             'Accept-Language': 'zh-CN,zh;q=0.9',
         }
         
-        for page in range(pages):
-            # URL编码关键词
-            encoded_keyword = quote(keyword)
-            url = f'https://cn.bing.com/search?q={encoded_keyword}&first={page * 10 + 1}'
+        # URL编码关键词
+        encoded_keyword = quote(keyword)
+        url = f"{self.base_urls['bing']}/search?q={encoded_keyword}&first={page * 10 + 1}"
+        
+        try:
+            response = fetch(url, headers=headers, timeout=15, cache='bing', cache_max_age=self.cache_max_age)
+            response.encoding = 'utf-8'
             
+            if response.status_code == 200:
+                results = self.parse_bing(response.text, keyword)
+                if not results:
+                    response_cache.invalidate(url)
+                return results
+            
+        except Exception as e:
+            print(f'爬取必应第{page+1}页失败: {e}')
+        
+        return []
+    
+    def parse_bing(self, html, keyword):
+        """
+        解析必应搜索结果页
+        :param html: 页面HTML
+        :param keyword: 搜索关键词
+        :return: 搜索结果列表
+        """
+        results = []
+        # 只解析结果容器
+        soup = make_soup(html, only='bing')
+        
+        # 解析搜索结果 - 多种选择器兼容
+        items = soup.select('.b_algo')
+        
+        for item in items:
             try:
-                response = requests.get(url, headers=headers, timeout=15)
-                response.encoding = 'utf-8'
+                # 标题和链接
+                title_elem = item.select_one('h2 a')
+                title = title_elem.get_text(strip=True) if title_elem else ''
+                link = title_elem.get('href', '') if title_elem else ''
                 
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # 解析搜索结果 - 多种选择器兼容
-                    items = soup.select('.b_algo')
-                    
-                    for item in items:
-                        try:
-                            # 标题和链接
-                            title_elem = item.select_one('h2 a')
-                            title = title_elem.get_text(strip=True) if title_elem else ''
-                            link = title_elem.get('href', '') if title_elem else ''
-                            
-                            # 摘要 - 多种选择器
-                            abstract_elem = (
-                                item.select_one('.b_caption p') or 
-                                item.select_one('.b_paractl') or
-                                item.select_one('p')
-                            )
-                            abstract = abstract_elem.get_text(strip=True) if abstract_elem else ''
-                            
-                            # 来源
-                            source_elem = item.select_one('cite') or item.select_one('.b_attribution cite')
-                            source = source_elem.get_text(strip=True) if source_elem else ''
-                            
-                            # 清理来源URL
-                            if source:
-                                source = source.replace('https://', '').replace('http://', '').split('/')[0]
-                            
-                            if title:
-                                results.append({
-                                    'title': title,
-                                    'link': link,
-                                    'abstract': abstract,
-                                    'source': source,
-                                    'keyword': keyword,
-                                    'engine': 'bing',
-                                    'crawl_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                                })
-                        except Exception as e:
-                            continue
-                    
-                    # 如果没有找到结果，尝试其他选择器
-                    if not results:
-                        items = soup.select('li.b_algo, .b_ans')
-                        for item in items:
-                            try:
-                                title_elem = item.select_one('h2 a, h3 a, a')
-                                if title_elem:
-                                    title = title_elem.get_text(strip=True)
-                                    link = title_elem.get('href', '')
-                                    if title and link.startswith('http'):
-                                        results.append({
-                                            'title': title,
-                                            'link': link,
-                                            'abstract': '',
-                                            'source': '',
-                                            'keyword': keyword,
-                                            'engine': 'bing',
-                                            'crawl_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                                        })
-                            except:
-                                continue
+                # 摘要 - 多种选择器
+                abstract_elem = (
+                    item.select_one('.b_caption p') or 
+                    item.select_one('.b_paractl') or
+                    item.select_one('p')
+                )
+                abstract = abstract_elem.get_text(strip=True) if abstract_elem else ''
                 
-                time.sleep(random.uniform(1, 2))
+                # 来源
+                source_elem = item.select_one('cite') or item.select_one('.b_attribution cite')
+                source = source_elem.get_text(strip=True) if source_elem else ''
                 
+                # 清理来源URL
+                if source:
+                    source = source.replace('https://', '').replace('http://', '').split('/')[0]
+                
+                if title:
+                    results.append({
+                        'title': title,
+                        'link': link,
+                        'abstract': abstract,
+                        'source': source,
+                        'keyword': keyword,
+                        'engine': 'bing',
+                        'crawl_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    })
             except Exception as e:
-                print(f'爬取必应第{page+1}页失败: {e}')
                 continue
         
+        # 如果没有找到结果，尝试其他选择器
+        if not results:
+            items = soup.select('li.b_algo, .b_ans')
+            for item in items:
+                try:
+                    title_elem = item.select_one('h2 a, h3 a, a')
+                    if title_elem:
+                        title = title_elem.get_text(strip=True)
+                        link = title_elem.get('href', '')
+                        if title and link.startswith('http'):
+                            results.append({
+                                'title': title,
+                                'link': link,
+                                'abstract': '',
+                                'source': '',
+                                'keyword': keyword,
+                                'engine': 'bing',
+                                'crawl_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                            })
+                except:
+                    continue
+        
+        return results
+    
+    def _run(self, groups):
+        """
+        并发执行单页抓取任务
+        同一主机的请求由全局调度器限速，不同主机并行抓取
+        :param groups: 按引擎分组的 (抓取函数, 关键词, 页码) 列表
+        :return: 按分组及页码顺序合并后的结果列表
+        """
+        results = []
+        total = sum(len(jobs) for jobs in groups)
+        if not total:
+            return results
+        
+        workers = max(1, min(self.max_workers, total))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # 各引擎的任务交错提交，避免某一主机的延时等待占满线程池
+            futures = {}
+            for batch in zip_longest(*groups):
+                for job in batch:
+                    if job is not None:
+                        func, keyword, page = job
+                        futures[job] = executor.submit(func, keyword, page)
+            
+            for jobs in groups:
+                for job in jobs:
+                    results.extend(futures[job].result())
+        
         return results
     
+    def search_incremental(self, keyword, engine='all', max_pages=5, known=None, stop_ratio=0.8):
+        """
+        增量搜索：各引擎并行、引擎内逐页抓取，某页中已知链接的比例达到 stop_ratio 时停止翻页
+        :param keyword: 搜索关键词
+        :param engine: 搜索引擎 (baidu/bing/all)
+        :param max_pages: 每个引擎最多抓取的页数
+        :param known: 查询已入库链接的函数，参数为一页结果的 url_hash 列表，返回其中已入库的集合（在抓取线程中调用）
+        :param stop_ratio: 停止翻页的已知链接比例
+        :return: (搜索结果列表, 实际抓取页数)
+        """
+        fetchers = []
+        if engine in ['baidu', 'all']:
+            fetchers.append(self.fetch_baidu_page)
+        if engine in ['bing', 'all']:
+            fetchers.append(self.fetch_bing_page)
+        if not fetchers:
+            return [], 0
+        
+        lookup = known or (lambda hashes: set())
+        with ThreadPoolExecutor(max_workers=len(fetchers)) as executor:
+            futures = [executor.submit(self._pages_until_known, fetch_page, keyword, max_pages, lookup, stop_ratio)
+                       for fetch_page in fetchers]
+            outcomes = [future.result() for future in futures]
+        
+        results = [item for items, _pages in outcomes for item in items]
+        return results, sum(pages for _items, pages in outcomes)
+    
+    def _pages_until_known(self, fetch_page, keyword, max_pages, known, stop_ratio):
+        """
+        逐页抓取直到空页、已知链接比例达到阈值或达到页数上限，本次前几页已出现的链接也算已知
+        :return: (结果列表, 抓取页数)
+        """
+        results = []
+        seen_here = set()
+        for page in range(max_pages):
+            items = fetch_page(keyword, page)
+            results.extend(items)
+            if not items:
+                return results, page + 1
+            hashes = [url_hash(item.get('link')) for item in items]
+            candidates = [h for h in hashes if h is not None and h not in seen_here]
+            stored = known(candidates) if candidates else set()
+            seen = sum(1 for h in hashes if h is not None and (h in seen_here or h in stored))
+            if seen >= len(items) * stop_ratio:
+                return results, page + 1
+            seen_here.update(h for h in hashes if h is not None)
+        return results, max_pages
+    
     def search(self, keyword, engine='baidu', pages=1):
         """
         统一搜索接口
@@ -201,34 +331,84 @@ class SearchCrawler:
         :param pages: 爬取页数
         :return: 搜索结果列表
         """
-        results = []
+        groups = []
         
         if engine in ['baidu', 'all']:
-            results.extend(self.search_baidu(keyword, pages))
+            groups.append([(self.fetch_baidu_page, keyword, page) for page in range(pages)])
         
         if engine in ['bing', 'all']:
-            results.extend(self.search_bing(keyword, pages))
+            groups.append([(self.fetch_bing_page, keyword, page) for page in range(pages)])
         
-        return results
+        # 所有引擎、所有页面一起并发抓取，结果顺序与串行时一致
+        return self._run(groups)
 
 
 # 简单的情感分析
+POSITIVE_WORDS = (
+    '好', '优秀', '成功', '增长', '提升', '突破', '创新', '领先',
+    '喜欢', '满意', '推荐', '赞', '棒', '优质', '高效', '便捷',
+    '安全', '稳定', '可靠', '专业', '权威', '正规', '合法'
+)
+
+NEGATIVE_WORDS = (
+    '差', '失败', '下降', '问题', '风险', '危机', '投诉', '曝光',
+    '骗', '假', '坑', '烂', '垃圾', '差评', '不满', '愤怒',
+    '违法', '违规', '处罚', '罚款', '事故', '伤亡', '损失'
+)
+
+# 已编译的词典自动机缓存，按词典内容复用
+_automaton_cache = {}
+
+
+def get_lexicon_automaton(positive_words, negative_words, weights=None):
+    """
+    获取情感词典编译后的自动机（模块级缓存，同一词典只编译一次）
+    :param positive_words: 正面词汇
+    :param negative_words: 负面词汇
+    :param weights: {词: 权重}，未指定的词权重为 1
+    :return: MultiPatternMatcher 实例，附加数据为 (极性, 权重)
+    """
+    weights = weights or {}
+    key = (tuple(positive_words), tuple(negative_words), tuple(sorted(weights.items())))
+    automaton = _automaton_cache.get(key)
+    if automaton is None:
+        patterns = {}
+        for word in negative_words:
+            patterns[word] = ('negative', weights.get(word, 1))
+        for word in positive_words:
+            patterns[word] = ('positive', weights.get(word, 1))
+        automaton = MultiPatternMatcher(patterns)
+        _automaton_cache[key] = automaton
+    return automaton
+
+
 class SentimentAnalyzer:
     """简单情感分析器"""
     
-    def __init__(self):
+    def __init__(self, positive_words=None, negative_words=None, weights=None):
         # 正面词汇
-        self.positive_words = [
-            '好', '优秀', '成功', '增长', '提升', '突破', '创新', '领先',
-            '喜欢', '满意', '推荐', '赞', '棒', '优质', '高效', '便捷',
-            '安全', '稳定', '可靠', '专业', '权威', '正规', '合法'
-        ]
+        self.positive_words = list(positive_words or POSITIVE_WORDS)
         
         # 负面词汇
-        self.negative_words = [
-            '差', '失败', '下降', '问题', '风险', '危机', '投诉', '曝光',
-            '骗', '假', '坑', '烂', '垃圾', '差评', '不满', '愤怒',
-            '违法', '违规', '处罚', '罚款', '事故', '伤亡', '损失'
+        self.negative_words = list(negative_words or NEGATIVE_WORDS)
+        
+        # 词汇权重
+        self.weights = dict(weights or {})
+        
+        self.automaton = get_lexicon_automaton(self.positive_words, self.negative_words, self.weights)
+    
+    def matches(self, text):
+        """
+        找出文本中所有情感词的出现位置
+        :param text: 待分析文本
+        :return: [{'word', 'position', 'polarity', 'weight'}] 列表，按位置排序
+        """
+        if not text:
+            return []
+        
+        return [
+            {'word': word, 'position': position, 'polarity': polarity, 'weight': weight}
+            for position, word, (polarity, weight) in self.automaton.iter(text)
         ]
     
     def analyze(self, text):
@@ -240,8 +420,14 @@ class SentimentAnalyzer:
         if not text:
             return {'sentiment': 'neutral', 'score': 0}
         
-        positive_count = sum(1 for word in self.positive_words if word in text)
-        negative_count = sum(1 for word in self.negative_words if word in text)
+        # 单次扫描，每个词只计一次（与逐词 in 判断的结果一致）
+        positive_count = 0
+        negative_count = 0
+        for word in self.automaton.present(text):
+            if self.automaton.payloads[word][0] == 'positive':
+                positive_count += 1
+            else:
+                negative_count += 1
         
         score = positive_count - negative_count
         
@@ -258,6 +444,14 @@ class SentimentAnalyzer:
             'positive_count': positive_count,
             'negative_count': negative_count
         }
+    
+    def analyze_many(self, texts):
+        """
+        批量分析文本情感
+        :param texts: 待分析文本列表
+        :return: 与输入顺序一致的情感结果列表
+        """
+        return [self.analyze(text) for text in texts]
 
 
 if __name__ == '__main__':
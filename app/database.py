@@ -1,6 +1,7 @@
 """
 数据库连接和操作的工具函数
 """
+from sqlalchemy import inspect, text
 from app import db
 from app.models import User, SystemLog
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -11,6 +12,63 @@ def init_db():
     db.create_all()
 
 
+def _default_literal(column):
+    """把列的标量默认值渲染为 SQL 字面量，无法渲染时返回 None"""
+    default = column.default
+    if default is None or not default.is_scalar:
+        return None
+    value = default.arg
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return None
+
+
+def upgrade_schema():
+    """
+    为已存在的表补齐模型中新增的列和索引
+    create_all 不会修改已有表，SQLite 也只支持 ADD COLUMN，因此逐列补齐
+    :return: 新增的 (表名, 列名) 列表
+    """
+    added = []
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(db.engine.dialect)}'
+                literal = _default_literal(column)
+                if literal is not None:
+                    ddl += f' DEFAULT {literal}'
+                conn.execute(text(ddl))
+                added.append((table.name, column.name))
+            
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+    
+    return added
+
+
+def begin_write():
+    """
+    在当前会话中显式开启写事务（事务已开启时不重复执行）
+    pysqlite 在第一条写语句前不会发出 BEGIN，此时 SAVEPOINT 就是最外层事务，释放时立即提交；
+    需要用保存点撤销单条修改、又要把多条修改合并提交时，须先调用本函数
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return
+    if not db.session.connection().connection.driver_connection.in_transaction:
+        db.session.execute(text('BEGIN IMMEDIATE'))
+
+
 def drop_db():
     """删除所有表"""
     db.drop_all()
@@ -0,0 +1,182 @@
+"""
+链接去重模块 - 规范化 URL 哈希与存量数据去重
+同一链接规范化后取 SHA-1 存入 url_hash 列，配合唯一索引实现 INSERT ... ON CONFLICT 更新；
+旧库新增 url_hash 列时应用启动只回填不重复的链接，合并删除重复行由 manage.py dedup 显式执行（可先 --dry-run）
+"""
+import hashlib
+import sqlite3
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from app import db
+
+# 跟踪参数，不影响页面内容
+_TRACKING_PARAMS = ('spm', 'fbclid', 'gclid', 'yclid')
+_DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+
+def normalize_url(url):
+    """
+    规范化链接：协议和主机名小写、去掉默认端口和片段、去掉跟踪参数、查询参数排序、去掉路径末尾斜杠
+    :param url: 原始链接
+    :return: 规范化后的链接，空链接返回 None
+    """
+    url = (url or '').strip()
+    if not url:
+        return None
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and str(parts.port) != _DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{parts.port}'
+
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.startswith('utm_') and key not in _TRACKING_PARAMS
+    )
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+
+def url_hash(url):
+    """
+    :param url: 原始链接
+    :return: 规范化链接的 SHA-1 十六进制摘要，空链接返回 None
+    """
+    normalized = normalize_url(url)
+    if normalized is None:
+        return None
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+@event.listens_for(Engine, 'connect')
+def _register_functions(dbapi_connection, connection_record):
+    """为每个 SQLite 连接注册 url_hash 函数，供去重迁移使用"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function('url_hash', 1, url_hash, deterministic=True)
+
+
+# 表 -> 去重范围列、保留行、保留行需要合并的字段
+DEDUP_TABLES = {
+    'search_results': {
+        'scope': ('keyword',),
+        'keep': 'min(id)',
+        'merge': {
+            'crawl_time': 'max(crawl_time)',
+            'engines': 'group_concat(DISTINCT coalesce(engines, engine))',
+        },
+    },
+    'collected_data': {
+        'scope': ('task_id',),
+        'keep': 'min(id)',
+        'merge': {},
+    },
+    'article_data': {
+        'scope': (),
+        # 优先保留已有正文的行
+        'keep': 'coalesce(min(CASE WHEN id IN (SELECT article_id FROM article_content) THEN id END), min(id))',
+        'merge': {'updated_at': 'max(updated_at)'},
+    },
+}
+
+
+def _dedup_groups(conn, table):
+    """
+    在临时表 _dedup 中列出重复链接的分组：去重范围列、链接哈希 h、保留行 keep_id、合并字段及组内行数 n
+    :return: 把表中的行匹配到所在分组的 SQL 条件
+    """
+    spec = DEDUP_TABLES[table]
+    keys = [*spec['scope'], 'h']
+    select_keys = ', '.join([*spec['scope'], 'url_hash(link) AS h'])
+    merge_cols = ''.join(f', {expr} AS {col}' for col, expr in spec['merge'].items())
+
+    conn.execute(text('DROP TABLE IF EXISTS temp._dedup'))
+    conn.execute(text(
+        f"CREATE TEMP TABLE _dedup AS SELECT {select_keys}, {spec['keep']} AS keep_id, count(*) AS n{merge_cols} "
+        f"FROM {table} WHERE link IS NOT NULL AND link != '' "
+        f"GROUP BY {', '.join(keys)} HAVING count(*) > 1"
+    ))
+    conn.execute(text(f"CREATE INDEX temp.ix_dedup ON _dedup ({', '.join(keys)})"))
+    return ' AND '.join(
+        [f'd.{col} = {table}.{col}' for col in spec['scope']] + [f'd.h = url_hash({table}.link)']
+    )
+
+
+def backfill(table, log=None):
+    """
+    只回填不与其他行重复的链接哈希，不删除任何数据（应用启动时执行）
+    重复的行 url_hash 保持为空，不受唯一索引约束，需执行 manage.py dedup 合并后再回填
+    :param table: 表名
+    :param log: 进度输出函数
+    :return: (回填行数, 剩余的重复分组数)
+    """
+    with db.engine.begin() as conn:
+        group_match = _dedup_groups(conn, table)
+        filled = conn.execute(text(
+            f"UPDATE {table} SET url_hash = url_hash(link) "
+            f"WHERE url_hash IS NULL AND link IS NOT NULL AND link != '' "
+            f"AND NOT EXISTS (SELECT 1 FROM _dedup d WHERE {group_match})"
+        )).rowcount
+        groups = conn.execute(text('SELECT count(*) FROM _dedup')).scalar()
+        conn.execute(text('DROP TABLE temp._dedup'))
+
+    if log:
+        log(f'[{table}] 回填链接哈希 {filled} 行，重复链接 {groups} 组')
+    return filled, groups
+
+
+def dedupe(table, dry_run=False, log=None):
+    """
+    合并并删除一张表中的重复链接，再回填 url_hash
+    删除会触发全文索引和情感汇总的触发器，相关统计随之修正
+    :param table: 表名
+    :param dry_run: 只统计将删除的行数，不修改数据
+    :param log: 进度输出函数
+    :return: 删除（dry_run 时为将删除）的重复行数
+    """
+    spec = DEDUP_TABLES[table]
+
+    with db.engine.begin() as conn:
+        group_match = _dedup_groups(conn, table)
+        if dry_run:
+            removed = conn.execute(text('SELECT coalesce(sum(n - 1), 0) FROM _dedup')).scalar()
+            conn.execute(text('DROP TABLE temp._dedup'))
+            if log:
+                log(f'[{table}] 重复行 {removed} 条（未删除）')
+            return removed
+
+        if spec['merge']:
+            assignments = ', '.join(
+                f'{col} = (SELECT d.{col} FROM _dedup d WHERE d.keep_id = {table}.id)' for col in spec['merge']
+            )
+            conn.execute(text(
+                f'UPDATE {table} SET {assignments} WHERE id IN (SELECT keep_id FROM _dedup)'
+            ))
+
+        removed = conn.execute(text(
+            f"DELETE FROM {table} WHERE link IS NOT NULL AND link != '' "
+            f"AND id NOT IN (SELECT keep_id FROM _dedup) "
+            f"AND EXISTS (SELECT 1 FROM _dedup d WHERE {group_match})"
+        )).rowcount
+
+        conn.execute(text(
+            f"UPDATE {table} SET url_hash = url_hash(link) WHERE url_hash IS NULL AND link IS NOT NULL AND link != ''"
+        ))
+        conn.execute(text('DROP TABLE temp._dedup'))
+
+    if log:
+        log(f'[{table}] 删除重复行 {removed} 条')
+    return removed
+
+
+def migrate(tables=None, dry_run=False, log=None):
+    """
+    对指定表执行去重迁移（删除数据，只由 manage.py dedup 显式执行）
+    :param tables: 表名列表，默认全部
+    :param dry_run: 只统计，不删除
+    :return: {表名: 删除行数}
+    """
+    if tables is None:
+        tables = list(DEDUP_TABLES)
+    return {table: dedupe(table, dry_run, log) for table in tables}
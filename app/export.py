@@ -0,0 +1,155 @@
+"""
+数据导出模块 - 舆情数据、文章的流式导出 (CSV / NDJSON)
+按 yield_per 分批从游标读取，只取导出的列（不构造 ORM 对象），每积累一块输出一次，
+内存占用与导出行数无关；时间列在 SQL 中截取为字符串，不逐行解析和格式化；支持 gzip 压缩传输
+"""
+import csv
+import io
+import json
+import zlib
+from sqlalchemy import func
+from app.search_index import apply_filters
+
+# 每批从游标读取的行数
+FETCH_SIZE = 1000
+
+# 输出缓冲达到该字节数时产出一块
+FLUSH_BYTES = 64 * 1024
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def export_columns(model):
+    """
+    可导出的列，与 to_dict 的字段一致
+    :return: {字段名: 列表达式}
+    """
+    from app.models import SearchResult, ArticleData, ArticleContent
+
+    if model is SearchResult:
+        return {
+            'id': SearchResult.id,
+            'keyword': SearchResult.keyword,
+            'title': SearchResult.title,
+            'link': SearchResult.link,
+            'abstract': SearchResult.abstract,
+            'source': SearchResult.source,
+            'engine': SearchResult.engine,
+            'sentiment': SearchResult.sentiment,
+            'sentiment_score': SearchResult.sentiment_score,
+            # SQLite 中以 'YYYY-MM-DD HH:MM:SS.ffffff' 文本存储，截取后与 to_dict 的格式相同
+            'crawl_time': func.substr(SearchResult.crawl_time, 1, 19),
+            'engines': func.coalesce(SearchResult.engines, SearchResult.engine),
+        }
+    return {
+        'id': ArticleData.id,
+        'keyword': ArticleData.keyword,
+        'title': ArticleData.title,
+        'link': ArticleData.link,
+        'cover': ArticleData.cover,
+        'source': ArticleData.source,
+        'abstract': ArticleData.abstract,
+        'content': ArticleContent.content,
+        'publish_time': ArticleData.publish_time,
+        'author': ArticleData.author,
+        'sentiment': ArticleData.sentiment,
+        'sentiment_score': ArticleData.sentiment_score,
+        'tags': ArticleData.tags,
+        'category': ArticleData.category,
+        'status': ArticleData.status,
+        'created_at': func.substr(ArticleData.created_at, 1, 19),
+    }
+
+
+def export_joins(model):
+    """
+    不在主表中的导出列及其所在的表
+    :return: {字段名: (模型, 关联条件)}
+    """
+    from app.models import ArticleData, ArticleContent
+
+    if model is ArticleData:
+        return {'content': (ArticleContent, ArticleContent.article_id == ArticleData.id)}
+    return {}
+
+
+def build_query(model, order_columns, fields=None, keyword='', sentiment='', q=''):
+    """
+    构造导出查询，过滤条件和排序与列表接口一致
+    :param model: SearchResult 或 ArticleData
+    :param order_columns: 排序列（降序），与列表接口的游标分页列相同
+    :param fields: 要导出的字段名列表，默认全部
+    :return: (字段名列表, 查询)；字段名不合法时抛出 ValueError
+    """
+    columns = export_columns(model)
+    names = list(fields) if fields else list(columns)
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        raise ValueError(f'不支持的字段: {", ".join(unknown)}')
+
+    query = apply_filters(model.query, model, keyword, sentiment, q)
+    # 正文等分表存储的列只在导出时关联
+    for name, (target, condition) in export_joins(model).items():
+        if name in names:
+            query = query.outerjoin(target, condition)
+    query = query.order_by(*[column.desc() for column in order_columns])
+    query = query.with_entities(*[columns[name].label(name) for name in names])
+    return names, query.yield_per(FETCH_SIZE)
+
+
+def _csv_chunks(names, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM 让 Excel 按 UTF-8 打开中文
+    buffer.write('\ufeff')
+    writer.writerow(names)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_chunks(names, rows):
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps(dict(zip(names, row)), ensure_ascii=False)
+        lines.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            lines.append('')
+            yield '\n'.join(lines)
+            lines = []
+            size = 0
+    if lines:
+        lines.append('')
+        yield '\n'.join(lines)
+
+
+def stream(names, query, fmt='csv', gzip=False):
+    """
+    逐块产出导出内容
+    :param names: 字段名列表
+    :param query: build_query 返回的查询
+    :param fmt: csv 或 ndjson
+    :param gzip: 是否以 gzip 压缩
+    :return: 字节块生成器
+    """
+    chunks = _csv_chunks(names, query) if fmt == 'csv' else _ndjson_chunks(names, query)
+    if not gzip:
+        for chunk in chunks:
+            yield chunk.encode('utf-8')
+        return
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip 格式
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,123 @@
+"""
+近似重复检测模块 - 正文 SimHash 指纹与分段 (banded) LSH 索引
+64 位指纹按 16 位切成 4 段写入 simhash_bands 表；汉明距离不超过 3 的两个指纹至少有一段完全相同，
+查重时只需按段精确查找候选再校验距离，不必与全部正文逐一比较
+"""
+import hashlib
+import re
+from collections import Counter
+from sqlalchemy import delete, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import db
+from app.models import CollectedData, SimhashBand
+
+BITS = 64
+BANDS = 4
+BAND_BITS = BITS // BANDS
+MAX_DISTANCE = BANDS - 1  # 鸽巢原理：距离不超过段数减一时必有一段相同
+
+SHINGLE_SIZE = 4  # 字符 n-gram 长度
+MIN_LENGTH = 50  # 正文短于此长度不计算指纹
+
+# 去掉空白和标点，只保留文字
+_STRIP_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def _signed(value):
+    """无符号 64 位转为有符号，适配 SQLite 整数"""
+    return value - (1 << BITS) if value >= 1 << (BITS - 1) else value
+
+
+def _unsigned(value):
+    return value + (1 << BITS) if value < 0 else value
+
+
+def simhash(text):
+    """
+    计算正文的 SimHash 指纹
+    :param text: 正文
+    :return: 有符号 64 位整数，正文过短时返回 None
+    """
+    compact = _STRIP_RE.sub('', (text or '').lower())
+    if len(compact) < MIN_LENGTH:
+        return None
+
+    shingles = Counter(compact[i:i + SHINGLE_SIZE] for i in range(len(compact) - SHINGLE_SIZE + 1))
+    weights = [0] * BITS
+    for shingle, count in shingles.items():
+        h = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(BITS):
+            if h >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+
+    value = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            value |= 1 << bit
+    return _signed(value)
+
+
+def bands(value):
+    """:return: [(段号, 段值)]"""
+    value = _unsigned(value)
+    mask = (1 << BAND_BITS) - 1
+    return [(band, value >> (band * BAND_BITS) & mask) for band in range(BANDS)]
+
+
+def distance(a, b):
+    """两个指纹的汉明距离"""
+    return bin(_unsigned(a) ^ _unsigned(b)).count('1')
+
+
+def find_duplicate(value, exclude_id=None):
+    """
+    查找与指纹近似重复的最早一条采集数据
+    :param value: 指纹
+    :param exclude_id: 排除的数据ID（自身）
+    :return: 该重复组的代表数据ID，没有时返回 None
+    """
+    conditions = [(SimhashBand.band == band) & (SimhashBand.value == part) for band, part in bands(value)]
+    candidates = db.session.execute(
+        select(CollectedData.id, CollectedData.simhash, CollectedData.dup_of)
+        .join(SimhashBand, SimhashBand.data_id == CollectedData.id)
+        .where(or_(*conditions), CollectedData.id != exclude_id)
+        .distinct()
+    ).all()
+
+    matched = [row.dup_of or row.id for row in candidates if distance(row.simhash, value) <= MAX_DISTANCE]
+    return min(matched) if matched else None
+
+
+def register(data):
+    """
+    为深度采集后的数据计算指纹、标记重复并写入分段索引（不提交）
+    :param data: CollectedData 对象
+    :return: 重复组代表数据ID，不重复时返回 None
+    """
+    value = simhash(data.content)
+    data.simhash = value
+    data.dup_of = None
+    db.session.execute(delete(SimhashBand).where(SimhashBand.data_id == data.id))
+    if value is None:
+        return None
+
+    data.dup_of = find_duplicate(value, exclude_id=data.id)
+    db.session.execute(
+        sqlite_insert(SimhashBand).on_conflict_do_nothing(),
+        [{'band': band, 'value': part, 'data_id': data.id} for band, part in bands(value)]
+    )
+    return data.dup_of
+
+
+def group_duplicates(items):
+    """
+    把采集数据按重复组归并，组内第一条为代表
+    :param items: CollectedData 列表（按展示顺序）
+    :return: [(代表数据, 组内其余数据列表)]
+    """
+    groups = {}
+    for item in items:
+        groups.setdefault(item.dup_of or item.id, []).append(item)
+    return [(members[0], members[1:]) for members in groups.values()]
@@ -0,0 +1,266 @@
+"""
+出站响应缓存模块 - 爬虫和深度采集请求的磁盘缓存
+响应体按 SHA-256 内容寻址、zlib 压缩存放，相同内容的页面只存一份；索引保存在缓存目录下的 SQLite 文件中。
+按请求类型（baidu/bing/article）配置新鲜期：新鲜期内直接返回缓存，不发请求也不占用限速令牌；
+过期后带 If-None-Match / If-Modified-Since 重新验证，服务器返回 304 时沿用缓存内容。
+新鲜期由本地配置决定，不读取响应的 Cache-Control（搜索结果页普遍声明不可缓存）；
+总大小超过上限时按最近访问时间淘汰
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+import requests
+from app.metrics import registry
+
+CACHE_RESULTS = registry.counter(
+    'http_cache_requests_total', '出站响应缓存的查询结果 (hit/revalidated/miss)', ('kind', 'result'))
+
+# 淘汰时降到上限的比例，避免每次写入都触发淘汰
+EVICT_TARGET = 0.9
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    content_type TEXT,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_entries_accessed ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS ix_entries_digest ON entries (digest);
+'''
+
+
+class ResponseCache:
+    """按 URL 索引、按内容存储的响应缓存"""
+
+    def __init__(self):
+        self.enabled = False
+        self.directory = None
+        self.max_bytes = 512 * 1024 * 1024
+        self.ttl = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        self._total = 0
+
+    def init_app(self, app):
+        """从应用配置加载缓存参数，首次使用时打开索引"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self.enabled = app.config.get('HTTP_CACHE_ENABLED', self.enabled)
+            self.directory = app.config.get('HTTP_CACHE_DIR') or os.path.join(app.instance_path, 'http_cache')
+            self.max_bytes = app.config.get('HTTP_CACHE_MAX_BYTES', self.max_bytes)
+            self.ttl = dict(app.config.get('HTTP_CACHE_TTL') or {})
+
+    def _db(self):
+        """索引连接（调用方持有锁）"""
+        if self._conn is None:
+            os.makedirs(os.path.join(self.directory, 'objects'), exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(self.directory, 'index.db'), check_same_thread=False,
+                                         isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+            self._total = self._conn.execute(
+                'SELECT coalesce(sum(size), 0) FROM (SELECT DISTINCT digest, size FROM entries)'
+            ).fetchone()[0]
+        return self._conn
+
+    def _path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], digest)
+
+    def fetch(self, url, kind, send, max_age=None):
+        """
+        带缓存的 GET 请求
+        :param url: 请求地址
+        :param kind: 请求类型，决定新鲜期（HTTP_CACHE_TTL 中的键）
+        :param send: 发起网络请求的函数，参数为追加的请求头，返回 requests.Response
+        :param max_age: 覆盖该类型的新鲜期（秒），0 表示每次都重新验证
+        :return: requests.Response，来自缓存时 from_cache 属性为 hit 或 revalidated
+        """
+        if not self.enabled:
+            return send({})
+
+        ttl = self.ttl.get(kind, 0) if max_age is None else max_age
+        entry = self.lookup(url)
+        if entry is not None and time.time() - entry['stored_at'] < ttl:
+            response = self._load(url, entry, 'hit')
+            if response is not None:
+                CACHE_RESULTS.inc(kind=kind, result='hit')
+                return response
+            entry = None
+
+        validators = {}
+        if entry is not None:
+            if entry['etag']:
+                validators['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                validators['If-Modified-Since'] = entry['last_modified']
+
+        response = send(validators)
+        if response.status_code == 304 and entry is not None:
+            cached = self._load(url, entry, 'revalidated', refresh=True)
+            if cached is not None:
+                CACHE_RESULTS.inc(kind=kind, result='revalidated')
+                return cached
+            # 缓存文件已丢失，重新完整请求
+            response = send({})
+
+        CACHE_RESULTS.inc(kind=kind, result='miss')
+        if response.status_code == 200:
+            self.store(url, response)
+        return response
+
+    def lookup(self, url):
+        """:return: 索引记录字典，不存在时返回 None"""
+        with self._lock:
+            row = self._db().execute(
+                'SELECT digest, size, etag, last_modified, content_type, stored_at FROM entries WHERE url = ?', (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ('digest', 'size', 'etag', 'last_modified', 'content_type', 'stored_at')
+        return dict(zip(keys, row))
+
+    def _load(self, url, entry, source, refresh=False):
+        """
+        从缓存构造响应
+        :param refresh: 重新验证通过，刷新存储时间（重新开始新鲜期）
+        :return: requests.Response，缓存文件缺失时删除索引并返回 None
+        """
+        try:
+            with open(self._path(entry['digest']), 'rb') as f:
+                content = zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            self.invalidate(url)
+            return None
+
+        now = time.time()
+        with self._lock:
+            if refresh:
+                self._db().execute('UPDATE entries SET accessed_at = ?, stored_at = ? WHERE url = ?', (now, now, url))
+            else:
+                self._db().execute('UPDATE entries SET accessed_at = ? WHERE url = ?', (now, url))
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = content
+        if entry['content_type']:
+            response.headers['Content-Type'] = entry['content_type']
+        response.from_cache = source
+        return response
+
+    def store(self, url, response):
+        """
+        保存 200 响应，超出总大小上限时淘汰最久未访问的记录
+        压缩和写文件在锁外进行，锁内只做索引更新和文件改名，并发请求不会互相等待
+        """
+        content = response.content
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._path(digest)
+
+        with self._lock:
+            stored = self._db().execute('SELECT 1 FROM entries WHERE digest = ? LIMIT 1', (digest,)).fetchone()
+        tmp = None
+        if stored is None or not os.path.exists(path):
+            data = zlib.compress(content, 6)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f'{path}.{threading.get_ident()}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            existing = conn.execute('SELECT size FROM entries WHERE digest = ? LIMIT 1', (digest,)).fetchone()
+            if existing is not None and os.path.exists(path):
+                size = existing[0]
+            elif tmp is not None:
+                os.replace(tmp, path)
+                tmp = None
+                size = len(data)
+                if existing is None:
+                    self._total += size
+            else:
+                # 查询之后内容文件被淘汰，本次不缓存
+                return
+
+            previous = conn.execute('SELECT digest, size FROM entries WHERE url = ?', (url,)).fetchone()
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (url, digest, size, etag, last_modified, content_type, stored_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, digest, size, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                 response.headers.get('Content-Type'), now, now)
+            )
+            if previous is not None and previous[0] != digest:
+                self._release(*previous)
+            if self._total > self.max_bytes:
+                self._evict()
+
+        # 其他线程已写入相同内容，丢弃本次的临时文件
+        if tmp is not None:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def invalidate(self, url):
+        """删除 URL 的缓存（如抓到验证码页等不应缓存的内容）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            conn = self._db()
+            row = conn.execute('SELECT digest, size FROM entries WHERE url = ?', (url,)).fetchone()
+            if row is not None:
+                conn.execute('DELETE FROM entries WHERE url = ?', (url,))
+                self._release(*row)
+
+    def _release(self, digest, size):
+        """内容不再被任何 URL 引用时删除文件（调用方持有锁）"""
+        if self._conn.execute('SELECT 1 FROM entries WHERE digest = ? LIMIT 1', (digest,)).fetchone():
+            return
+        try:
+            os.remove(self._path(digest))
+        except OSError:
+            pass
+        self._total -= size
+
+    def _evict(self):
+        """按最近访问时间淘汰，直到总大小降到上限的 EVICT_TARGET（调用方持有锁）"""
+        target = self.max_bytes * EVICT_TARGET
+        conn = self._conn
+        while self._total > target:
+            rows = conn.execute('SELECT url, digest, size FROM entries ORDER BY accessed_at LIMIT 100').fetchall()
+            if not rows:
+                break
+            for url, digest, size in rows:
+                conn.execute('DELETE FROM entries WHERE url = ?', (url,))
+                self._release(digest, size)
+                if self._total <= target:
+                    break
+
+    def stats(self):
+        """缓存条目数、内容文件数及总大小"""
+        if not self.enabled:
+            return {'enabled': False}
+        with self._lock:
+            entries, objects = self._db().execute('SELECT count(*), count(DISTINCT digest) FROM entries').fetchone()
+            return {
+                'enabled': True,
+                'entries': entries,
+                'objects': objects,
+                'bytes': self._total,
+                'max_bytes': self.max_bytes,
+            }
+
+
+# 全局响应缓存实例
+response_cache = ResponseCache()
@@ -0,0 +1,176 @@
+"""
+出站 HTTP 连接池模块 - 进程级共享的长连接会话
+搜索、必应和深度采集的所有请求都复用同一个连接池，按主机保持 keep-alive 连接，
+并统一经过按主机的限速调度器；指定请求类型的请求先经过磁盘响应缓存
+"""
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from app.ratelimit import scheduler, retry_after_seconds
+from app.metrics import record_fetch
+from app.http_cache import response_cache
+
+
+class PoolCounter:
+    """连接池命中/未命中计数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, reused):
+        with self._lock:
+            if reused:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+counter = PoolCounter()
+
+
+class CountingMixin:
+    """取连接时记录是否复用了已建立的 socket（未建立的连接需要重新握手）"""
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        counter.record(getattr(conn, 'sock', None) is not None)
+        return conn
+
+
+class CountingHTTPConnectionPool(CountingMixin, HTTPConnectionPool):
+    pass
+
+
+class CountingHTTPSConnectionPool(CountingMixin, HTTPSConnectionPool):
+    pass
+
+
+class PooledAdapter(HTTPAdapter):
+    """使用计数连接池的适配器"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool,
+        }
+
+
+class HttpClient:
+    """进程级共享的 HTTP 客户端"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session = None
+        self.pool_connections = 50
+        self.pool_maxsize = 10
+        self.timeout = (5, 15)
+        self.retries = {'total': 2, 'connect': 2, 'read': 1}
+
+    def init_app(self, app):
+        """从应用配置加载连接池参数，已创建的会话会被重建"""
+        with self._lock:
+            self.pool_connections = app.config.get('HTTP_POOL_CONNECTIONS', self.pool_connections)
+            self.pool_maxsize = app.config.get('HTTP_POOL_MAXSIZE', self.pool_maxsize)
+            self.timeout = app.config.get('HTTP_TIMEOUT', self.timeout)
+            self.retries = app.config.get('HTTP_RETRIES', self.retries)
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    @property
+    def session(self):
+        """懒加载的共享会话"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self):
+        # 适配器内不重试：重试在 _send 中进行，每次尝试都经过限速调度器
+        adapter = PooledAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=0
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def fetch(self, url, headers=None, timeout=None, cache=None, cache_max_age=None, **kwargs):
+        """
+        经限速调度器发起 GET 请求
+        :param url: 请求地址
+        :param headers: 请求头
+        :param timeout: 超时秒数，缺省使用配置值
+        :param cache: 请求类型（如 baidu/article），指定时经过响应缓存，按该类型的新鲜期复用或重新验证
+        :param cache_max_age: 覆盖该类型的新鲜期（秒）
+        :return: requests.Response
+        """
+        if cache:
+            return response_cache.fetch(
+                url, cache, lambda validators: self._send(url, dict(headers or {}, **validators), timeout, **kwargs),
+                max_age=cache_max_age
+            )
+        return self._send(url, headers, timeout, **kwargs)
+
+    def _send(self, url, headers=None, timeout=None, **kwargs):
+        """
+        发起请求，连接错误和读取超时按 HTTP_RETRIES 重试（total 为总次数上限，connect/read 为各类错误的次数上限）；
+        每次尝试都重新经过调度器，消耗令牌并等待上次失败触发的退避
+        """
+        total = self.retries.get('total', 0)
+        remaining = {'connect': self.retries.get('connect', total), 'read': self.retries.get('read', total)}
+        while True:
+            try:
+                return self._attempt(url, headers, timeout, **kwargs)
+            except requests.exceptions.SSLError:
+                raise
+            except (requests.exceptions.ConnectionError, requests.exceptions.ReadTimeout) as e:
+                kind = 'read' if isinstance(e, requests.exceptions.ReadTimeout) else 'connect'
+                if total <= 0 or remaining[kind] <= 0:
+                    raise
+                total -= 1
+                remaining[kind] -= 1
+
+    def _attempt(self, url, headers=None, timeout=None, **kwargs):
+        """经调度器发起一次请求，异常时由调度器记录失败并退避"""
+        started = time.perf_counter()
+        with scheduler.slot(url) as slot:
+            sent = time.perf_counter()
+            status = 'error'
+            try:
+                response = self.session.get(url, headers=headers, timeout=timeout or self.timeout, **kwargs)
+                status = response.status_code
+            finally:
+                record_fetch(url, status, sent - started, time.perf_counter() - sent)
+            slot.feedback(response.status_code, retry_after_seconds(response))
+        return response
+
+    def stats(self):
+        """连接池复用统计"""
+        return counter.snapshot()
+
+
+# 全局客户端实例
+client = HttpClient()
+
+
+def fetch(url, headers=None, timeout=None, cache=None, cache_max_age=None, **kwargs):
+    """使用全局客户端发起请求"""
+    return client.fetch(url, headers=headers, timeout=timeout, cache=cache, cache_max_age=cache_max_age, **kwargs)
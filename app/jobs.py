@@ -0,0 +1,265 @@
+"""
+后台任务队列模块 - 基于 crawl_tasks 表的持久化任务队列
+请求线程只负责入队，固定数量的工作线程按优先级领取并执行任务，支持取消；
+领取任务使用条件 UPDATE，多进程部署时同一任务也只会被一个进程执行
+"""
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from app import db
+from app.metrics import record_job
+from app.models import CrawlTask
+from app.writer import writer
+
+# 任务类型 -> 处理函数
+handlers = {}
+
+# 请求可指定的优先级范围 [-MAX_PRIORITY, MAX_PRIORITY]
+MAX_PRIORITY = 10
+
+
+def job_handler(kind):
+    """注册任务处理函数的装饰器，处理函数接收 JobContext"""
+    def decorator(func):
+        handlers[kind] = func
+        return func
+    return decorator
+
+
+class JobCancelled(Exception):
+    """任务被取消"""
+
+
+class JobContext:
+    """传给任务处理函数的执行上下文"""
+
+    def __init__(self, task):
+        self.task = task
+        self.task_id = task.id
+        self.payload = json.loads(task.payload) if task.payload else {}
+
+    def cancelled(self):
+        """检查任务是否已被请求取消"""
+        flag = db.session.execute(
+            select(CrawlTask.cancel_requested).where(CrawlTask.id == self.task_id)
+        ).scalar()
+        return bool(flag)
+
+    def check_cancelled(self):
+        """已被请求取消时抛出 JobCancelled"""
+        if self.cancelled():
+            raise JobCancelled()
+
+
+def new_task(kind, keyword, engine='all', pages=1, payload=None, priority=0):
+    """构造排队中的任务对象（不提交），参数同 JobQueue.enqueue"""
+    return CrawlTask(
+        kind=kind,
+        keyword=keyword,
+        engine=engine,
+        pages=pages,
+        priority=int(priority),
+        payload=json.dumps(payload or {}, ensure_ascii=False),
+        status='pending'
+    )
+
+
+def _mark_running(task_id):
+    """条件更新：任务仍在排队时标记为运行中，:return: 是否领取成功"""
+    result = db.session.execute(
+        update(CrawlTask)
+        .where(CrawlTask.id == task_id, CrawlTask.status == 'pending')
+        .values(status='running', started_at=datetime.utcnow())
+    )
+    return result.rowcount == 1
+
+
+def _update_task(task_id, values):
+    """写入任务最终状态"""
+    db.session.execute(update(CrawlTask).where(CrawlTask.id == task_id).values(**values))
+
+
+class JobQueue:
+    """有界工作线程池 + 数据库持久化队列"""
+
+    def __init__(self):
+        self.app = None
+        self.workers = 2
+        self.poll_interval = 2.0
+        self.stale_seconds = 600
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._busy = 0
+
+    def init_app(self, app):
+        """绑定应用并读取配置，首个请求到来时启动工作线程"""
+        self.app = app
+        self.workers = app.config.get('JOB_WORKERS', self.workers)
+        self.poll_interval = app.config.get('JOB_POLL_INTERVAL', self.poll_interval)
+        self.stale_seconds = app.config.get('JOB_STALE_SECONDS', self.stale_seconds)
+
+        # 只在真正处理请求的进程中启动（避免 init_db/manage 脚本和重载器父进程启动工作线程）
+        app.before_request(self.start)
+
+    def start(self):
+        """启动工作线程（幂等），工作线程数为 0 时不启动（只入队）"""
+        if self._threads or self.app is None or self.workers <= 0:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            self._requeue_stale()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def enqueue(self, kind, keyword, engine='all', pages=1, payload=None, priority=0):
+        """
+        任务入队
+        :param kind: 任务类型
+        :param keyword: 关键词
+        :param engine: 搜索引擎
+        :param pages: 页数
+        :param payload: 额外参数
+        :param priority: 优先级，越大越先执行
+        :return: CrawlTask 对象
+        """
+        task = new_task(kind, keyword, engine, pages, payload, priority)
+        db.session.add(task)
+        db.session.commit()
+
+        self.notify()
+        return task
+
+    def notify(self):
+        """有新任务入队（在其他会话中写入时调用），唤醒空闲的工作线程"""
+        self.start()
+        self._wakeup.set()
+
+    def cancel(self, task_id):
+        """
+        取消任务：排队中的直接标记为 cancelled，运行中的设置取消标记由处理函数响应
+        :return: 是否成功发出取消
+        """
+        result = db.session.execute(
+            update(CrawlTask)
+            .where(CrawlTask.id == task_id, CrawlTask.status == 'pending')
+            .values(status='cancelled', cancel_requested=True, completed_at=datetime.utcnow())
+        )
+        if result.rowcount == 0:
+            result = db.session.execute(
+                update(CrawlTask)
+                .where(CrawlTask.id == task_id, CrawlTask.status == 'running')
+                .values(cancel_requested=True)
+            )
+        db.session.commit()
+        return result.rowcount > 0
+
+    def depth(self):
+        """队列状态: 排队任务数、运行中任务数及工作线程数"""
+        pending = db.session.query(CrawlTask).filter_by(status='pending').count()
+        return {'pending': pending, 'busy': self._busy, 'workers': len(self._threads)}
+
+    def _requeue_stale(self):
+        """把进程异常退出后遗留的 running 任务重新放回队列"""
+        with self.app.app_context():
+            cutoff = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+            db.session.execute(
+                update(CrawlTask)
+                .where(CrawlTask.status == 'running', CrawlTask.started_at < cutoff)
+                .values(status='pending', started_at=None)
+            )
+            db.session.commit()
+
+    def _claim(self):
+        """按优先级领取一个排队任务，条件更新保证不会被重复领取"""
+        while True:
+            task_id = db.session.execute(
+                select(CrawlTask.id)
+                .where(CrawlTask.status == 'pending')
+                .order_by(CrawlTask.priority.desc(), CrawlTask.id.asc())
+                .limit(1)
+            ).scalar()
+            if task_id is None:
+                db.session.rollback()
+                return None
+
+            if writer.run(_mark_running, task_id):
+                return db.session.get(CrawlTask, task_id)
+
+    def _run(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    task = self._claim()
+                except Exception as e:
+                    print(f'领取任务失败: {e}')
+                    db.session.rollback()
+                    task = None
+
+                if task is None:
+                    db.session.remove()
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+                    continue
+
+                task_id = task.id
+                with self._lock:
+                    self._busy += 1
+                try:
+                    self._execute(task)
+                except Exception as e:
+                    # 记录指标或写入最终状态失败时不能让工作线程退出，尽量把任务标记为失败
+                    print(f'任务 {task_id} 执行后处理失败: {e}')
+                    db.session.rollback()
+                    self._mark_failed(task_id, str(e))
+                finally:
+                    with self._lock:
+                        self._busy -= 1
+                    db.session.remove()
+
+    def _mark_failed(self, task_id, error_msg):
+        """把任务标记为失败（再次失败时只输出错误，任务留待超时后重新入队）"""
+        try:
+            writer.run(_update_task, task_id,
+                       {'status': 'failed', 'completed_at': datetime.utcnow(), 'error_msg': error_msg})
+        except Exception as e:
+            print(f'任务 {task_id} 标记失败状态失败: {e}')
+            db.session.rollback()
+
+    def _execute(self, task):
+        """执行任务并记录最终状态"""
+        task_id = task.id
+        kind = task.kind or 'crawl'
+        handler = handlers.get(kind)
+        status = 'completed'
+        error_msg = None
+        started = time.perf_counter()
+
+        try:
+            if handler is None:
+                raise ValueError(f'未知的任务类型: {kind}')
+            result_count = handler(JobContext(task))
+        except JobCancelled:
+            db.session.rollback()
+            status = 'cancelled'
+            result_count = None
+        except Exception as e:
+            db.session.rollback()
+            status = 'failed'
+            error_msg = str(e)
+            result_count = None
+        record_job(kind, status, time.perf_counter() - started)
+
+        values = {'status': status, 'completed_at': datetime.utcnow(), 'error_msg': error_msg}
+        if result_count is not None:
+            values['result_count'] = result_count
+        writer.run(_update_task, task_id, values)
+
+
+# 全局任务队列实例
+queue = JobQueue()
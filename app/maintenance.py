@@ -0,0 +1,84 @@
+"""
+周期维护模块 - 在后台线程中按各自的间隔执行汇总压缩等维护任务
+任务用 @periodic 注册，间隔从应用配置读取；任务在应用上下文中执行，写入须经 writer.run（不自行提交）。
+多进程部署时每个进程都会执行，任务须可重复执行
+"""
+import threading
+import time
+from app import db
+
+# 注册的周期任务: 名称 -> (函数, 间隔配置键, 默认间隔秒数)
+PERIODIC = {}
+
+
+def periodic(name, interval_key, default_interval):
+    """注册周期维护任务的装饰器，间隔配置为 0 或 None 时不执行"""
+    def decorator(func):
+        PERIODIC[name] = (func, interval_key, default_interval)
+        return func
+    return decorator
+
+
+class Maintenance:
+    """周期维护线程"""
+
+    def __init__(self):
+        self.app = None
+        self.enabled = True
+        self.poll_interval = 60
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_run = {}
+
+    def init_app(self, app):
+        """绑定应用并读取配置，首个请求到来时启动维护线程"""
+        self.app = app
+        self.enabled = app.config.get('MAINTENANCE_ENABLED', self.enabled)
+        self.poll_interval = app.config.get('MAINTENANCE_POLL_INTERVAL', self.poll_interval)
+
+        # 与任务队列相同，只在处理请求的进程中启动
+        app.before_request(self.start)
+
+    def start(self):
+        """启动维护线程（幂等）"""
+        if self._thread is not None or not self.enabled or self.app is None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='maintenance', daemon=True)
+                self._thread.start()
+
+    def run_due(self):
+        """
+        执行到期的维护任务（进程启动后的第一次扫描执行全部任务）
+        :return: {任务名: 返回值}
+        """
+        results = {}
+        now = time.monotonic()
+        for name, (func, interval_key, default_interval) in PERIODIC.items():
+            interval = self.app.config.get(interval_key, default_interval)
+            if not interval:
+                continue
+            last = self._last_run.get(name)
+            if last is not None and now - last < interval:
+                continue
+            self._last_run[name] = now
+            try:
+                results[name] = func()
+            except Exception as e:
+                print(f'维护任务 {name} 失败: {e}')
+                db.session.rollback()
+        return results
+
+    def _run(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    self.run_due()
+                finally:
+                    db.session.remove()
+            time.sleep(self.poll_interval)
+
+
+# 全局维护实例
+maintenance = Maintenance()
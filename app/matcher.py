@@ -0,0 +1,78 @@
+"""
+多模式字符串匹配模块
+词典编译为一个正则多选分支（由 re 模块在 C 层单次扫描文本），
+再用预先计算的包含/跨界关系补全被长词覆盖的词条，从而一次扫描得到所有词条的出现位置
+"""
+import re
+
+
+class MultiPatternMatcher:
+    """多模式匹配器 - 一次扫描找出文本中所有词条（含相互重叠的词条）"""
+
+    def __init__(self, patterns):
+        """
+        :param patterns: {词条: 附加数据} 字典，附加数据会随匹配结果返回
+        """
+        self.payloads = {word: payload for word, payload in patterns.items() if word}
+        # 长词优先，保证同一位置总是命中最长的词
+        words = sorted(self.payloads, key=len, reverse=True)
+
+        # 每个词内部完整包含的其他词条及偏移，命中长词时一并输出
+        self.contained = {}
+        # 从词内部开始、越过词尾的其他词条（如“不满”之于“满意”），命中后需在原文中确认
+        self.crossing = {}
+        for word in words:
+            inner = []
+            cross = []
+            for offset in range(len(word)):
+                tail = word[offset:]
+                for other in words:
+                    if other == word and offset == 0:
+                        continue
+                    if tail.startswith(other):
+                        inner.append((offset, other))
+                    elif offset and other.startswith(tail):
+                        cross.append((offset, other))
+            self.contained[word] = inner
+            self.crossing[word] = cross
+
+        # 仅关心“出现了哪些词”时使用的闭包：命中某词即意味着其包含的词也出现
+        self.implied = {word: {other for _, other in inner} for word, inner in self.contained.items()}
+        self.crossing_words = {word: {other for _, other in cross} for word, cross in self.crossing.items()}
+
+        alternation = '|'.join(map(re.escape, words)) or '(?!)'
+        self.pattern = re.compile(alternation)
+
+    def iter(self, text):
+        """
+        扫描文本
+        :param text: 待匹配文本
+        :return: 生成 (起始位置, 词条, 附加数据)
+        """
+        payloads, contained, crossing = self.payloads, self.contained, self.crossing
+        for match in self.pattern.finditer(text):
+            word = match.group()
+            start = match.start()
+            yield start, word, payloads[word]
+            for offset, other in contained[word]:
+                yield start + offset, other, payloads[other]
+            for offset, other in crossing[word]:
+                if text.startswith(other, start + offset):
+                    yield start + offset, other, payloads[other]
+
+    def present(self, text):
+        """
+        找出文本中出现过的所有词条（不关心位置和次数）
+        扫描在 C 层完成，跨界词条仅在必要时用子串判断确认
+        :param text: 待匹配文本
+        :return: 词条集合
+        """
+        found = set(self.pattern.findall(text))
+        for word in list(found):
+            found |= self.implied[word]
+        for word in list(found):
+            for other in self.crossing_words[word]:
+                if other not in found and other in text:
+                    found.add(other)
+                    found |= self.implied[other]
+        return found
@@ -0,0 +1,492 @@
+"""
+运行指标模块 - 请求耗时、SQL、出站请求、后台任务的计数与直方图，以 Prometheus 文本格式导出 (/metrics)
+每个请求按阶段 (sql/http/parse/render) 累计耗时，写入 Server-Timing 响应头，浏览器开发者工具中可直接查看；
+可选的采样分析器定时抓取处理请求线程的调用栈，慢请求的栈保存为折叠格式 (flamegraph.pl / speedscope 可直接读取)
+"""
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from urllib.parse import urlparse
+from flask import before_render_template, g, got_request_exception, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 耗时直方图的默认分桶（秒）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 后台任务耗时分桶（秒）
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+# 单个请求执行 SQL 条数的分桶
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# 按首个关键字归类的 SQL 操作，其余归为 OTHER
+SQL_OPERATIONS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'PRAGMA')
+
+# 请求内按阶段累计的耗时 {阶段: [秒数, 次数]}，仅在请求线程中设置
+_phases = ContextVar('metrics_phases', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """带标签的指标基类"""
+    type = 'untyped'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, '')) for label in self.labels)
+
+    def samples(self):
+        """:return: [(样本名, [(标签, 值)], 数值)]"""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """只增计数器"""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, list(zip(self.labels, key)), value) for key, value in items]
+
+
+class Histogram(Metric):
+    """分桶直方图"""
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        samples = []
+        for key, counts, total in items:
+            labels = list(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((self.name + '_bucket', labels + [('le', _format_value(float(bound)))], cumulative))
+            samples.append((self.name + '_sum', labels, round(total, 6)))
+            samples.append((self.name + '_count', labels, cumulative))
+        return samples
+
+
+class Gauge(Metric):
+    """抓取时通过回调计算的瞬时值"""
+    type = 'gauge'
+
+    def __init__(self, name, help, labels=(), collect=None):
+        """
+        :param collect: 回调函数，无标签时返回数值，有标签时返回 {标签值元组: 数值}
+        """
+        super().__init__(name, help, labels)
+        self.collect = collect
+
+    def samples(self):
+        try:
+            values = self.collect()
+        except Exception as e:
+            print(f'采集指标 {self.name} 失败: {e}')
+            return []
+        if not self.labels:
+            return [(self.name, [], values)]
+        return [(self.name, list(zip(self.labels, key)), value) for key, value in values.items()]
+
+
+class CounterFunc(Gauge):
+    """抓取时通过回调读取的累计值（由其他模块自行计数，只增不减）"""
+    type = 'counter'
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, labels=(), collect=None):
+        return self.register(Gauge(name, help, labels, collect))
+
+    def counter_func(self, name, help, labels=(), collect=None):
+        return self.register(CounterFunc(name, help, labels, collect))
+
+    def render(self):
+        """:return: Prometheus 文本格式"""
+        lines = []
+        for metric in self._metrics:
+            samples = metric.samples()
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in samples:
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f'{name}{{{label_text}}} {_format_value(value)}' if label_text
+                             else f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', '请求处理耗时（流式响应只计到响应头返回）', ('method', 'route', 'status'))
+REQUEST_PHASE_SECONDS = registry.histogram(
+    'http_request_phase_seconds', '单个请求内各阶段累计耗时', ('route', 'phase'))
+REQUEST_QUERIES = registry.histogram(
+    'http_request_db_queries', '单个请求执行的 SQL 条数', ('route',), QUERY_COUNT_BUCKETS)
+REQUEST_EXCEPTIONS = registry.counter(
+    'http_request_exceptions_total', '请求处理中未捕获的异常数', ('route', 'exception'))
+SQL_SECONDS = registry.histogram(
+    'db_query_duration_seconds', 'SQL 执行耗时', ('operation',))
+FETCH_SECONDS = registry.histogram(
+    'outbound_request_duration_seconds', '出站请求耗时（不含限速等待）', ('host', 'status'))
+FETCH_WAIT_SECONDS = registry.histogram(
+    'outbound_rate_limit_wait_seconds', '出站请求等待限速许可的耗时', ('host',))
+PHASE_SECONDS = registry.histogram(
+    'app_phase_duration_seconds', '各处理阶段单次耗时（含后台任务）', ('phase',))
+JOB_SECONDS = registry.histogram(
+    'job_duration_seconds', '后台任务执行耗时', ('kind', 'status'), JOB_BUCKETS)
+
+
+def _queue_depth(field):
+    from app.jobs import queue
+    return queue.depth()[field]
+
+
+def _writer_pending():
+    from app.writer import writer
+    return writer.pending()
+
+
+def _pool_stats(field):
+    from app.http_client import client
+    return client.stats()[field]
+
+
+def _host_stats(field):
+    from app.ratelimit import scheduler
+    return {(host, ): state[field] for host, state in scheduler.stats().items()}
+
+
+registry.gauge('job_queue_pending', '排队中的后台任务数', collect=lambda: _queue_depth('pending'))
+registry.gauge('job_workers_busy', '正在执行任务的工作线程数', collect=lambda: _queue_depth('busy'))
+registry.gauge('job_workers', '已启动的工作线程数', collect=lambda: _queue_depth('workers'))
+registry.gauge('db_writer_pending', '排队等待串行写入的写操作数', collect=_writer_pending)
+registry.gauge('process_threads', '进程内线程数', collect=threading.active_count)
+registry.counter_func('outbound_pool_reused_total', '复用已建立连接的出站请求数', collect=lambda: _pool_stats('hits'))
+registry.counter_func('outbound_pool_new_total', '新建连接的出站请求数', collect=lambda: _pool_stats('misses'))
+registry.gauge('outbound_rate_limit_tokens', '各主机令牌桶剩余令牌', ('host',), lambda: _host_stats('tokens'))
+registry.gauge('outbound_backoff_seconds', '各主机剩余退避秒数', ('host',), lambda: _host_stats('backoff'))
+
+
+def _record_phase(name, seconds):
+    PHASE_SECONDS.observe(seconds, phase=name)
+    phases = _phases.get()
+    if phases is not None:
+        total = phases.setdefault(name, [0.0, 0])
+        total[0] += seconds
+        total[1] += 1
+
+
+@contextmanager
+def phase(name):
+    """
+    记录一个处理阶段的耗时
+    :param name: 阶段名，如 parse
+    """
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record_phase(name, time.perf_counter() - start)
+
+
+def record_fetch(url, status, wait, elapsed):
+    """
+    记录一次出站请求
+    :param url: 请求地址
+    :param status: 响应状态码，请求异常时为 error
+    :param wait: 等待限速许可的秒数
+    :param elapsed: 请求本身的秒数
+    """
+    if not enabled:
+        return
+    host = urlparse(url).netloc
+    FETCH_WAIT_SECONDS.observe(wait, host=host)
+    FETCH_SECONDS.observe(elapsed, host=host, status=status)
+    _record_phase('http', elapsed)
+
+
+def record_job(kind, status, elapsed):
+    """记录一次后台任务执行"""
+    if enabled:
+        JOB_SECONDS.observe(elapsed, kind=kind, status=status)
+
+
+# 是否启用计时，由 METRICS_ENABLED 配置控制
+enabled = True
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if enabled:
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('metrics_query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+    SQL_SECONDS.observe(elapsed, operation=operation if operation in SQL_OPERATIONS else 'OTHER')
+    _record_phase('sql', elapsed)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(context):
+    # 执行失败的语句不会触发 after_cursor_execute，丢弃其开始时间
+    starts = context.connection.info.get('metrics_query_start') if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_token = _phases.set({})
+    profiler.begin()
+
+
+def _after_request(response):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    route = _route()
+    phases = _phases.get() or {}
+
+    REQUEST_SECONDS.observe(elapsed, method=request.method, route=route, status=response.status_code)
+    for name, (seconds, _count) in phases.items():
+        REQUEST_PHASE_SECONDS.observe(seconds, route=route, phase=name)
+    REQUEST_QUERIES.observe(phases.get('sql', (0, 0))[1], route=route)
+
+    timings = [f'{name};dur={seconds * 1000:.1f};desc="{count}x"' for name, (seconds, count) in phases.items()]
+    timings.append(f'total;dur={elapsed * 1000:.1f}')
+    response.headers.add('Server-Timing', ', '.join(timings))
+
+    profiler.end(elapsed, f'{request.method} {route}')
+    return response
+
+
+def _teardown_request(exc):
+    # 未进入 after_request（如异常中断）时也要结束采样并恢复上下文
+    if g.pop('metrics_start', None) is not None:
+        profiler.end(0, None)
+    token = g.pop('metrics_token', None)
+    if token is not None:
+        _phases.reset(token)
+
+
+def _before_render(sender, template, context, **extra):
+    g.setdefault('metrics_render_start', []).append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+    starts = g.get('metrics_render_start')
+    if starts:
+        _record_phase('render', time.perf_counter() - starts.pop())
+
+
+def _exception(sender, exception, **extra):
+    REQUEST_EXCEPTIONS.inc(route=_route(), exception=type(exception).__name__)
+
+
+def _fold(frame):
+    """把调用栈折叠为 根;...;当前 形式的一行"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Profiler:
+    """
+    采样分析器
+    后台线程按间隔抓取正在处理请求的线程的调用栈并计数；
+    请求耗时超过阈值时把计数写成折叠格式文件（每行: 栈 次数），否则丢弃
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.interval = 0.005
+        self.slow_seconds = 1.0
+        self.directory = None
+        self.max_files = 200
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._active = {}  # {线程ID: {折叠栈: 次数}}
+        self._thread = None
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PROFILER_ENABLED', self.enabled)
+        self.interval = app.config.get('PROFILER_INTERVAL', self.interval)
+        self.slow_seconds = app.config.get('PROFILER_SLOW_MS', self.slow_seconds * 1000) / 1000
+        self.directory = app.config.get('PROFILER_DIR') or os.path.join(app.instance_path, 'profiles')
+        self.max_files = app.config.get('PROFILER_MAX_FILES', self.max_files)
+
+    def configure(self, enabled=None, slow_ms=None):
+        """运行时开关分析器、调整慢请求阈值"""
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if slow_ms is not None:
+            self.slow_seconds = float(slow_ms) / 1000
+
+    def status(self):
+        return {
+            'enabled': self.enabled,
+            'interval': self.interval,
+            'slow_ms': round(self.slow_seconds * 1000),
+            'directory': self.directory,
+            'files': len(self.files()),
+        }
+
+    def files(self):
+        """已保存的栈文件，按时间倒序"""
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        return sorted((f for f in os.listdir(self.directory) if f.endswith('.folded')), reverse=True)
+
+    def begin(self):
+        """开始采样当前线程"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._active[threading.get_ident()] = {}
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def end(self, elapsed, name):
+        """
+        结束采样当前线程
+        :param elapsed: 请求耗时（秒）
+        :param name: 请求名称，None 表示丢弃
+        """
+        with self._lock:
+            stacks = self._active.pop(threading.get_ident(), None)
+        if stacks and name and elapsed >= self.slow_seconds:
+            try:
+                self._save(name, elapsed, stacks)
+            except OSError as e:
+                print(f'保存调用栈失败: {e}')
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                idle = not self._active
+            if idle:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is None or thread_id == own:
+                        continue
+                    stack = _fold(frame)
+                    stacks[stack] = stacks.get(stack, 0) + 1
+            del frames
+
+    def _save(self, name, elapsed, stacks):
+        os.makedirs(self.directory, exist_ok=True)
+        slug = ''.join(c if c.isalnum() else '_' for c in name).strip('_')[:80]
+        filename = f'{datetime.now():%Y%m%d-%H%M%S-%f}-{round(elapsed * 1000)}ms-{slug}.folded'
+        with open(os.path.join(self.directory, filename), 'w', encoding='utf-8') as f:
+            for stack, count in sorted(stacks.items(), key=lambda item: -item[1]):
+                f.write(f'{stack} {count}\n')
+
+        for old in self.files()[self.max_files:]:
+            os.remove(os.path.join(self.directory, old))
+
+
+# 全局采样分析器实例
+profiler = Profiler()
+
+
+def init_app(app):
+    """注册请求计时钩子和模板渲染、异常信号"""
+    global enabled
+    enabled = app.config.get('METRICS_ENABLED', True)
+    profiler.init_app(app)
+    if not enabled:
+        return
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+    got_request_exception.connect(_exception, app)
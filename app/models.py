@@ -2,7 +2,9 @@
 数据库模型定义
 """
 from datetime import datetime
+from sqlalchemy.ext.associationproxy import association_proxy
 from app import db
+from app.content import CompressedText
 
 
 class User(db.Model):
@@ -18,6 +20,10 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_users_created_id', 'created_at', 'id'),  # 游标分页
+    )
+    
     def __repr__(self):
         return f'<User {self.username}>'
     
@@ -62,7 +68,14 @@ class SearchResult(db.Model):
     engine = db.Column(db.String(20), nullable=True)  # 搜索引擎
     sentiment = db.Column(db.String(20), default='neutral')  # 情感: positive/negative/neutral
     sentiment_score = db.Column(db.Integer, default=0)  # 情感分数
-    crawl_time = db.Column(db.DateTime, default=datetime.utcnow)  # 爬取时间
+    crawl_time = db.Column(db.DateTime, default=datetime.utcnow)  # 爬取时间（最近一次抓到）
+    url_hash = db.Column(db.String(40), nullable=True)  # 规范化链接的 SHA-1
+    engines = db.Column(db.String(100), nullable=True)  # 抓到过该链接的搜索引擎，逗号分隔
+    
+    __table_args__ = (
+        db.Index('ix_search_results_crawl_time_id', 'crawl_time', 'id'),  # 游标分页
+        db.Index('ux_search_results_url', 'keyword', 'url_hash', unique=True),  # 同一关键词下链接去重
+    )
     
     def __repr__(self):
         return f'<SearchResult {self.title[:20]}>'
@@ -78,10 +91,56 @@ class SearchResult(db.Model):
             'engine': self.engine,
             'sentiment': self.sentiment,
             'sentiment_score': self.sentiment_score,
-            'crawl_time': self.crawl_time.strftime('%Y-%m-%d %H:%M:%S') if self.crawl_time else None
+            'crawl_time': self.crawl_time.strftime('%Y-%m-%d %H:%M:%S') if self.crawl_time else None,
+            'engines': self.engines or self.engine
         }
 
 
+class SentimentDaily(db.Model):
+    """情感日汇总模型 - 由 search_results 上的触发器增量维护"""
+    __tablename__ = 'sentiment_daily'
+    
+    keyword = db.Column(db.String(200), primary_key=True)  # 关键词
+    engine = db.Column(db.String(20), primary_key=True)  # 搜索引擎，未知为空串
+    sentiment = db.Column(db.String(20), primary_key=True)  # 情感
+    day = db.Column(db.Date, primary_key=True)  # 爬取日期
+    count = db.Column(db.Integer, nullable=False, default=0)  # 结果数量
+    
+    def __repr__(self):
+        return f'<SentimentDaily {self.keyword} {self.day}>'
+
+
+class SentimentRollup(db.Model):
+    """情感趋势分级汇总模型 - 近期按小时、较早按日、更早按周，由触发器写入、定期逐级压缩"""
+    __tablename__ = 'sentiment_rollup'
+    
+    source = db.Column(db.String(20), primary_key=True)  # 数据来源: search/article
+    keyword = db.Column(db.String(200), primary_key=True)  # 关键词
+    level = db.Column(db.String(10), primary_key=True)  # 汇总粒度: hour/day/week
+    bucket = db.Column(db.String(20), primary_key=True)  # 时间桶起点 (UTC)，小时桶含时分秒
+    engine = db.Column(db.String(20), primary_key=True)  # 搜索引擎，未知及文章为空串
+    sentiment = db.Column(db.String(20), primary_key=True)  # 情感
+    count = db.Column(db.Integer, nullable=False, default=0)  # 数量
+    
+    __table_args__ = (
+        db.Index('ix_sentiment_rollup_bucket', 'source', 'level', 'bucket'),  # 不限关键词的趋势查询
+    )
+    
+    def __repr__(self):
+        return f'<SentimentRollup {self.keyword} {self.level} {self.bucket}>'
+
+
+class RollupWatermark(db.Model):
+    """汇总压缩水位 - 早于 hour 水位的数据已压缩为日桶，早于 day 水位的已压缩为周桶"""
+    __tablename__ = 'rollup_watermarks'
+    
+    level = db.Column(db.String(10), primary_key=True)  # hour/day
+    value = db.Column(db.String(20), nullable=False, default='')  # 水位时间，空串表示尚未压缩
+    
+    def __repr__(self):
+        return f'<RollupWatermark {self.level} {self.value}>'
+
+
 class CrawlTask(db.Model):
     """爬取任务模型"""
     __tablename__ = 'crawl_tasks'
@@ -90,11 +149,21 @@ class CrawlTask(db.Model):
     keyword = db.Column(db.String(200), nullable=False)  # 关键词
     engine = db.Column(db.String(20), default='all')  # 搜索引擎
     pages = db.Column(db.Integer, default=1)  # 爬取页数
-    status = db.Column(db.String(20), default='pending')  # pending/running/completed/failed
+    status = db.Column(db.String(20), default='pending')  # pending/running/completed/failed/cancelled
     result_count = db.Column(db.Integer, default=0)  # 结果数量
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime, nullable=True)
     error_msg = db.Column(db.Text, nullable=True)
+    kind = db.Column(db.String(20), default='crawl')  # 任务类型: crawl/collect
+    priority = db.Column(db.Integer, default=0)  # 优先级，越大越先执行
+    payload = db.Column(db.Text, nullable=True)  # 任务参数 (JSON)
+    cancel_requested = db.Column(db.Boolean, default=False)  # 是否已请求取消
+    started_at = db.Column(db.DateTime, nullable=True)  # 开始执行时间
+    
+    __table_args__ = (
+        db.Index('ix_crawl_tasks_queue', 'status', 'priority', 'id'),
+        db.Index('ix_crawl_tasks_created_id', 'created_at', 'id'),  # 游标分页
+    )
     
     def __repr__(self):
         return f'<CrawlTask {self.keyword}>'
@@ -109,10 +178,71 @@ class CrawlTask(db.Model):
             'result_count': self.result_count,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
             'completed_at': self.completed_at.strftime('%Y-%m-%d %H:%M:%S') if self.completed_at else None,
-            'error_msg': self.error_msg
+            'error_msg': self.error_msg,
+            'kind': self.kind,
+            'priority': self.priority,
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S') if self.started_at else None
+        }
+
+
+class MonitoredKeyword(db.Model):
+    """监控关键词模型 - 按间隔定时增量爬取"""
+    __tablename__ = 'monitored_keywords'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    keyword = db.Column(db.String(200), unique=True, nullable=False)  # 关键词
+    engine = db.Column(db.String(20), default='all')  # 搜索引擎
+    max_pages = db.Column(db.Integer, default=5)  # 每次最多翻页数
+    interval = db.Column(db.Integer, default=3600)  # 爬取间隔（秒）
+    enabled = db.Column(db.Boolean, default=True)  # 是否启用
+    next_run_at = db.Column(db.DateTime, nullable=True)  # 下次爬取时间
+    last_run_at = db.Column(db.DateTime, nullable=True)  # 上次爬取完成时间
+    last_task_id = db.Column(db.Integer, nullable=True)  # 上次入队的任务ID
+    last_pages = db.Column(db.Integer, default=0)  # 上次实际抓取页数
+    last_new_count = db.Column(db.Integer, default=0)  # 上次新增结果数
+    failures = db.Column(db.Integer, default=0)  # 连续失败次数
+    last_error = db.Column(db.Text, nullable=True)  # 上次失败原因
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_monitored_keywords_due', 'enabled', 'next_run_at'),  # 扫描到期关键词
+    )
+    
+    def __repr__(self):
+        return f'<MonitoredKeyword {self.keyword}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'keyword': self.keyword,
+            'engine': self.engine,
+            'max_pages': self.max_pages,
+            'interval': self.interval,
+            'enabled': self.enabled,
+            'next_run_at': self.next_run_at.strftime('%Y-%m-%d %H:%M:%S') if self.next_run_at else None,
+            'last_run_at': self.last_run_at.strftime('%Y-%m-%d %H:%M:%S') if self.last_run_at else None,
+            'last_task_id': self.last_task_id,
+            'last_pages': self.last_pages,
+            'last_new_count': self.last_new_count,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
         }
 
 
+class TaskProgress(db.Model):
+    """任务进度模型 - 多进程共享的采集/爬取进度"""
+    __tablename__ = 'task_progress'
+    
+    task_id = db.Column(db.String(50), primary_key=True)  # 任务ID
+    data = db.Column(db.Text, nullable=False)  # 进度内容 (JSON)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # 过期时间
+    
+    def __repr__(self):
+        return f'<TaskProgress {self.task_id}>'
+
+
 class CollectedData(db.Model):
     """采集数据临时存储模型 - 用于橱窗展示"""
     __tablename__ = 'collected_data'
@@ -125,18 +255,29 @@ class CollectedData(db.Model):
     cover = db.Column(db.String(1000), nullable=True)  # 封面图片URL
     source = db.Column(db.String(200), nullable=True)  # 来源
     abstract = db.Column(db.Text, nullable=True)  # 摘要
-    content = db.Column(db.Text, nullable=True)  # 深度采集的正文内容
     publish_time = db.Column(db.String(100), nullable=True)  # 发布时间
     author = db.Column(db.String(100), nullable=True)  # 作者
     deep_crawled = db.Column(db.Boolean, default=False)  # 是否已深度采集
     is_saved = db.Column(db.Boolean, default=False)  # 是否已保存到数据库
     crawl_time = db.Column(db.DateTime, default=datetime.utcnow)  # 采集时间
+    url_hash = db.Column(db.String(40), nullable=True)  # 规范化链接的 SHA-1
+    simhash = db.Column(db.BigInteger, nullable=True)  # 正文 SimHash 指纹
+    dup_of = db.Column(db.Integer, nullable=True, index=True)  # 近似重复组的代表数据ID
+    
+    # 深度采集的正文（单独的表，访问时才加载）
+    body = db.relationship('CollectedContent', uselist=False, cascade='all, delete-orphan', passive_deletes=True)
+    content = association_proxy('body', 'content', creator=lambda content: CollectedContent(content=content))
+    
+    __table_args__ = (
+        db.Index('ux_collected_data_url', 'task_id', 'url_hash', unique=True),  # 同一批次内链接去重
+    )
     
     def __repr__(self):
         return f'<CollectedData {self.title[:20]}>'
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_content=False):
+        """:param include_content: 是否包含正文（列表接口不加载正文）"""
+        data = {
             'id': self.id,
             'task_id': self.task_id,
             'keyword': self.keyword,
@@ -145,13 +286,39 @@ class CollectedData(db.Model):
             'cover': self.cover,
             'source': self.source,
             'abstract': self.abstract,
-            'content': self.content,
             'publish_time': self.publish_time,
             'author': self.author,
             'deep_crawled': self.deep_crawled,
             'is_saved': self.is_saved,
-            'crawl_time': self.crawl_time.strftime('%Y-%m-%d %H:%M:%S') if self.crawl_time else None
+            'crawl_time': self.crawl_time.strftime('%Y-%m-%d %H:%M:%S') if self.crawl_time else None,
+            'dup_of': self.dup_of
         }
+        if include_content:
+            data['content'] = self.content
+        return data
+
+
+class CollectedContent(db.Model):
+    """采集数据正文模型 - 与 collected_data 一对一，压缩存储"""
+    __tablename__ = 'collected_content'
+    
+    data_id = db.Column(db.Integer, db.ForeignKey('collected_data.id', ondelete='CASCADE'), primary_key=True)
+    content = db.Column(CompressedText, nullable=True)  # 正文内容
+    
+    def __repr__(self):
+        return f'<CollectedContent {self.data_id}>'
+
+
+class SimhashBand(db.Model):
+    """SimHash 分段索引模型 - 按段值查找近似重复的候选数据"""
+    __tablename__ = 'simhash_bands'
+    
+    band = db.Column(db.SmallInteger, primary_key=True)  # 段号
+    value = db.Column(db.Integer, primary_key=True)  # 段值
+    data_id = db.Column(db.Integer, primary_key=True, index=True)  # 采集数据ID
+    
+    def __repr__(self):
+        return f'<SimhashBand {self.band}:{self.value}>'
 
 
 class ArticleData(db.Model):
@@ -165,7 +332,6 @@ class ArticleData(db.Model):
     cover = db.Column(db.String(1000), nullable=True)  # 封面图片
     source = db.Column(db.String(200), nullable=True)  # 来源
     abstract = db.Column(db.Text, nullable=True)  # 摘要
-    content = db.Column(db.Text, nullable=True)  # 正文内容
     publish_time = db.Column(db.String(100), nullable=True)  # 发布时间
     author = db.Column(db.String(100), nullable=True)  # 作者
     sentiment = db.Column(db.String(20), default='neutral')  # 情感分析结果
@@ -175,12 +341,23 @@ class ArticleData(db.Model):
     status = db.Column(db.String(20), default='active')  # active/archived/deleted
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    url_hash = db.Column(db.String(40), nullable=True)  # 规范化链接的 SHA-1
+    
+    # 正文（单独的表，访问时才加载）
+    body = db.relationship('ArticleContent', uselist=False, cascade='all, delete-orphan', passive_deletes=True)
+    content = association_proxy('body', 'content', creator=lambda content: ArticleContent(content=content))
+    
+    __table_args__ = (
+        db.Index('ix_article_data_created_id', 'created_at', 'id'),  # 游标分页
+        db.Index('ux_article_data_url', 'url_hash', unique=True),  # 同一链接只保存一篇
+    )
     
     def __repr__(self):
         return f'<ArticleData {self.title[:20]}>'
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_content=False):
+        """:param include_content: 是否包含正文（列表接口不加载正文）"""
+        data = {
             'id': self.id,
             'keyword': self.keyword,
             'title': self.title,
@@ -188,7 +365,6 @@ class ArticleData(db.Model):
             'cover': self.cover,
             'source': self.source,
             'abstract': self.abstract,
-            'content': self.content,
             'publish_time': self.publish_time,
             'author': self.author,
             'sentiment': self.sentiment,
@@ -198,3 +374,17 @@ class ArticleData(db.Model):
             'status': self.status,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
         }
+        if include_content:
+            data['content'] = self.content
+        return data
+
+
+class ArticleContent(db.Model):
+    """文章正文模型 - 与 article_data 一对一，压缩存储"""
+    __tablename__ = 'article_content'
+    
+    article_id = db.Column(db.Integer, db.ForeignKey('article_data.id', ondelete='CASCADE'), primary_key=True)
+    content = db.Column(CompressedText, nullable=True)  # 正文内容
+    
+    def __repr__(self):
+        return f'<ArticleContent {self.article_id}>'
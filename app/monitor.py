@@ -0,0 +1,196 @@
+"""
+关键词监控模块 - 按间隔把到期的监控关键词作为 monitor 任务放入后台任务队列
+调度线程定时扫描 next_run_at 已到期的关键词，用条件更新领取后入队，多进程部署时同一关键词只会被一个进程入队；
+新登记的关键词在一个间隔内随机安排首次爬取，之后每次的间隔带随机抖动，每次扫描的入队数有上限、队列积压时暂停入队，
+避免大量关键词集中在同一时刻爬取。任务本身只抓取到已入库的结果为止（见 tasks.run_monitor）
+"""
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import db
+from app.bulk import chunked
+from app.jobs import queue, new_task
+from app.models import CrawlTask, MonitoredKeyword
+from app.writer import writer
+
+
+def _schedule(monitor_id, expected, next_run, priority, enqueue=True):
+    """
+    领取到期的关键词：next_run_at 仍为扫描时的值才更新为下次时间，并按需入队
+    :return: 入队的任务ID，未领取到或只顺延时返回 None
+    """
+    claimed = db.session.execute(
+        update(MonitoredKeyword)
+        .where(MonitoredKeyword.id == monitor_id, MonitoredKeyword.next_run_at == expected)
+        .values(next_run_at=next_run)
+    ).rowcount
+    if not claimed or not enqueue:
+        return None
+
+    monitor = db.session.get(MonitoredKeyword, monitor_id)
+    task = new_task('monitor', monitor.keyword, monitor.engine, monitor.max_pages,
+                    payload={'monitor_id': monitor_id}, priority=priority)
+    db.session.add(task)
+    db.session.flush()
+    monitor.last_task_id = task.id
+    return task.id
+
+
+# 连续失败时下次爬取间隔的最大倍数
+MAX_BACKOFF = 8
+
+
+def record_run(monitor_id, pages, new_count, error=None):
+    """
+    记录一次监控爬取的结果（失败时也记录）
+    连续失败时按失败次数成倍推迟下次爬取（最多 MAX_BACKOFF 倍间隔），成功后恢复
+    :param error: 失败原因，成功时为 None
+    """
+    monitor = db.session.get(MonitoredKeyword, monitor_id)
+    if monitor is None:
+        return
+    now = datetime.utcnow()
+    monitor.last_run_at = now
+    monitor.last_pages = pages
+    monitor.last_new_count = new_count
+    if error is None:
+        monitor.failures = 0
+        monitor.last_error = None
+        return
+
+    monitor.failures = (monitor.failures or 0) + 1
+    monitor.last_error = error[:500]
+    backoff = min(2 ** monitor.failures, MAX_BACKOFF)
+    next_run = monitors.next_run(monitor.interval * backoff, now)
+    if monitor.next_run_at is None or monitor.next_run_at < next_run:
+        monitor.next_run_at = next_run
+
+
+class MonitorScheduler:
+    """监控关键词的调度线程"""
+
+    def __init__(self):
+        self.app = None
+        self.enabled = True
+        self.poll_interval = 30
+        self.batch = 20
+        self.max_pending = 50
+        self.jitter = 0.1
+        self.min_interval = 300
+        self.priority = -1
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        """绑定应用并读取配置，首个请求到来时启动调度线程"""
+        self.app = app
+        self.enabled = app.config.get('MONITOR_ENABLED', self.enabled)
+        self.poll_interval = app.config.get('MONITOR_POLL_INTERVAL', self.poll_interval)
+        self.batch = app.config.get('MONITOR_BATCH', self.batch)
+        self.max_pending = app.config.get('MONITOR_MAX_PENDING', self.max_pending)
+        self.jitter = app.config.get('MONITOR_JITTER', self.jitter)
+        self.min_interval = app.config.get('MONITOR_MIN_INTERVAL', self.min_interval)
+        self.priority = app.config.get('MONITOR_PRIORITY', self.priority)
+
+        # 与任务队列相同，只在处理请求的进程中启动
+        app.before_request(self.start)
+
+    def start(self):
+        """启动调度线程（幂等）"""
+        if self._thread is not None or not self.enabled or self.app is None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='monitor-scheduler', daemon=True)
+                self._thread.start()
+
+    def next_run(self, interval, now=None, first=False):
+        """
+        计算下次爬取时间
+        :param interval: 爬取间隔（秒）
+        :param first: 是否为首次爬取（在一个间隔内均匀分布）
+        """
+        now = now or datetime.utcnow()
+        if first:
+            delay = random.uniform(0, interval)
+        else:
+            delay = interval * (1 + random.uniform(-self.jitter, self.jitter))
+        return now + timedelta(seconds=delay)
+
+    def register(self, keywords, engine='all', max_pages=5, interval=3600):
+        """
+        登记监控关键词，已登记的关键词跳过（不提交）
+        :return: 新登记的数量
+        """
+        interval = max(int(interval), self.min_interval)
+        now = datetime.utcnow()
+        rows = [{
+            'keyword': keyword,
+            'engine': engine,
+            'max_pages': max_pages,
+            'interval': interval,
+            'enabled': True,
+            'next_run_at': self.next_run(interval, now, first=True),
+            'created_at': now,
+        } for keyword in dict.fromkeys(keywords)]
+        count = 0
+        for batch in chunked(rows, 500):
+            count += db.session.execute(
+                sqlite_insert(MonitoredKeyword).values(batch).on_conflict_do_nothing(index_elements=['keyword'])
+            ).rowcount
+        return count
+
+    def tick(self, now=None):
+        """
+        入队到期的关键词
+        :return: 入队的任务数
+        """
+        if queue.depth()['pending'] >= self.max_pending:
+            return 0
+
+        now = now or datetime.utcnow()
+        due = db.session.execute(
+            select(MonitoredKeyword.id, MonitoredKeyword.next_run_at, MonitoredKeyword.interval,
+                   MonitoredKeyword.last_task_id)
+            .where(MonitoredKeyword.enabled.is_(True), MonitoredKeyword.next_run_at <= now)
+            .order_by(MonitoredKeyword.next_run_at)
+            .limit(self.batch)
+        ).all()
+        if not due:
+            return 0
+
+        # 上次的任务还在排队或执行时只顺延，不重复入队
+        last_ids = [row.last_task_id for row in due if row.last_task_id]
+        busy = set(db.session.execute(
+            select(CrawlTask.id).where(CrawlTask.id.in_(last_ids), CrawlTask.status.in_(('pending', 'running')))
+        ).scalars()) if last_ids else set()
+
+        count = 0
+        for row in due:
+            enqueue = row.last_task_id not in busy
+            task_id = writer.run(_schedule, row.id, row.next_run_at, self.next_run(row.interval, now),
+                                 self.priority, enqueue)
+            if task_id is not None:
+                count += 1
+        if count:
+            queue.notify()
+        return count
+
+    def _run(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    self.tick()
+                except Exception as e:
+                    print(f'监控调度失败: {e}')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+            time.sleep(self.poll_interval)
+
+
+# 全局监控调度实例
+monitors = MonitorScheduler()
@@ -0,0 +1,186 @@
+"""
+分页模块 - 基于游标 (keyset) 的分页与总数缓存
+按 (排序列, id) 降序做 keyset 分页，翻页代价与页码无关；
+为兼容 Layui 的 page/limit 参数，记录每页末行的游标（书签），顺序翻页直接命中书签，
+首次跳转到远处页码时从最近的书签出发，只在排序索引上定位起点。总数带 TTL 缓存，过期后先返回旧值并在后台刷新
+"""
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func, select, tuple_
+from app import db
+
+
+class CountCache:
+    """总数缓存：过期后返回旧值，同时在后台线程刷新"""
+
+    def __init__(self, ttl=60, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._values = OrderedDict()  # key -> (总数, 计算时间)
+        self._refreshing = set()
+
+    def get(self, key, statement):
+        """
+        :param key: 缓存键（表及过滤条件）
+        :param statement: 计算总数的 SELECT count(*) 语句
+        :return: 总数
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._values.get(key)
+            if cached is not None:
+                self._values.move_to_end(key)
+                if now - cached[1] < self.ttl or key in self._refreshing:
+                    return cached[0]
+                self._refreshing.add(key)
+
+        if cached is None:
+            value = db.session.execute(statement).scalar()
+            self._store(key, value)
+            return value
+
+        app = current_app._get_current_object()
+        threading.Thread(target=self._refresh, args=(app, key, statement), daemon=True).start()
+        return cached[0]
+
+    def _refresh(self, app, key, statement):
+        try:
+            with app.app_context():
+                value = db.session.execute(statement).scalar()
+                db.session.remove()
+            self._store(key, value)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key, value):
+        with self._lock:
+            self._values[key] = (value, time.monotonic())
+            self._values.move_to_end(key)
+            while len(self._values) > self.max_entries:
+                self._values.popitem(last=False)
+
+
+class Bookmarks:
+    """页码 -> 该页起始游标 的书签，按列表键分组并带 TTL"""
+
+    def __init__(self, ttl=60, max_lists=500):
+        self.ttl = ttl
+        self.max_lists = max_lists
+        self._lock = threading.Lock()
+        self._lists = OrderedDict()  # key -> (创建时间, {页码: 游标})
+
+    def nearest(self, key, page):
+        """:return: (不大于 page 的最近书签页码, 游标)，没有书签时返回 (1, None)"""
+        with self._lock:
+            entry = self._lists.get(key)
+            if entry is None or time.monotonic() - entry[0] >= self.ttl:
+                self._lists.pop(key, None)
+                return 1, None
+            marks = entry[1]
+            known = [p for p in marks if p <= page]
+            if not known:
+                return 1, None
+            best = max(known)
+            return best, marks[best]
+
+    def save(self, key, page, cursor):
+        with self._lock:
+            entry = self._lists.get(key)
+            if entry is None or time.monotonic() - entry[0] >= self.ttl:
+                entry = (time.monotonic(), {})
+                self._lists[key] = entry
+            entry[1][page] = cursor
+            self._lists.move_to_end(key)
+            while len(self._lists) > self.max_lists:
+                self._lists.popitem(last=False)
+
+
+count_cache = CountCache()
+bookmarks = Bookmarks()
+
+
+def init_app(app):
+    """从应用配置加载缓存时间"""
+    ttl = app.config.get('PAGINATION_CACHE_TTL', 60)
+    count_cache.ttl = ttl
+    bookmarks.ttl = ttl
+
+
+def encode_cursor(values):
+    """把末行排序值编码为不透明的游标字符串"""
+    raw = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(raw).encode()).decode()
+
+
+def decode_cursor(cursor, columns):
+    """解析游标，格式不正确时返回 None"""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        values = []
+        for column, value in zip(columns, raw):
+            if value is not None and isinstance(column.type, db.DateTime):
+                value = datetime.fromisoformat(value)
+            values.append(value)
+        return values if len(values) == len(columns) else None
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_paginate(query, columns, page=1, limit=10, cursor=None, key=None):
+    """
+    按 columns 降序分页
+    :param query: 已附加过滤条件、未排序的 ORM 查询
+    :param columns: 排序列，最后一列须唯一（通常为主键）
+    :param page: 页码（Layui 兼容）
+    :param limit: 每页条数
+    :param cursor: 客户端传回的 next_cursor，优先于页码
+    :param key: 列表键（表名+过滤条件），用于总数缓存和页码书签（书签另按每页条数区分）
+    :return: {'items', 'total', 'next_cursor'}
+    """
+    page = max(page, 1)
+    limit = max(min(limit, 1000), 1)
+    key = key or str(query.statement)
+
+    # 总数缓存
+    count_statement = select(func.count()).select_from(query.order_by(None).statement.subquery())
+    total = count_cache.get(('count', key), count_statement)
+
+    # 确定起始游标：客户端游标 > 书签 > 从第 1 页开始
+    values = decode_cursor(cursor, columns) if cursor else None
+    offset = 0
+    if values is None:
+        start_page, start_cursor = bookmarks.nearest(('pages', key, limit), page)
+        values = decode_cursor(start_cursor, columns) if start_cursor else None
+        offset = (page - start_page) * limit
+
+    ordered = query.order_by(*[column.desc() for column in columns])
+    if values is not None:
+        ordered = ordered.filter(tuple_(*columns) < tuple_(*values))
+
+    # 没有书签时只在排序索引上跳过 offset 行取得本页起点（覆盖索引，不回表），再按游标取整页
+    if offset > 0:
+        boundary = ordered.with_entities(*columns).offset(offset - 1).limit(1).first()
+        if boundary is None:
+            return {'items': [], 'total': total, 'next_cursor': None}
+        values = list(boundary)
+        bookmarks.save(('pages', key, limit), page, encode_cursor(values))
+        ordered = query.order_by(*[column.desc() for column in columns]) \
+            .filter(tuple_(*columns) < tuple_(*values))
+
+    items = ordered.limit(limit).all()
+
+    next_cursor = None
+    if len(items) == limit:
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+        if not cursor:
+            bookmarks.save(('pages', key, limit), page + 1, next_cursor)
+
+    return {'items': items, 'total': total, 'next_cursor': next_cursor}
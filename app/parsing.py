@@ -0,0 +1,75 @@
+"""
+HTML 解析模块 - 可切换的 BeautifulSoup 解析后端
+默认优先使用 C 实现的 lxml，未安装时退回 Python 实现的 html.parser；
+搜索结果页只解析结果容器 (SoupStrainer)，跳过导航、脚本等无关部分
+"""
+from bs4 import BeautifulSoup, SoupStrainer
+from app.metrics import phase
+
+# 按优先级排列的解析后端
+PARSERS = ('lxml', 'html.parser')
+
+
+def _installed(parser):
+    if parser == 'lxml':
+        try:
+            import lxml  # noqa: F401
+        except ImportError:
+            return False
+    return True
+
+
+def default_parser():
+    """返回已安装的最快解析后端"""
+    for parser in PARSERS:
+        if _installed(parser):
+            return parser
+    return 'html.parser'
+
+
+# 当前使用的解析后端，可通过 HTML_PARSER 配置覆盖
+parser = default_parser()
+
+
+def init_app(app):
+    """从应用配置加载解析后端，指定的后端未安装时保留默认值"""
+    global parser
+    configured = app.config.get('HTML_PARSER')
+    if configured and _installed(configured):
+        parser = configured
+
+
+def has_class(*names):
+    """
+    构造按 class 匹配的条件
+    解析过程中 class 属性尚未拆分为列表，多个 class 的元素需要按空格拆开后匹配
+    """
+    wanted = set(names)
+
+    def match(value):
+        if not value:
+            return False
+        classes = value.split() if isinstance(value, str) else value
+        return not wanted.isdisjoint(classes)
+    return match
+
+
+# 搜索结果页的结果容器
+SERP_STRAINERS = {
+    'baidu': SoupStrainer(class_=has_class('c-container')),
+    'bing': SoupStrainer(class_=has_class('b_algo', 'b_ans')),
+}
+
+
+def make_soup(html, only=None, backend=None):
+    """
+    解析 HTML
+    :param html: 页面 HTML
+    :param only: SERP_STRAINERS 中的键或 SoupStrainer，只解析匹配的元素
+    :param backend: 指定解析后端，默认使用当前后端
+    :return: BeautifulSoup 对象
+    """
+    strainer = SERP_STRAINERS.get(only) if isinstance(only, str) else only
+    with phase('parse'):
+        return BeautifulSoup(html, backend or parser, parse_only=strainer)
+
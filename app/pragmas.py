@@ -0,0 +1,30 @@
+"""
+SQLite 连接参数模块 - 每个新连接建立时执行配置的 PRAGMA
+生产环境使用 WAL 日志（读写互不阻塞）、synchronous=NORMAL、内存映射读、较大的页缓存，
+并设置 busy_timeout，锁被占用时等待而不是立即报 database is locked
+"""
+import sqlite3
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 当前生效的 PRAGMA，由 SQLITE_PRAGMAS 配置加载
+pragmas = {}
+
+
+def init_app(app):
+    """从应用配置加载 PRAGMA，须在首次连接数据库前调用"""
+    pragmas.clear()
+    pragmas.update(app.config.get('SQLITE_PRAGMAS') or {})
+
+
+@event.listens_for(Engine, 'connect')
+def _apply_pragmas(dbapi_connection, connection_record):
+    if not pragmas or not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
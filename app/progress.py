@@ -0,0 +1,213 @@
+"""
+任务进度存储模块 - 可插拔的进度存储
+database 后端把进度写入 task_progress 表，多个进程共享；memory 后端仅用于单进程开发调试。
+进度更新先写入本进程缓冲区，按间隔批量落库，状态变化等关键更新立即落库；过期进度按 TTL 清理
+"""
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import db
+from app.models import TaskProgress
+from app.writer import writer
+
+# 终态，写入时立即落库
+TERMINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+class ProgressStore:
+    """
+    进度存储基类，负责缓冲与节流，子类实现读写
+    缓冲区只记录变化的字段，落库时按字段合并，多个进程更新同一任务不会互相覆盖
+    """
+
+    def __init__(self, ttl=86400, flush_interval=0.5, evict_interval=60):
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.evict_interval = evict_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # 保证同一任务的更新按顺序写入
+        self._pending = {}  # {task_id: (是否整体替换, 变化字段)}
+        self._last_flush = 0.0
+        self._last_evict = time.monotonic()
+
+    def create(self, task_id, **fields):
+        """创建（或覆盖）任务进度，立即落库"""
+        with self._lock:
+            self._pending[task_id] = (True, dict(fields))
+        self.flush()
+
+    def update(self, task_id, force=False, **fields):
+        """
+        更新任务进度字段
+        :param task_id: 任务ID
+        :param force: 是否立即落库
+        :param fields: 要更新的字段
+        """
+        with self._lock:
+            replace, delta = self._pending.get(task_id, (False, {}))
+            delta.update(fields)
+            self._pending[task_id] = (replace, delta)
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+
+        if force or due or fields.get('status') in TERMINAL_STATUSES:
+            self.flush()
+
+    def get(self, task_id):
+        """
+        读取任务进度，叠加本进程尚未落库的更新
+        :return: 进度字典，不存在或已过期时返回 None
+        """
+        with self._lock:
+            pending = self._pending.get(task_id)
+            replace, delta = pending if pending else (False, {})
+            delta = dict(delta)
+
+        if replace:
+            return delta
+        doc = self._read(task_id)
+        if doc is None:
+            return delta or None
+        doc.update(delta)
+        return doc
+
+    def flush(self):
+        """把缓冲的更新批量写入后端，并按间隔清理过期进度"""
+        with self._flush_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = {}
+                self._last_flush = time.monotonic()
+
+            if pending:
+                self._write(pending)
+
+        if time.monotonic() - self._last_evict >= self.evict_interval:
+            self._last_evict = time.monotonic()
+            self._evict()
+
+    def _read(self, task_id):
+        raise NotImplementedError
+
+    def _write(self, pending):
+        """:param pending: {task_id: (是否整体替换, 变化字段)}"""
+        raise NotImplementedError
+
+    def _evict(self):
+        raise NotImplementedError
+
+
+class MemoryProgressStore(ProgressStore):
+    """进程内存后端"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._data = {}
+
+    def _read(self, task_id):
+        item = self._data.get(task_id)
+        if item is None or item[1] < time.time():
+            return None
+        return dict(item[0])
+
+    def _write(self, pending):
+        expires = time.time() + self.ttl
+        for task_id, (replace, delta) in pending.items():
+            doc = {} if replace else (self._read(task_id) or {})
+            doc.update(delta)
+            self._data[task_id] = (doc, expires)
+
+    def _evict(self):
+        now = time.time()
+        for task_id in [key for key, (_, expires) in list(self._data.items()) if expires < now]:
+            self._data.pop(task_id, None)
+
+
+class DatabaseProgressStore(ProgressStore):
+    """数据库后端 - task_progress 表，同一数据库上的所有进程共享"""
+
+    def _read(self, task_id):
+        with db.engine.connect() as conn:
+            data = conn.execute(
+                select(TaskProgress.data)
+                .where(TaskProgress.task_id == task_id, TaskProgress.expires_at >= datetime.utcnow())
+            ).scalar()
+        return json.loads(data) if data else None
+
+    def _write(self, pending):
+        now = datetime.utcnow()
+        expires = now + timedelta(seconds=self.ttl)
+        rows = {True: [], False: []}
+        for task_id, (replace, delta) in pending.items():
+            rows[replace].append({
+                'task_id': task_id,
+                'data': json.dumps(delta, ensure_ascii=False),
+                'updated_at': now,
+                'expires_at': expires
+            })
+
+        # 整体替换直接覆盖；字段更新用 json_patch 在库内合并
+        table = TaskProgress.__table__
+        stmt = sqlite_insert(TaskProgress)
+        merge = {
+            True: stmt.excluded.data,
+            False: func.json_patch(table.c.data, stmt.excluded.data),
+        }
+
+        statements = [
+            (stmt.on_conflict_do_update(
+                index_elements=[table.c.task_id],
+                set_={'data': merge[replace], 'updated_at': stmt.excluded.updated_at, 'expires_at': stmt.excluded.expires_at}
+            ), batch)
+            for replace, batch in rows.items() if batch
+        ]
+        self._execute(statements)
+
+    def _evict(self):
+        self._execute([(delete(TaskProgress).where(TaskProgress.expires_at < datetime.utcnow()), None)])
+
+    @staticmethod
+    def _execute(statements):
+        """
+        执行写语句：启用串行写入时交给写线程，否则使用独立连接写入，不干扰调用方会话中的事务
+        :param statements: [(语句, 参数)]
+        """
+        if writer.enabled or writer.in_writer():
+            writer.run(_execute_in_session, statements)
+            return
+        with db.engine.begin() as conn:
+            for statement, params in statements:
+                conn.execute(statement, params)
+
+
+def _execute_in_session(statements):
+    for statement, params in statements:
+        db.session.execute(statement, params)
+
+
+class ProgressManager:
+    """按配置选择后端的进度存储代理"""
+
+    backends = {
+        'database': DatabaseProgressStore,
+        'memory': MemoryProgressStore,
+    }
+
+    def __init__(self):
+        self.store = MemoryProgressStore()
+
+    def init_app(self, app):
+        backend = app.config.get('PROGRESS_BACKEND', 'database')
+        self.store = self.backends[backend](
+            ttl=app.config.get('PROGRESS_TTL', 86400),
+            flush_interval=app.config.get('PROGRESS_FLUSH_INTERVAL', 0.5)
+        )
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+# 全局进度存储
+progress = ProgressManager()
@@ -0,0 +1,177 @@
+"""
+按主机的请求调度模块 - 进程级令牌桶限速
+所有爬虫实例、采集线程和深度采集共享同一个调度器，保证对同一主机的请求
+不超过配置的速率、突发量和并发数，遇到 429/5xx 时自动退避
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+# 默认限速策略: 每秒令牌数、桶容量、最大并发、退避基数和上限（秒）
+DEFAULT_POLICY = {
+    'rate': 0.5,
+    'burst': 2,
+    'concurrency': 2,
+    'backoff_base': 2.0,
+    'backoff_max': 60.0,
+}
+
+
+class HostState:
+    """单个主机的令牌桶及退避状态"""
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.tokens = float(policy['burst'])
+        self.updated = time.monotonic()
+        self.backoff_until = 0.0
+        self.failures = 0
+        self.semaphore = threading.BoundedSemaphore(policy['concurrency'])
+
+    def reserve(self, now):
+        """
+        预约一个令牌
+        :param now: 当前时间
+        :return: 需要等待的秒数
+        """
+        rate = self.policy['rate']
+        burst = self.policy['burst']
+
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        self.tokens -= 1
+
+        wait = -self.tokens / rate if self.tokens < 0 else 0.0
+        return max(wait, self.backoff_until - now)
+
+
+class Slot:
+    """一次请求占用的调度槽位，用于回报响应状态"""
+
+    def __init__(self, scheduler, host):
+        self.scheduler = scheduler
+        self.host = host
+        self.reported = False
+
+    def feedback(self, status_code, retry_after=None):
+        """
+        回报响应状态码，429/5xx 触发退避
+        :param status_code: HTTP 状态码，None 表示请求异常
+        :param retry_after: 服务器返回的 Retry-After 秒数
+        """
+        self.reported = True
+        self.scheduler.feedback(self.host, status_code, retry_after)
+
+
+class HostScheduler:
+    """进程级的按主机限速调度器"""
+
+    def __init__(self, default=None, hosts=None):
+        self._lock = threading.Lock()
+        self._states = {}
+        self.configure(default, hosts)
+
+    def init_app(self, app):
+        """从应用配置加载限速策略"""
+        self.configure(
+            app.config.get('CRAWLER_RATE_DEFAULT'),
+            app.config.get('CRAWLER_RATE_LIMITS')
+        )
+
+    def configure(self, default=None, hosts=None):
+        """
+        设置限速策略，已有主机状态会按新策略重建
+        :param default: 默认策略，缺省字段取 DEFAULT_POLICY
+        :param hosts: {主机名: 策略} 的覆盖配置
+        """
+        with self._lock:
+            self.default = dict(DEFAULT_POLICY, **(default or {}))
+            self.hosts = {host: dict(self.default, **policy) for host, policy in (hosts or {}).items()}
+            self._states = {}
+
+    def _state(self, host):
+        state = self._states.get(host)
+        if state is None:
+            state = HostState(self.hosts.get(host, self.default))
+            self._states[host] = state
+        return state
+
+    @contextmanager
+    def slot(self, url):
+        """
+        获取向该地址所在主机发起请求的许可
+        先占用并发名额，再按令牌桶和退避时间等待；请求抛出异常时视为失败并退避
+        :param url: 请求地址
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            state = self._state(host)
+
+        state.semaphore.acquire()
+        try:
+            with self._lock:
+                wait = state.reserve(time.monotonic())
+            if wait > 0:
+                time.sleep(wait)
+
+            slot = Slot(self, host)
+            try:
+                yield slot
+            except Exception:
+                if not slot.reported:
+                    self.feedback(host, None)
+                raise
+        finally:
+            state.semaphore.release()
+
+    def feedback(self, host, status_code, retry_after=None):
+        """
+        根据响应状态更新主机退避状态
+        :param host: 主机名
+        :param status_code: HTTP 状态码，None 表示请求异常
+        :param retry_after: 服务器返回的 Retry-After 秒数
+        """
+        with self._lock:
+            state = self._state(host)
+
+            if status_code is not None and status_code != 429 and status_code < 500:
+                state.failures = 0
+                return
+
+            state.failures += 1
+            policy = state.policy
+            delay = min(policy['backoff_max'], policy['backoff_base'] * 2 ** (state.failures - 1))
+            delay = delay * random.uniform(0.5, 1.0)
+            if retry_after:
+                delay = max(delay, min(float(retry_after), policy['backoff_max']))
+
+            state.backoff_until = max(state.backoff_until, time.monotonic() + delay)
+
+    def stats(self):
+        """各主机当前的令牌数和退避状态"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                host: {
+                    'tokens': round(state.tokens, 2),
+                    'failures': state.failures,
+                    'backoff': round(max(0.0, state.backoff_until - now), 2),
+                }
+                for host, state in self._states.items()
+            }
+
+
+def retry_after_seconds(response):
+    """解析响应头中的 Retry-After（仅支持秒数形式）"""
+    value = response.headers.get('Retry-After') if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+# 全局调度器实例
+scheduler = HostScheduler()
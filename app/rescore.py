@@ -0,0 +1,91 @@
+"""
+情感重算模块 - 词典变化后批量重算已入库数据的情感
+按主键分块流式读取，分发到进程池计算，再用批量 UPDATE 写回有变化的行
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import select, update
+from app import db
+from app.crawler import SentimentAnalyzer
+
+# 工作进程内复用的分析器
+_analyzer = None
+
+
+def _score_chunk(rows):
+    """
+    在工作进程中计算一个分块的情感
+    :param rows: [(id, 文本, 原情感, 原分数)] 列表
+    :return: 情感有变化的行 [{'id', 'sentiment', 'sentiment_score'}]
+    """
+    global _analyzer
+    if _analyzer is None:
+        _analyzer = SentimentAnalyzer()
+
+    results = _analyzer.analyze_many([text for _, text, _, _ in rows])
+    changed = []
+    for (row_id, _, sentiment, score), result in zip(rows, results):
+        if result['sentiment'] != sentiment or result['score'] != score:
+            changed.append({'id': row_id, 'sentiment': result['sentiment'], 'sentiment_score': result['score']})
+    return changed
+
+
+def _iter_chunks(model, chunk_size):
+    """按主键顺序分块读取 (id, 标题+摘要, 情感, 分数)"""
+    last_id = 0
+    while True:
+        stmt = (
+            select(model.id, model.title, model.abstract, model.sentiment, model.sentiment_score)
+            .where(model.id > last_id)
+            .order_by(model.id)
+            .limit(chunk_size)
+        )
+        rows = db.session.execute(stmt).all()
+        db.session.rollback()  # 结束读事务，避免长时间持有快照
+        if not rows:
+            break
+
+        yield [
+            (row.id, (row.title or '') + ' ' + (row.abstract or ''), row.sentiment, row.sentiment_score)
+            for row in rows
+        ]
+        last_id = rows[-1].id
+
+
+def rescore_table(model, chunk_size=2000, workers=None, log=print):
+    """
+    重算一张表的情感字段（需在应用上下文中调用）
+    :param model: SearchResult 或 ArticleData
+    :param chunk_size: 每个分块的行数
+    :param workers: 进程数，默认为 CPU 核数
+    :param log: 进度输出函数
+    :return: (扫描行数, 更新行数)
+    """
+    scanned = 0
+    updated = 0
+    workers = workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # 在途分块数有上限，保证内存占用不随表大小增长
+        in_flight = []
+        max_in_flight = workers * 2
+
+        def drain(limit):
+            nonlocal updated
+            while len(in_flight) > limit:
+                changed = in_flight.pop(0).result()
+                if changed:
+                    db.session.execute(update(model), changed)
+                    db.session.commit()
+                    updated += len(changed)
+
+        for rows in _iter_chunks(model, chunk_size):
+            in_flight.append(pool.submit(_score_chunk, rows))
+            scanned += len(rows)
+            drain(max_in_flight)
+            log(f'[{model.__tablename__}] 已扫描 {scanned} 行，已更新 {updated} 行')
+
+        drain(0)
+
+    log(f'[{model.__tablename__}] 重算完成: 扫描 {scanned} 行，更新 {updated} 行')
+    return scanned, updated
@@ -0,0 +1,214 @@
+"""
+数据保留模块 - collected_data 临时表的过期清理、归档与空间回收
+最后一次采集早于保留期的批次视为过期：未保存的数据先写入 gzip 压缩的 NDJSON 归档文件（已保存的数据在 article_data 中），
+再按块删除（每块一个短事务，连同 simhash_bands 分段索引），避免长时间持有写锁；
+数据库为 auto_vacuum=INCREMENTAL 时，删除后用 incremental_vacuum 分批把空闲页归还文件系统
+"""
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, select, text
+from app import db
+from app.maintenance import periodic
+from app.metrics import registry
+from app.models import CollectedData, CollectedContent, SimhashBand
+from app.writer import writer
+
+RETENTION_ROWS = registry.counter(
+    'retention_rows_total', '数据保留任务处理的行数 (archived/purged)', ('action',))
+
+# 正在执行的批次不清理
+ACTIVE_STATUSES = ('pending', 'running')
+
+
+def archive_dir():
+    """归档目录，默认为 instance/archive/collected"""
+    return current_app.config.get('COLLECT_ARCHIVE_DIR') or os.path.join(
+        current_app.instance_path, 'archive', 'collected')
+
+
+def stale_batches(cutoff, limit=None):
+    """
+    最后一次采集早于 cutoff 的批次
+    :return: [(批次ID, 最后采集时间, 行数)]，最早的在前
+    """
+    last = func.max(CollectedData.crawl_time)
+    query = (
+        select(CollectedData.task_id, last, func.count())
+        .group_by(CollectedData.task_id)
+        .having(last < cutoff)
+        .order_by(last)
+    )
+    if limit:
+        query = query.limit(limit)
+    return db.session.execute(query).all()
+
+
+def archive_batch(task_id, directory, now=None):
+    """
+    把批次中未保存的数据写入 gzip NDJSON 归档文件（先写临时文件并落盘，再改名）
+    :return: (文件路径, 行数)，没有未保存的数据时返回 (None, 0)
+    """
+    columns = [column.name for column in CollectedData.__table__.columns] + ['content']
+    rows = db.session.execute(
+        select(*[getattr(CollectedData, name) for name in columns[:-1]], CollectedContent.content)
+        .outerjoin(CollectedContent, CollectedContent.data_id == CollectedData.id)
+        .where(CollectedData.task_id == task_id, CollectedData.is_saved.isnot(True))
+        .order_by(CollectedData.id)
+        .execution_options(yield_per=1000)
+    )
+
+    now = now or datetime.utcnow()
+    folder = os.path.join(directory, now.strftime('%Y'), now.strftime('%m'))
+    # 文件名带时间，清理中断后重新归档剩余数据时不覆盖已有归档
+    path = os.path.join(folder, f'{task_id}-{now.strftime("%Y%m%d%H%M%S")}.ndjson.gz')
+    tmp = f'{path}.tmp'
+
+    count = 0
+    os.makedirs(folder, exist_ok=True)
+    with open(tmp, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as f:
+            for row in rows:
+                line = json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str)
+                f.write(line.encode('utf-8') + b'\n')
+                count += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    if not count:
+        os.remove(tmp)
+        return None, 0
+    os.replace(tmp, path)
+    return path, count
+
+
+def _delete_chunk(task_id, size):
+    """删除批次中的一块数据及其指纹分段索引（正文由触发器删除，不提交），:return: 删除的行数"""
+    ids = db.session.execute(
+        select(CollectedData.id).where(CollectedData.task_id == task_id).limit(size)
+    ).scalars().all()
+    if ids:
+        db.session.execute(delete(SimhashBand).where(SimhashBand.data_id.in_(ids)))
+        db.session.execute(delete(CollectedData).where(CollectedData.id.in_(ids)))
+    return len(ids)
+
+
+def purge_batch(task_id, chunk_size=1000):
+    """
+    按块删除批次，每块单独提交
+    :return: 删除的行数
+    """
+    total = 0
+    while True:
+        deleted = writer.run(_delete_chunk, task_id, chunk_size)
+        total += deleted
+        if deleted < chunk_size:
+            return total
+
+
+def auto_vacuum_mode():
+    """:return: 0=NONE, 1=FULL, 2=INCREMENTAL"""
+    return db.session.execute(text('PRAGMA auto_vacuum')).scalar()
+
+
+def incremental_vacuum(chunk_pages):
+    """
+    回收全部空闲页，每次最多 chunk_pages 页（每次一个短事务，其间其他写入可以进行）；
+    数据库不是 INCREMENTAL 模式时不执行
+    :return: 回收的页数，未执行时返回 None
+    """
+    if auto_vacuum_mode() != 2:
+        return None
+    freed = 0
+    remaining = db.session.execute(text('PRAGMA freelist_count')).scalar()
+    while remaining:
+        with db.engine.connect() as conn:
+            # 每执行一步只回收一页，sqlite3 模块的 execute 只执行一步，executescript 才会执行到底
+            conn.connection.driver_connection.executescript(f'PRAGMA incremental_vacuum({int(chunk_pages)})')
+        left = db.session.execute(text('PRAGMA freelist_count')).scalar()
+        if left >= remaining:
+            break
+        freed += remaining - left
+        remaining = left
+    return freed
+
+
+def convert_to_incremental():
+    """把数据库切换为 auto_vacuum=INCREMENTAL（须执行一次完整 VACUUM，期间锁库），:return: 切换后的模式"""
+    db.session.remove()
+    with db.engine.connect() as conn:
+        conn.connection.driver_connection.executescript('PRAGMA auto_vacuum=INCREMENTAL; VACUUM;')
+        return conn.exec_driver_sql('PRAGMA auto_vacuum').scalar()
+
+
+def run(now=None, ttl_hours=None, dry_run=False, log=None):
+    """
+    清理过期批次：归档未保存的数据、按块删除，最后回收空闲页
+    :param now: 当前时间
+    :param ttl_hours: 保留期（小时），默认读取 COLLECT_RETENTION_HOURS
+    :param dry_run: 只列出过期批次，不归档和删除
+    :param log: 进度输出函数
+    :return: 统计字典
+    """
+    config = current_app.config
+    now = now or datetime.utcnow()
+    if ttl_hours is None:
+        ttl_hours = config.get('COLLECT_RETENTION_HOURS', 72)
+    archive = config.get('COLLECT_ARCHIVE_ENABLED', True)
+    chunk_size = config.get('RETENTION_CHUNK_SIZE', 1000)
+
+    from app.progress import progress
+
+    summary = {'batches': 0, 'archived': 0, 'purged': 0, 'files': [], 'skipped': [], 'vacuumed': None}
+    for task_id, last, count in stale_batches(now - timedelta(hours=ttl_hours), config.get('RETENTION_MAX_BATCHES')):
+        state = progress.get(task_id)
+        if state and state.get('status') in ACTIVE_STATUSES:
+            summary['skipped'].append(task_id)
+            continue
+        summary['batches'] += 1
+        if dry_run:
+            summary['purged'] += count
+            continue
+
+        if archive:
+            path, archived = archive_batch(task_id, archive_dir(), now)
+            if path:
+                summary['files'].append(path)
+                summary['archived'] += archived
+                RETENTION_ROWS.inc(archived, action='archived')
+        purged = purge_batch(task_id, chunk_size)
+        summary['purged'] += purged
+        RETENTION_ROWS.inc(purged, action='purged')
+        if log:
+            log(f'[{task_id}] 最后采集于 {last}，清理 {purged} 行')
+
+    if not dry_run:
+        summary['vacuumed'] = incremental_vacuum(config.get('RETENTION_VACUUM_PAGES', 2000))
+    return summary
+
+
+@periodic('collect_retention', 'RETENTION_INTERVAL', 3600)
+def run_retention():
+    """周期清理过期的采集批次"""
+    return run()
+
+
+def stats():
+    """数据库文件大小、空闲页及临时表的数据量"""
+    page_size = db.session.execute(text('PRAGMA page_size')).scalar()
+    page_count = db.session.execute(text('PRAGMA page_count')).scalar()
+    freelist = db.session.execute(text('PRAGMA freelist_count')).scalar()
+    rows, batches, oldest = db.session.execute(
+        select(func.count(), func.count(func.distinct(CollectedData.task_id)), func.min(CollectedData.crawl_time))
+    ).one()
+    return {
+        'db_bytes': page_size * page_count,
+        'free_bytes': page_size * freelist,
+        'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}.get(auto_vacuum_mode()),
+        'collected_rows': rows,
+        'collected_batches': batches,
+        'oldest_crawl_time': oldest.strftime('%Y-%m-%d %H:%M:%S') if oldest else None,
+        'retention_hours': current_app.config.get('COLLECT_RETENTION_HOURS', 72),
+    }
@@ -0,0 +1,231 @@
+"""
+情感汇总模块 - search_results 的按日汇总表，以及舆情结果和文章的分级趋势汇总
+汇总表 sentiment_daily 以 (关键词, 引擎, 情感, 日期) 为键，由触发器在结果增删改时增量维护，
+统计接口只需读取 O(关键词数 × 天数) 行，不再扫描原始结果。
+趋势汇总表 sentiment_rollup 按水位分级：晚于 hour 水位的数据按小时汇总，hour 与 day 水位之间的按日、更早的按周；
+触发器按记录时间与水位比较写入对应粒度的桶，周期任务推进水位并把过期的小时桶压缩为日桶、日桶压缩为周桶，
+每条记录始终只计入一个桶。时间桶均为 UTC
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import text
+from app import db
+from app.maintenance import periodic
+from app.writer import writer
+
+# 汇总键表达式（空值归一，保证唯一键可用）
+_KEYS = {
+    'keyword': '{row}.keyword',
+    'engine': "coalesce({row}.engine, '')",
+    'sentiment': "coalesce({row}.sentiment, 'neutral')",
+    'day': "coalesce(date({row}.crawl_time), date('now'))",
+}
+
+
+def _keys(row):
+    return [expr.format(row=row) for expr in _KEYS.values()]
+
+
+def _increment_sql(row):
+    keyword, engine, sentiment, day = _keys(row)
+    return (
+        f'INSERT INTO sentiment_daily (keyword, engine, sentiment, day, count) '
+        f'VALUES ({keyword}, {engine}, {sentiment}, {day}, 1) '
+        f'ON CONFLICT (keyword, engine, sentiment, day) DO UPDATE SET count = count + 1;'
+    )
+
+
+def _decrement_sql(row):
+    keyword, engine, sentiment, day = _keys(row)
+    where = f'keyword = {keyword} AND engine = {engine} AND sentiment = {sentiment} AND day = {day}'
+    return (
+        f'UPDATE sentiment_daily SET count = count - 1 WHERE {where};'
+        f'DELETE FROM sentiment_daily WHERE {where} AND count <= 0;'
+    )
+
+
+TRIGGERS = [
+    f'''CREATE TRIGGER IF NOT EXISTS sentiment_daily_ai AFTER INSERT ON search_results BEGIN
+        {_increment_sql('new')}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS sentiment_daily_ad AFTER DELETE ON search_results BEGIN
+        {_decrement_sql('old')}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS sentiment_daily_au
+        AFTER UPDATE OF keyword, engine, sentiment, crawl_time ON search_results BEGIN
+        {_decrement_sql('old')}
+        {_increment_sql('new')}
+    END''',
+]
+
+
+# 趋势汇总的数据来源: 表名 -> (来源名, 时间列, 引擎表达式, 触发更新的列)
+ROLLUP_SOURCES = {
+    'search_results': ('search', 'crawl_time', "coalesce({row}.engine, '')", 'keyword, engine, sentiment, crawl_time'),
+    'article_data': ('article', 'created_at', "''", 'keyword, sentiment, created_at'),
+}
+
+_WATERMARK = "coalesce((SELECT value FROM rollup_watermarks WHERE level = '{level}'), '')"
+
+
+def _rollup_keys(table, row):
+    """
+    记录在趋势汇总表中的键表达式
+    :return: (关键词, 引擎, 情感, 粒度, 时间桶)；时间桶表达式引用粒度子查询的 level 列
+    """
+    _source, time_column, engine, _columns = ROLLUP_SOURCES[table]
+    moment = f"coalesce({row}.{time_column}, datetime('now'))"
+    level = (
+        f"CASE WHEN {moment} >= {_WATERMARK.format(level='hour')} THEN 'hour' "
+        f"WHEN {moment} >= {_WATERMARK.format(level='day')} THEN 'day' ELSE 'week' END"
+    )
+    bucket = (
+        f"CASE level WHEN 'hour' THEN strftime('%Y-%m-%d %H:00:00', {moment}) "
+        f"WHEN 'day' THEN date({moment}) ELSE date({moment}, 'weekday 0', '-6 days') END"
+    )
+    return f'{row}.keyword', engine.format(row=row), f"coalesce({row}.sentiment, 'neutral')", level, bucket
+
+
+def _rollup_increment_sql(table, row):
+    source = ROLLUP_SOURCES[table][0]
+    keyword, engine, sentiment, level, bucket = _rollup_keys(table, row)
+    return (
+        f'INSERT INTO sentiment_rollup (source, keyword, level, bucket, engine, sentiment, count) '
+        f"SELECT '{source}', {keyword}, level, {bucket}, {engine}, {sentiment}, 1 FROM (SELECT {level} AS level) WHERE true "
+        f'ON CONFLICT (source, keyword, level, bucket, engine, sentiment) DO UPDATE SET count = count + 1;'
+    )
+
+
+def _rollup_decrement_sql(table, row):
+    source = ROLLUP_SOURCES[table][0]
+    keyword, engine, sentiment, level, bucket = _rollup_keys(table, row)
+    return (
+        f"UPDATE sentiment_rollup SET count = count - 1 WHERE source = '{source}' AND keyword = {keyword} "
+        f'AND engine = {engine} AND sentiment = {sentiment} '
+        f'AND (level, bucket) = (SELECT level, {bucket} FROM (SELECT {level} AS level));'
+        f"DELETE FROM sentiment_rollup WHERE source = '{source}' AND keyword = {keyword} AND count <= 0;"
+    )
+
+
+def _rollup_triggers():
+    for table, (_source, _time_column, _engine, columns) in ROLLUP_SOURCES.items():
+        yield f'''CREATE TRIGGER IF NOT EXISTS sentiment_rollup_{table}_ai AFTER INSERT ON {table} BEGIN
+            {_rollup_increment_sql(table, 'new')}
+        END'''
+        yield f'''CREATE TRIGGER IF NOT EXISTS sentiment_rollup_{table}_ad AFTER DELETE ON {table} BEGIN
+            {_rollup_decrement_sql(table, 'old')}
+        END'''
+        yield f'''CREATE TRIGGER IF NOT EXISTS sentiment_rollup_{table}_au AFTER UPDATE OF {columns} ON {table} BEGIN
+            {_rollup_decrement_sql(table, 'old')}
+            {_rollup_increment_sql(table, 'new')}
+        END'''
+
+
+def create_schema():
+    """创建汇总触发器；汇总表为空而结果表有数据时（如旧库升级）自动回填"""
+    with db.engine.begin() as conn:
+        for sql in TRIGGERS:
+            conn.execute(text(sql))
+        for sql in _rollup_triggers():
+            conn.execute(text(sql))
+        conn.execute(text("INSERT OR IGNORE INTO rollup_watermarks (level, value) VALUES ('hour', ''), ('day', '')"))
+        empty = conn.execute(text('SELECT 1 FROM sentiment_daily LIMIT 1')).first() is None
+        has_results = conn.execute(text('SELECT 1 FROM search_results LIMIT 1')).first() is not None
+        rollup_empty = conn.execute(text('SELECT 1 FROM sentiment_rollup LIMIT 1')).first() is None
+        has_rows = any(conn.execute(text(f'SELECT 1 FROM {table} LIMIT 1')).first() is not None
+                       for table in ROLLUP_SOURCES)
+    if empty and has_results:
+        backfill()
+    if rollup_empty and has_rows:
+        backfill_rollup()
+        compact()
+        db.session.commit()
+
+
+def backfill():
+    """
+    从 search_results 全量重建汇总表
+    :return: 汇总行数
+    """
+    keyword, engine, sentiment, day = _keys('search_results')
+    with db.engine.begin() as conn:
+        conn.execute(text('DELETE FROM sentiment_daily'))
+        return conn.execute(text(
+            f'INSERT INTO sentiment_daily (keyword, engine, sentiment, day, count) '
+            f'SELECT {keyword}, {engine}, {sentiment}, {day}, count(*) FROM search_results '
+            f'GROUP BY 1, 2, 3, 4'
+        )).rowcount
+
+
+def backfill_rollup():
+    """
+    从源表全量重建趋势汇总表（按当前水位分级）
+    :return: 汇总行数
+    """
+    count = 0
+    with db.engine.begin() as conn:
+        conn.execute(text('DELETE FROM sentiment_rollup'))
+        for table, (source, *_rest) in ROLLUP_SOURCES.items():
+            keyword, engine, sentiment, level, bucket = _rollup_keys(table, table)
+            count += conn.execute(text(
+                f'INSERT INTO sentiment_rollup (source, keyword, level, bucket, engine, sentiment, count) '
+                f"SELECT '{source}', keyword, level, bucket, engine, sentiment, count(*) FROM ("
+                f'SELECT {keyword} AS keyword, {engine} AS engine, {sentiment} AS sentiment, level, {bucket} AS bucket '
+                f'FROM (SELECT *, {level} AS level FROM {table}) AS {table}) '
+                f'GROUP BY 2, 3, 4, 5, 6'
+            )).rowcount
+    return count
+
+
+def watermarks():
+    """:return: {'hour': 水位, 'day': 水位}，空串表示该级尚未压缩过"""
+    rows = db.session.execute(text('SELECT level, value FROM rollup_watermarks')).all()
+    return {'hour': '', 'day': '', **dict(rows)}
+
+
+def _fold(finer, coarser, bucket_sql, target):
+    """把 finer 粒度中早于 target 的桶合并到 coarser 粒度并删除，:return: 合并的桶数"""
+    moved = db.session.execute(text(
+        f'INSERT INTO sentiment_rollup (source, keyword, level, bucket, engine, sentiment, count) '
+        f"SELECT source, keyword, '{coarser}', {bucket_sql}, engine, sentiment, sum(count) FROM sentiment_rollup "
+        f"WHERE source IN ('search', 'article') AND level = '{finer}' AND bucket < :target "
+        f'GROUP BY source, keyword, {bucket_sql}, engine, sentiment '
+        f'ON CONFLICT (source, keyword, level, bucket, engine, sentiment) DO UPDATE SET count = count + excluded.count'
+    ), {'target': target}).rowcount
+    db.session.execute(text(
+        f"DELETE FROM sentiment_rollup WHERE source IN ('search', 'article') AND level = '{finer}' AND bucket < :target"
+    ), {'target': target})
+    db.session.execute(text('UPDATE rollup_watermarks SET value = :target WHERE level = :level'),
+                       {'target': target, 'level': finer})
+    return moved
+
+
+def compact(now=None, hour_days=None, day_days=None):
+    """
+    推进水位并逐级压缩：早于 hour_days 天的小时桶合并为日桶，早于 day_days 天的日桶合并为周桶（不提交）
+    hour 水位对齐到日，day 水位对齐到周一；水位只前进，重复执行无副作用
+    :return: {'hour': 合并的日桶数, 'day': 合并的周桶数}
+    """
+    now = now or datetime.utcnow()
+    if hour_days is None:
+        hour_days = current_app.config.get('ROLLUP_HOUR_DAYS', 14)
+    if day_days is None:
+        day_days = current_app.config.get('ROLLUP_DAY_DAYS', 400)
+
+    hour_target = (now - timedelta(days=hour_days)).date()
+    day_target = (now - timedelta(days=max(day_days, hour_days))).date()
+    day_target -= timedelta(days=day_target.weekday())
+
+    current = watermarks()
+    result = {'hour': 0, 'day': 0}
+    if hour_target.isoformat() > current['hour']:
+        result['hour'] = _fold('hour', 'day', 'date(bucket)', hour_target.isoformat())
+    if day_target.isoformat() > current['day']:
+        result['day'] = _fold('day', 'week', "date(bucket, 'weekday 0', '-6 days')", day_target.isoformat())
+    return result
+
+
+@periodic('rollup_compact', 'ROLLUP_COMPACT_INTERVAL', 3600)
+def run_compact():
+    """周期压缩趋势汇总表"""
+    return writer.run(compact)
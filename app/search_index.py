@@ -0,0 +1,270 @@
+"""
+全文检索模块 - 基于 SQLite FTS5 的中文全文索引
+中文按二元组 (bigram) 切分后写入无内容 (contentless) 的 FTS5 表，由触发器在增删改时同步，
+查询时同样切分为二元组短语，按 bm25 相关度排序
+"""
+import re
+import sqlite3
+from sqlalchemy import event, inspect, text, Float, Integer
+from sqlalchemy.engine import Engine
+from app import db
+
+# 源表 -> (索引表, 索引列)
+FTS_TABLES = {
+    'search_results': ('search_results_fts', ('keyword', 'title', 'abstract')),
+    'article_data': ('article_data_fts', ('keyword', 'title', 'abstract', 'content')),
+}
+
+# 存放在一对一正文表中的索引列: 源表 -> (索引列, 正文表, 外键列)；正文为压缩存储，用 zdecompress() 读取
+EXTERNAL_COLUMNS = {
+    'article_data': ('content', 'article_content', 'article_id'),
+}
+
+# 中日韩统一表意文字连续片段，或字母数字单词
+_TOKEN_RE = re.compile(r'([\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+)|([0-9A-Za-z]+)')
+
+
+def cjk_tokens(value):
+    """
+    把文本切分为空格分隔的索引词
+    中文片段输出相邻二元组，并补上片段末字的单字，使单字查询可以用前缀匹配命中；
+    字母数字按单词小写输出
+    :param value: 原始文本
+    :return: 索引文本
+    """
+    if not value:
+        return ''
+
+    tokens = []
+    for cjk, word in _TOKEN_RE.findall(value):
+        if word:
+            tokens.append(word.lower())
+            continue
+        for i in range(len(cjk) - 1):
+            tokens.append(cjk[i:i + 2])
+        tokens.append(cjk[-1])
+    return ' '.join(tokens)
+
+
+def build_match(value):
+    """
+    把用户输入转换为 FTS5 查询表达式，各片段之间为“与”关系
+    :param value: 用户输入
+    :return: MATCH 表达式，没有可检索的内容时返回 None
+    """
+    parts = []
+    for cjk, word in _TOKEN_RE.findall(value or ''):
+        if word:
+            parts.append(f'"{word.lower()}"*')
+        elif len(cjk) == 1:
+            parts.append(f'"{cjk}"*')
+        else:
+            parts.append('"' + ' '.join(cjk[i:i + 2] for i in range(len(cjk) - 1)) + '"')
+    return ' '.join(parts) or None
+
+
+@event.listens_for(Engine, 'connect')
+def _register_functions(dbapi_connection, connection_record):
+    """为每个 SQLite 连接注册分词函数，供触发器调用"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function('cjk_tokens', 1, cjk_tokens, deterministic=True)
+
+
+def _values_sql(source, columns, row, external=None):
+    """
+    索引列的分词表达式
+    :param row: 源表行的引用（new/old/表名）
+    :param external: 正文列的取值表达式，默认按外键从正文表读取
+    """
+    column, table, key = EXTERNAL_COLUMNS.get(source, (None, None, None))
+    values = []
+    for c in columns:
+        if c != column:
+            values.append(f'cjk_tokens({row}.{c})')
+        elif external is not None:
+            values.append(f'cjk_tokens({external})')
+        else:
+            values.append(f'cjk_tokens((SELECT zdecompress({c}) FROM {table} WHERE {key} = {row}.id))')
+    return ', '.join(values)
+
+
+def _trigger_sql(source, fts, columns):
+    new_values = _values_sql(source, columns, 'new')
+    old_values = _values_sql(source, columns, 'old')
+    cols = ', '.join(columns)
+    external = EXTERNAL_COLUMNS.get(source)
+    own = ', '.join(c for c in columns if not external or c != external[0])
+    # 正文在源表行删除后才被清理，删除索引须在 BEFORE 触发器中进行，此时还能读到正文
+    delete_timing = 'BEFORE' if external else 'AFTER'
+    statements = [
+        f'''CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {source} BEGIN
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values});
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS {fts}_ad {delete_timing} DELETE ON {source} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {own} ON {source} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values});
+        END''',
+    ]
+    if not external:
+        return statements
+
+    # 正文表的增删改：源表行存在时，以正文的新旧值重建该行的索引
+    column, table, key = external
+    empty = _values_sql(source, columns, 's', external='NULL')
+    old_body = _values_sql(source, columns, 's', external=f'zdecompress(old.{column})')
+    new_body = _values_sql(source, columns, 's', external=f'zdecompress(new.{column})')
+
+    def reindex(before, after, row):
+        return (
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) SELECT 'delete', s.id, {before} FROM {source} s "
+            f'WHERE s.id = {row}.{key};'
+            f'INSERT INTO {fts}(rowid, {cols}) SELECT s.id, {after} FROM {source} s WHERE s.id = {row}.{key};'
+        )
+
+    return statements + [
+        f'''CREATE TRIGGER IF NOT EXISTS {fts}_{table}_ai AFTER INSERT ON {table} BEGIN
+            {reindex(empty, new_body, 'new')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS {fts}_{table}_ad AFTER DELETE ON {table} BEGIN
+            {reindex(old_body, empty, 'old')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS {fts}_{table}_au AFTER UPDATE OF {column} ON {table} BEGIN
+            {reindex(old_body, new_body, 'new')}
+        END''',
+    ]
+
+
+def create_triggers(conn, source):
+    """创建一张源表（及其正文表）的全文索引同步触发器"""
+    fts, columns = FTS_TABLES[source]
+    for sql in _trigger_sql(source, fts, columns):
+        conn.execute(text(sql))
+
+
+def drop_triggers(conn, source):
+    """删除一张源表（及其正文表）的全文索引同步触发器，用于触发器定义变化时重建"""
+    fts, _columns = FTS_TABLES[source]
+    names = [f'{fts}_ai', f'{fts}_ad', f'{fts}_au']
+    if source in EXTERNAL_COLUMNS:
+        table = EXTERNAL_COLUMNS[source][1]
+        names += [f'{fts}_{table}_ai', f'{fts}_{table}_ad', f'{fts}_{table}_au']
+    for name in names:
+        conn.execute(text(f'DROP TRIGGER IF EXISTS {name}'))
+
+
+def create_schema():
+    """创建全文索引表和同步触发器，新建的索引会立即从源表回填"""
+    inspector = inspect(db.engine)
+    for source, (fts, columns) in FTS_TABLES.items():
+        exists = inspector.has_table(fts)
+        with db.engine.begin() as conn:
+            if not exists:
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE {fts} USING fts5({', '.join(columns)}, "
+                    f"content='', tokenize='unicode61 remove_diacritics 2')"
+                ))
+            create_triggers(conn, source)
+        if not exists:
+            rebuild(source)
+
+
+def rebuild(source, chunk_size=5000, log=None):
+    """
+    重建一张源表的全文索引
+    :param source: 源表名
+    :param chunk_size: 每批回填的行数
+    :param log: 进度输出函数
+    :return: 回填行数
+    """
+    fts, columns = FTS_TABLES[source]
+    cols = ', '.join(columns)
+    values = _values_sql(source, columns, source)
+
+    with db.engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('delete-all')"))
+
+    last_id = 0
+    total = 0
+    while True:
+        with db.engine.begin() as conn:
+            max_id = conn.execute(text(
+                f'SELECT max(id) FROM (SELECT id FROM {source} WHERE id > :last ORDER BY id LIMIT :n)'
+            ), {'last': last_id, 'n': chunk_size}).scalar()
+            if max_id is None:
+                break
+            count = conn.execute(text(
+                f'INSERT INTO {fts}(rowid, {cols}) SELECT id, {values} FROM {source} '
+                f'WHERE id > :last AND id <= :max'
+            ), {'last': last_id, 'max': max_id}).rowcount
+        total += count
+        last_id = max_id
+        if log:
+            log(f'[{fts}] 已索引 {total} 行')
+
+    with db.engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('optimize')"))
+    return total
+
+
+def match(model, value, column=None):
+    """
+    构造全文检索子查询
+    :param model: SearchResult 或 ArticleData
+    :param value: 用户输入
+    :param column: 只检索指定列，默认检索全部索引列
+    :return: 含 rowid、rank 列的子查询，没有可检索内容时返回 None
+    """
+    expression = build_match(value)
+    if expression is None:
+        return None
+
+    fts, columns = FTS_TABLES[model.__tablename__]
+    if column:
+        expression = f'{{{column}}} : ({expression})'
+
+    # 参数名按列区分，同一查询可以同时附加多个检索条件
+    param = f'match_{column or "all"}'
+    return text(
+        f'SELECT rowid, bm25({fts}) AS rank FROM {fts} WHERE {fts} MATCH :{param}'
+    ).bindparams(**{param: expression}).columns(rowid=Integer, rank=Float).subquery()
+
+
+def apply_search(query, model, value, column=None, order_by_rank=True):
+    """
+    为 ORM 查询附加全文检索条件
+    :param query: 原查询
+    :param model: 模型类
+    :param value: 用户输入
+    :param column: 只检索指定列
+    :param order_by_rank: 是否按相关度排序（bm25 越小越相关）
+    :return: (新查询, 是否使用了全文索引)；输入中没有可检索的词时退回 LIKE 子串匹配
+    """
+    hits = match(model, value, column)
+    if hits is None:
+        target = getattr(model, column or 'title')
+        return query.filter(target.like(f'%{value}%')), False
+
+    query = query.join(hits, model.id == hits.c.rowid)
+    if order_by_rank:
+        query = query.order_by(hits.c.rank)
+    return query, True
+
+
+def apply_filters(query, model, keyword='', sentiment='', q=''):
+    """
+    列表接口与导出接口共用的过滤条件
+    :param keyword: 按搜索关键词过滤
+    :param sentiment: 按情感过滤
+    :param q: 全文检索（按相关度排序）
+    :return: 新查询
+    """
+    if keyword:
+        query, _ = apply_search(query, model, keyword, column='keyword', order_by_rank=False)
+    if q:
+        query, _ = apply_search(query, model, q)
+    if sentiment:
+        query = query.filter(model.sentiment == sentiment)
+    return query
@@ -0,0 +1,177 @@
+"""
+后台任务处理函数 - 舆情爬取与数据采集
+由任务队列的工作线程在应用上下文中调用
+"""
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from app.jobs import job_handler, JobCancelled
+from app.models import SearchResult, CollectedData
+from app.crawler import SearchCrawler, SentimentAnalyzer
+from app.progress import progress
+from app.writer import writer
+from app.dedup import url_hash
+from app.monitor import record_run
+from app.bulk import (bulk_insert, chunked, collected_rows, insert_collected,
+                      search_result_rows, upsert_search_results)
+
+# 采集结果每保存多少条提交一次，进度流可以提前推送已保存的数据
+COLLECT_COMMIT_EVERY = 100
+
+
+def extract_cover_from_url(url):
+    """从URL提取可能的封面图片"""
+    # 简单的封面提取逻辑，可以后续扩展
+    if not url:
+        return None
+    # 返回一个基于域名的占位图或None
+    return None
+
+
+def crawl_progress_id(task_id):
+    """爬取任务在进度存储中的键（与采集批次ID区分）"""
+    return f'crawl-{task_id}'
+
+
+@job_handler('crawl')
+def run_crawl(ctx):
+    """
+    舆情爬取任务：抓取搜索结果、分析情感并入库
+    :param ctx: JobContext
+    :return: 保存的结果数量
+    """
+    task = ctx.task
+    progress_id = crawl_progress_id(task.id)
+    progress.update(progress_id, force=True, status='running', progress=10, message=f'正在搜索"{task.keyword}"...')
+
+    crawler = SearchCrawler(base_urls=current_app.config.get('CRAWLER_BASE_URLS'))
+    analyzer = SentimentAnalyzer()
+    results = crawler.search(task.keyword, engine=task.engine, pages=task.pages)
+
+    ctx.check_cancelled()
+
+    progress.update(progress_id, force=True, progress=60, message=f'已获取 {len(results)} 条结果，正在分析保存...')
+
+    # 分析情感并批量保存，已抓到过的链接只更新爬取时间和来源引擎
+    saved_count = writer.run(bulk_insert, SearchResult, search_result_rows(task.keyword, results, analyzer),
+                             stmt=upsert_search_results())
+
+    progress.update(progress_id, force=True, progress=100, message=f'爬取完成，共获取 {saved_count} 条结果')
+    return saved_count
+
+
+@job_handler('collect')
+def run_collect(ctx):
+    """
+    数据采集任务：抓取搜索结果并存入临时表供橱窗展示
+    :param ctx: JobContext，payload 中包含采集批次 task_id
+    :return: 采集的结果数量
+    """
+    task = ctx.task
+    task_id = ctx.payload['task_id']
+    keyword = task.keyword
+
+    try:
+        progress.update(task_id, force=True, status='running', progress=10, message='正在连接搜索引擎...')
+
+        crawler = SearchCrawler(base_urls=current_app.config.get('CRAWLER_BASE_URLS'))
+
+        progress.update(task_id, force=True, progress=20, message=f'正在搜索"{keyword}"...')
+
+        results = crawler.search(keyword, engine=task.engine, pages=task.pages)
+
+        ctx.check_cancelled()
+
+        progress.update(task_id, force=True, progress=60, message=f'已获取 {len(results)} 条结果，正在处理...')
+
+        # 批量保存到临时表（批次内重复链接跳过，不计入保存数），每批提交一次
+        rows = collected_rows(task_id, keyword, results, cover_of=extract_cover_from_url)
+        saved = processed = 0
+        for batch in chunked(rows, COLLECT_COMMIT_EVERY):
+            saved += writer.run(bulk_insert, CollectedData, batch, stmt=insert_collected())
+            processed += len(batch)
+
+            # 更新进度（节流写入）
+            progress.update(task_id, progress=60 + int(processed / len(results) * 35),
+                            message=f'正在保存数据 ({processed}/{len(results)})...')
+
+        progress.update(task_id, status='completed', progress=100, message=f'采集完成，共 {saved} 条数据')
+        return saved
+
+    except JobCancelled:
+        progress.update(task_id, status='cancelled', message='任务已取消')
+        raise
+    except Exception as e:
+        progress.update(task_id, status='failed', message=str(e))
+        raise
+
+
+def stored_hashes(engine, keyword, hashes):
+    """
+    查询一组链接中已入库的（走 (keyword, url_hash) 唯一索引，不回表）
+    使用独立连接，可在爬虫的抓取线程中调用
+    :return: 已入库的 url_hash 集合
+    """
+    found = set()
+    with engine.connect() as conn:
+        for batch in chunked(list(hashes), 500):
+            found.update(conn.execute(
+                select(SearchResult.url_hash).where(SearchResult.keyword == keyword, SearchResult.url_hash.in_(batch))
+            ).scalars())
+    return found
+
+
+@job_handler('monitor')
+def run_monitor(ctx):
+    """
+    监控关键词的增量爬取：各引擎逐页抓取，翻到大部分结果已入库的页面即停止，只保存新结果
+    每页只按本页链接的 url_hash 查询是否已入库，不加载关键词的全部历史链接；
+    爬取失败时同样记录本次运行（失败次数、原因并推迟下次爬取），被取消的运行不记录
+    :param ctx: JobContext，payload 中包含 monitor_id
+    :return: 新增的结果数量
+    """
+    task = ctx.task
+    monitor_id = ctx.payload.get('monitor_id')
+    keyword = task.keyword
+    engine = db.engine
+    pages = saved_count = 0
+    error = None
+    cancelled = False
+
+    try:
+        # 结果页每次都向搜索引擎重新验证，未变化时只消耗一次 304
+        crawler = SearchCrawler(base_urls=current_app.config.get('CRAWLER_BASE_URLS'), cache_max_age=0)
+        results, pages = crawler.search_incremental(
+            keyword, engine=task.engine, max_pages=task.pages,
+            known=lambda hashes: stored_hashes(engine, keyword, hashes),
+            stop_ratio=current_app.config.get('MONITOR_STOP_RATIO', 0.8))
+
+        ctx.check_cancelled()
+
+        # 只保存新链接（各引擎、各页之间重复的链接只保留第一条，没有链接的结果不去重）
+        known = stored_hashes(engine, keyword, {url_hash(item.get('link')) for item in results} - {None})
+        fresh = []
+        seen = set()
+        for item in results:
+            key = url_hash(item.get('link'))
+            if key is not None:
+                if key in known or key in seen:
+                    continue
+                seen.add(key)
+            fresh.append(item)
+        if fresh:
+            saved_count = writer.run(bulk_insert, SearchResult,
+                                     search_result_rows(keyword, fresh, SentimentAnalyzer()),
+                                     stmt=upsert_search_results())
+        return saved_count
+    except JobCancelled:
+        # 取消的运行不记录，不影响上次运行时间和失败状态
+        cancelled = True
+        raise
+    except Exception as e:
+        db.session.rollback()
+        error = str(e) or e.__class__.__name__
+        raise
+    finally:
+        if monitor_id and not cancelled:
+            writer.run(record_run, monitor_id, pages, saved_count, error)
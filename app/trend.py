@@ -0,0 +1,191 @@
+"""
+情感趋势模块 - 从分级汇总表 sentiment_rollup 读取按小时/日/周的情感数量序列
+查询粒度为 g 时读取 g 及更细粒度的桶并在 SQL 中归并到 g 的时间桶（每条记录只在一个粒度中计数，不会重复）；
+早于该粒度压缩水位的时间段已没有 g 粒度的数据，起点会被截到水位处。
+空桶补零，序列过长时按总量序列用 LTTB 降采样，各情感序列取相同的点，返回值可直接用于 ECharts
+"""
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from app import db
+from app.models import SentimentRollup
+from app.rollup import watermarks
+
+SENTIMENTS = ('positive', 'neutral', 'negative')
+
+# 各粒度的桶长度
+STEPS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+}
+
+# 未指定范围时的默认跨度
+DEFAULT_SPANS = {
+    'hour': timedelta(hours=48),
+    'day': timedelta(days=90),
+    'week': timedelta(weeks=52),
+}
+
+# 查询各粒度时读取的汇总级别
+LEVELS = {
+    'hour': ('hour',),
+    'day': ('hour', 'day'),
+    'week': ('hour', 'day', 'week'),
+}
+
+SPAN_UNITS = {'h': 'hours', 'd': 'days', 'w': 'weeks', 'y': 'days'}
+
+
+def floor_bucket(moment, granularity):
+    """时间所在桶的起点"""
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == 'week':
+        day -= timedelta(days=day.weekday())
+    return day
+
+
+def bucket_key(moment, granularity):
+    """桶起点在汇总表中的文本形式"""
+    if granularity == 'hour':
+        return moment.strftime('%Y-%m-%d %H:00:00')
+    return moment.strftime('%Y-%m-%d')
+
+
+def parse_span(value):
+    """
+    解析时间跨度，如 48h、90d、12w、1y
+    :return: timedelta；格式不合法时抛出 ValueError
+    """
+    match = re.fullmatch(r'(\d+)([hdwy])', value.strip().lower())
+    if not match:
+        raise ValueError(f'不支持的时间范围: {value}')
+    amount, unit = int(match.group(1)), match.group(2)
+    if unit == 'y':
+        amount *= 365
+    return timedelta(**{SPAN_UNITS[unit]: amount})
+
+
+def parse_time(value):
+    """解析 YYYY-MM-DD 或 YYYY-MM-DD HH:MM[:SS]，格式不合法时抛出 ValueError"""
+    try:
+        return datetime.fromisoformat(value.strip())
+    except ValueError:
+        raise ValueError(f'时间格式不正确: {value}')
+
+
+def _bucket_expr(granularity):
+    """把各级汇总桶归并到查询粒度的桶"""
+    if granularity == 'hour':
+        return SentimentRollup.bucket
+    if granularity == 'day':
+        return func.date(SentimentRollup.bucket)
+    return func.date(SentimentRollup.bucket, 'weekday 0', '-6 days')
+
+
+def lttb(values, threshold):
+    """
+    Largest-Triangle-Three-Buckets 降采样
+    :param values: 等间隔序列
+    :param threshold: 保留的点数（含首尾）
+    :return: 保留点的下标列表
+    """
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    indices = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # 下一个区间的平均点
+        start = int((i + 1) * every) + 1
+        end = min(int((i + 2) * every) + 1, n)
+        avg_x = (start + end - 1) / 2
+        avg_y = sum(values[start:end]) / (end - start)
+
+        # 当前区间中与上一个选中点、下一区间平均点构成三角形面积最大的点
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        ax, ay = a, values[a]
+        best, best_area = lo, -1
+        for j in range(lo, hi):
+            area = abs((ax - avg_x) * (values[j] - ay) - (ax - j) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        indices.append(best)
+        a = best
+    indices.append(n - 1)
+    return indices
+
+
+def query_trend(granularity='day', start=None, end=None, keyword='', engine='', source='search', points=0,
+                max_buckets=20000):
+    """
+    查询情感趋势
+    :param granularity: hour/day/week
+    :param start: 起始时间（含），默认为 end 之前的默认跨度
+    :param end: 结束时间（含所在桶），默认为当前时间
+    :param keyword: 关键词（精确匹配），为空表示全部
+    :param engine: 搜索引擎，为空表示全部
+    :param source: search（舆情结果）或 article（文章）
+    :param points: 最多返回的点数，超过时降采样，小于 3 表示不降采样
+    :param max_buckets: 补零后的桶数上限
+    :return: {'granularity', 'start', 'end', 'buckets', 'series', 'sampled'}；参数不合法时抛出 ValueError
+    """
+    if granularity not in STEPS:
+        raise ValueError(f'不支持的粒度: {granularity}')
+    step = STEPS[granularity]
+    end = floor_bucket(end or datetime.utcnow(), granularity)
+    start = floor_bucket(start or end - DEFAULT_SPANS[granularity] + step, granularity)
+
+    # 早于水位的时间段已压缩为更粗的粒度（hour 水位对齐到日、day 水位对齐到周一）
+    floor = watermarks().get(granularity, '')
+    if floor and bucket_key(start, granularity) < floor:
+        start = datetime.fromisoformat(floor)
+    if start > end:
+        raise ValueError('起始时间晚于结束时间')
+    if (end - start) / step + 1 > max_buckets:
+        raise ValueError('时间范围过大，请使用更粗的粒度')
+
+    bucket = _bucket_expr(granularity).label('b')
+    query = (
+        select(bucket, SentimentRollup.sentiment, func.sum(SentimentRollup.count))
+        .where(SentimentRollup.source == source,
+               SentimentRollup.level.in_(LEVELS[granularity]),
+               SentimentRollup.bucket >= bucket_key(start, granularity),
+               SentimentRollup.bucket < bucket_key(end + step, granularity))
+        .group_by(bucket, SentimentRollup.sentiment)
+    )
+    if keyword:
+        query = query.where(SentimentRollup.keyword == keyword)
+    if engine:
+        query = query.where(SentimentRollup.engine == engine)
+    counts = {(b, sentiment): count for b, sentiment, count in db.session.execute(query)}
+
+    keys = []
+    moment = start
+    while moment <= end:
+        keys.append(bucket_key(moment, granularity))
+        moment += step
+
+    series = {sentiment: [counts.get((key, sentiment), 0) for key in keys] for sentiment in SENTIMENTS}
+    series['total'] = [sum(values) for values in zip(*(series[s] for s in SENTIMENTS))]
+
+    sampled = points >= 3 and len(keys) > points
+    if sampled:
+        indices = lttb(series['total'], points)
+        keys = [keys[i] for i in indices]
+        series = {name: [values[i] for i in indices] for name, values in series.items()}
+
+    label_length = 16 if granularity == 'hour' else 10
+    return {
+        'granularity': granularity,
+        'start': bucket_key(start, granularity)[:label_length],
+        'end': bucket_key(end, granularity)[:label_length],
+        'buckets': [key[:label_length] for key in keys],
+        'series': series,
+        'sampled': sampled,
+    }
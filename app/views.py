@@ -2,7 +2,7 @@
 路由和业务逻辑处理
 """
 from functools import wraps
-from flask import Blueprint, render_template, request, redirect, url_for, jsonify, session
+from flask import Blueprint, Response, current_app, render_template, request, redirect, url_for, jsonify, session, stream_with_context
 from app.database import verify_user, create_user, get_user_by_username
 
 # 创建蓝图
@@ -19,6 +19,22 @@ def login_required(f):
     return decorated_function
 
 
+def request_priority(data):
+    """
+    请求中指定的任务优先级：只有管理员可以指定，转换为整数并限制在 ±MAX_PRIORITY 内，其他情况为 0
+    :param data: 请求 JSON
+    """
+    from app.jobs import MAX_PRIORITY
+    
+    if session.get('role') != 'admin':
+        return 0
+    try:
+        priority = int(data.get('priority', 0))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+    return max(-MAX_PRIORITY, min(priority, MAX_PRIORITY))
+
+
 @main_bp.route('/')
 def index():
     """首页/登录页"""
@@ -79,20 +95,24 @@ def logout():
 
 @main_bp.route('/api/users', methods=['GET'])
 def get_users():
-    """获取用户列表 API"""
+    """获取用户列表 API（游标分页，兼容 page/limit）"""
     from app.models import User
+    from app.pagination import keyset_paginate
     
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 10, type=int)
+    cursor = request.args.get('cursor')
     
-    pagination = User.query.paginate(page=page, per_page=limit, error_out=False)
-    users = [user.to_dict() for user in pagination.items]
+    result = keyset_paginate(User.query, [User.created_at, User.id], page, limit,
+                             cursor=cursor, key=('users',))
+    users = [user.to_dict() for user in result['items']]
     
     return jsonify({
         'code': 0,
         'msg': 'success',
-        'count': pagination.total,
-        'data': users
+        'count': result['total'],
+        'data': users,
+        'next_cursor': result['next_cursor']
     })
 
 
@@ -101,16 +121,15 @@ def get_users():
 @main_bp.route('/api/crawl', methods=['POST'])
 @login_required
 def start_crawl():
-    """启动爬取任务"""
-    from datetime import datetime
+    """提交爬取任务，由后台任务队列执行"""
     from app import db
-    from app.models import SearchResult, CrawlTask
-    from app.crawler import SearchCrawler, SentimentAnalyzer
+    from app.jobs import queue
     
     data = request.get_json()
     keyword = data.get('keyword', '').strip()
     engine = data.get('engine', 'bing')  # baidu/bing/all
     pages = data.get('pages', 1)
+    priority = request_priority(data)
     
     if not keyword:
         return jsonify({'code': 1, 'msg': '请输入搜索关键词'})
@@ -119,101 +138,173 @@ def start_crawl():
         pages = 5  # 限制最大页数
     
     try:
-        # 创建任务记录
-        task = CrawlTask(keyword=keyword, engine=engine, pages=pages, status='running')
-        db.session.add(task)
-        db.session.commit()
-        
-        # 执行爬取
-        crawler = SearchCrawler()
-        analyzer = SentimentAnalyzer()
-        results = crawler.search(keyword, engine=engine, pages=pages)
-        
-        # 保存结果并分析情感
-        saved_count = 0
-        for item in results:
-            # 情感分析
-            text = item['title'] + ' ' + item['abstract']
-            sentiment_result = analyzer.analyze(text)
-            
-            result = SearchResult(
-                keyword=keyword,
-                title=item['title'],
-                link=item['link'],
-                abstract=item['abstract'],
-                source=item['source'],
-                engine=item['engine'],
-                sentiment=sentiment_result['sentiment'],
-                sentiment_score=sentiment_result['score']
-            )
-            db.session.add(result)
-            saved_count += 1
-        
-        # 更新任务状态
-        task.status = 'completed'
-        task.result_count = saved_count
-        task.completed_at = datetime.utcnow()
-        db.session.commit()
+        task = queue.enqueue('crawl', keyword, engine=engine, pages=pages, priority=priority)
         
         return jsonify({
             'code': 0,
-            'msg': f'爬取完成，共获取 {saved_count} 条结果',
-            'data': {'task_id': task.id, 'count': saved_count}
+            'msg': '爬取任务已提交',
+            'data': {'task_id': task.id, 'status': task.status}
         })
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'code': 1, 'msg': f'爬取失败: {str(e)}'})
+        return jsonify({'code': 1, 'msg': f'提交任务失败: {str(e)}'})
 
 
 @main_bp.route('/api/search_results', methods=['GET'])
 @login_required
 def get_search_results():
-    """获取舆情数据列表"""
+    """获取舆情数据列表（按爬取时间游标分页；全文检索按相关度排序时使用偏移分页）"""
     from app.models import SearchResult
+    from app.search_index import apply_filters
+    from app.pagination import keyset_paginate
     
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 10, type=int)
+    cursor = request.args.get('cursor')
     keyword = request.args.get('keyword', '')
     sentiment = request.args.get('sentiment', '')
+    q = request.args.get('q', '').strip()  # 全文检索：标题、摘要、关键词
     
-    query = SearchResult.query
+    query = apply_filters(SearchResult.query, SearchResult, keyword, sentiment, q)
     
-    if keyword:
-        query = query.filter(SearchResult.keyword.like(f'%{keyword}%'))
-    if sentiment:
-        query = query.filter(SearchResult.sentiment == sentiment)
+    if q:
+        query = query.order_by(SearchResult.crawl_time.desc(), SearchResult.id.desc())
+        pagination = query.paginate(page=page, per_page=limit, error_out=False)
+        items, total, next_cursor = pagination.items, pagination.total, None
+    else:
+        result = keyset_paginate(query, [SearchResult.crawl_time, SearchResult.id], page, limit,
+                                 cursor=cursor, key=('search_results', keyword, sentiment))
+        items, total, next_cursor = result['items'], result['total'], result['next_cursor']
+    
+    return jsonify({
+        'code': 0,
+        'msg': 'success',
+        'count': total,
+        'data': [r.to_dict() for r in items],
+        'next_cursor': next_cursor
+    })
+
+
+@main_bp.route('/api/articles', methods=['GET'])
+@login_required
+def get_articles():
+    """获取已保存文章列表，支持全文检索（游标分页规则同舆情数据列表；不含正文，正文见文章详情）"""
+    from app.models import ArticleData
+    from app.search_index import apply_filters
+    from app.pagination import keyset_paginate
+    
+    page = request.args.get('page', 1, type=int)
+    limit = request.args.get('limit', 10, type=int)
+    cursor = request.args.get('cursor')
+    keyword = request.args.get('keyword', '')
+    sentiment = request.args.get('sentiment', '')
+    q = request.args.get('q', '').strip()  # 全文检索：标题、摘要、关键词、正文
+    
+    query = apply_filters(ArticleData.query, ArticleData, keyword, sentiment, q)
     
-    query = query.order_by(SearchResult.crawl_time.desc())
-    pagination = query.paginate(page=page, per_page=limit, error_out=False)
+    if q:
+        query = query.order_by(ArticleData.created_at.desc(), ArticleData.id.desc())
+        pagination = query.paginate(page=page, per_page=limit, error_out=False)
+        items, total, next_cursor = pagination.items, pagination.total, None
+    else:
+        result = keyset_paginate(query, [ArticleData.created_at, ArticleData.id], page, limit,
+                                 cursor=cursor, key=('article_data', keyword, sentiment))
+        items, total, next_cursor = result['items'], result['total'], result['next_cursor']
     
     return jsonify({
         'code': 0,
         'msg': 'success',
-        'count': pagination.total,
-        'data': [r.to_dict() for r in pagination.items]
+        'count': total,
+        'data': [a.to_dict() for a in items],
+        'next_cursor': next_cursor
     })
 
 
+@main_bp.route('/api/articles/<int:article_id>', methods=['GET'])
+@login_required
+def get_article(article_id):
+    """获取文章详情（含正文；列表接口不返回正文）"""
+    from app import db
+    from app.models import ArticleData
+    
+    article = db.session.get(ArticleData, article_id)
+    if article is None:
+        return jsonify({'code': 1, 'msg': '文章不存在'})
+    
+    return jsonify({'code': 0, 'data': article.to_dict(include_content=True)})
+
+
+def export_response(model, order_columns, filename):
+    """
+    流式导出响应
+    请求参数: format=csv/ndjson，fields=逗号分隔的字段名，过滤参数 keyword/sentiment/q 同列表接口；
+    请求头 Accept-Encoding 接受 gzip（q 值大于 0）时压缩传输
+    """
+    from datetime import datetime
+    from app import export
+    
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return jsonify({'code': 1, 'msg': f'不支持的导出格式: {fmt}'})
+    fields = [f for f in request.args.get('fields', '').split(',') if f]
+    
+    try:
+        names, query = export.build_query(
+            model, order_columns, fields,
+            keyword=request.args.get('keyword', ''),
+            sentiment=request.args.get('sentiment', ''),
+            q=request.args.get('q', '').strip()
+        )
+    except ValueError as e:
+        return jsonify({'code': 1, 'msg': str(e)})
+    
+    gzip = request.accept_encodings['gzip'] > 0
+    response = Response(stream_with_context(export.stream(names, query, fmt, gzip)), mimetype=export.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}-{datetime.now():%Y%m%d%H%M%S}.{fmt}'
+    response.headers['Vary'] = 'Accept-Encoding'
+    if gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+@main_bp.route('/api/export/search_results', methods=['GET'])
+@login_required
+def export_search_results():
+    """导出舆情数据（按爬取时间倒序）"""
+    from app.models import SearchResult
+    
+    return export_response(SearchResult, [SearchResult.crawl_time, SearchResult.id], 'search_results')
+
+
+@main_bp.route('/api/export/articles', methods=['GET'])
+@login_required
+def export_articles():
+    """导出已保存文章（按创建时间倒序）"""
+    from app.models import ArticleData
+    
+    return export_response(ArticleData, [ArticleData.created_at, ArticleData.id], 'articles')
+
+
 @main_bp.route('/api/sentiment_stats', methods=['GET'])
 @login_required
 def get_sentiment_stats():
-    """获取情感统计数据"""
+    """获取情感统计数据（读取按日汇总表）"""
     from app import db
-    from app.models import SearchResult
+    from app.models import SentimentDaily
     from sqlalchemy import func
     
     keyword = request.args.get('keyword', '')
     
     query = db.session.query(
-        SearchResult.sentiment,
-        func.count(SearchResult.id).label('count')
+        SentimentDaily.sentiment,
+        func.sum(SentimentDaily.count).label('count')
     )
     
     if keyword:
-        query = query.filter(SearchResult.keyword.like(f'%{keyword}%'))
+        query = query.filter(SentimentDaily.keyword.like(f'%{keyword}%'))
     
-    stats = query.group_by(SearchResult.sentiment).all()
+    stats = query.group_by(SentimentDaily.sentiment).all()
     
     result = {'positive': 0, 'negative': 0, 'neutral': 0}
     for sentiment, count in stats:
@@ -231,46 +322,273 @@ def get_sentiment_stats():
     })
 
 
+@main_bp.route('/api/sentiment_trend', methods=['GET'])
+@login_required
+def get_sentiment_trend():
+    """
+    获取情感趋势序列（读取分级汇总表）
+    参数: granularity=hour/day/week, start/end 或 range（如 48h、90d、52w、1y），keyword, engine,
+    source=search/article, points 最多返回的点数（超过时 LTTB 降采样，0 表示不降采样）
+    """
+    from datetime import datetime
+    from flask import current_app
+    from app.trend import query_trend, parse_span, parse_time
+    
+    granularity = request.args.get('granularity', 'day')
+    source = request.args.get('source', 'search')
+    points = request.args.get('points', current_app.config.get('TREND_MAX_POINTS', 500), type=int)
+    
+    if source not in ('search', 'article'):
+        return jsonify({'code': 1, 'msg': f'不支持的数据来源: {source}'})
+    
+    try:
+        end = parse_time(request.args['end']) if request.args.get('end') else datetime.utcnow()
+        if request.args.get('start'):
+            start = parse_time(request.args['start'])
+        elif request.args.get('range'):
+            start = end - parse_span(request.args['range'])
+        else:
+            start = None
+        data = query_trend(granularity, start, end,
+                           keyword=request.args.get('keyword', '').strip(),
+                           engine=request.args.get('engine', ''),
+                           source=source, points=points,
+                           max_buckets=current_app.config.get('TREND_MAX_BUCKETS', 20000))
+    except ValueError as e:
+        return jsonify({'code': 1, 'msg': str(e)})
+    
+    return jsonify({'code': 0, 'data': data})
+
+
 @main_bp.route('/api/crawl_tasks', methods=['GET'])
 @login_required
 def get_crawl_tasks():
-    """获取爬取任务列表"""
+    """获取爬取任务列表（游标分页，兼容 page/limit）"""
     from app.models import CrawlTask
+    from app.pagination import keyset_paginate
     
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 10, type=int)
+    cursor = request.args.get('cursor')
     
-    pagination = CrawlTask.query.order_by(CrawlTask.created_at.desc()).paginate(
-        page=page, per_page=limit, error_out=False
-    )
+    result = keyset_paginate(CrawlTask.query, [CrawlTask.created_at, CrawlTask.id], page, limit,
+                             cursor=cursor, key=('crawl_tasks',))
     
     return jsonify({
         'code': 0,
         'msg': 'success',
-        'count': pagination.total,
-        'data': [t.to_dict() for t in pagination.items]
+        'count': result['total'],
+        'data': [t.to_dict() for t in result['items']],
+        'next_cursor': result['next_cursor']
     })
 
 
-# ==================== 数据采集管理 API ====================
+@main_bp.route('/api/http_stats', methods=['GET'])
+@login_required
+def get_http_stats():
+    """获取出站连接池复用、限速及响应缓存状态"""
+    from app.http_client import client
+    from app.http_cache import response_cache
+    from app.ratelimit import scheduler
+    
+    return jsonify({
+        'code': 0,
+        'data': {
+            'pool': client.stats(),
+            'hosts': scheduler.stats(),
+            'cache': response_cache.stats()
+        }
+    })
+
+
+@main_bp.route('/api/retention', methods=['GET', 'POST'])
+@login_required
+def retention_status():
+    """采集临时表的数据量和数据库空间（GET），立即执行一次清理（POST，dry_run=1 时只统计）"""
+    from app import retention
+    
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        summary = retention.run(dry_run=bool(data.get('dry_run')))
+        return jsonify({'code': 0, 'msg': f'清理 {summary["batches"]} 个批次，共 {summary["purged"]} 行',
+                        'data': {**summary, 'stats': retention.stats()}})
+    
+    return jsonify({'code': 0, 'data': retention.stats()})
+
+
+@main_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus 指标导出；配置了 METRICS_TOKEN 时凭 Bearer 令牌访问，否则需要登录"""
+    import hmac
+    from app.metrics import registry
+    
+    token = current_app.config.get('METRICS_TOKEN')
+    auth = request.headers.get('Authorization', '')
+    authorized = 'user_id' in session or (token and hmac.compare_digest(auth, f'Bearer {token}'))
+    if not authorized:
+        return Response('unauthorized\n', status=401, mimetype='text/plain')
+    
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@main_bp.route('/api/profiler', methods=['GET', 'POST'])
+@login_required
+def profiler_settings():
+    """查看或切换慢请求采样分析器"""
+    from app.metrics import profiler
+    
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            profiler.configure(enabled=data.get('enabled'), slow_ms=data.get('slow_ms'))
+        except (TypeError, ValueError):
+            return jsonify({'code': 1, 'msg': 'slow_ms 必须是数字'})
+    
+    return jsonify({
+        'code': 0,
+        'data': dict(profiler.status(), recent=profiler.files()[:20])
+    })
 
-# 存储采集任务进度
-collect_tasks = {}
+
+@main_bp.route('/api/crawl_tasks/<int:task_id>', methods=['GET'])
+@login_required
+def get_crawl_task(task_id):
+    """获取单个爬取任务状态"""
+    from app.models import CrawlTask
+    
+    task = CrawlTask.query.get(task_id)
+    if not task:
+        return jsonify({'code': 1, 'msg': '任务不存在'})
+    
+    return jsonify({'code': 0, 'data': task.to_dict()})
+
+
+@main_bp.route('/api/crawl_tasks/<int:task_id>/cancel', methods=['POST'])
+@login_required
+def cancel_crawl_task(task_id):
+    """取消爬取/采集任务"""
+    from app.jobs import queue
+    
+    if not queue.cancel(task_id):
+        return jsonify({'code': 1, 'msg': '任务不存在或已结束'})
+    
+    return jsonify({'code': 0, 'msg': '已请求取消任务'})
+
+
+# ==================== 关键词监控 API ====================
+
+@main_bp.route('/api/monitors', methods=['GET'])
+@login_required
+def get_monitors():
+    """获取监控关键词列表"""
+    from app.models import MonitoredKeyword
+    
+    monitors = MonitoredKeyword.query.order_by(MonitoredKeyword.id.desc()).all()
+    return jsonify({'code': 0, 'msg': 'success', 'count': len(monitors), 'data': [m.to_dict() for m in monitors]})
+
+
+@main_bp.route('/api/monitors', methods=['POST'])
+@login_required
+def add_monitors():
+    """登记监控关键词（支持 keywords 批量登记），首次爬取时间在一个间隔内随机分布"""
+    from app import db
+    from app.monitor import monitors
+    
+    data = request.get_json() or {}
+    keywords = data.get('keywords') or [data.get('keyword', '')]
+    keywords = [k.strip() for k in keywords if isinstance(k, str) and k.strip()]
+    
+    if not keywords:
+        return jsonify({'code': 1, 'msg': '请输入监控关键词'})
+    
+    count = monitors.register(keywords, engine=data.get('engine', 'all'), max_pages=int(data.get('max_pages', 5)),
+                              interval=data.get('interval', 3600))
+    db.session.commit()
+    
+    return jsonify({'code': 0, 'msg': f'已登记 {count} 个关键词', 'data': {'count': count}})
+
+
+@main_bp.route('/api/monitors/<int:monitor_id>', methods=['PUT'])
+@login_required
+def update_monitor(monitor_id):
+    """修改监控关键词的启用状态、间隔、引擎和最大页数"""
+    from app import db
+    from app.models import MonitoredKeyword
+    from app.monitor import monitors
+    
+    monitor = db.session.get(MonitoredKeyword, monitor_id)
+    if monitor is None:
+        return jsonify({'code': 1, 'msg': '监控关键词不存在'})
+    
+    data = request.get_json() or {}
+    if 'engine' in data:
+        monitor.engine = data['engine']
+    if 'max_pages' in data:
+        monitor.max_pages = int(data['max_pages'])
+    if 'interval' in data:
+        monitor.interval = max(int(data['interval']), monitors.min_interval)
+    if 'enabled' in data:
+        enabled = bool(data['enabled'])
+        # 重新启用时不补跑停用期间错过的爬取，按间隔重新安排
+        if enabled and not monitor.enabled:
+            monitor.next_run_at = monitors.next_run(monitor.interval, first=True)
+        monitor.enabled = enabled
+    db.session.commit()
+    
+    return jsonify({'code': 0, 'msg': '修改成功', 'data': monitor.to_dict()})
+
+
+@main_bp.route('/api/monitors/<int:monitor_id>', methods=['DELETE'])
+@login_required
+def delete_monitor(monitor_id):
+    """删除监控关键词（已爬取的结果保留）"""
+    from app import db
+    from app.models import MonitoredKeyword
+    
+    monitor = db.session.get(MonitoredKeyword, monitor_id)
+    if monitor is None:
+        return jsonify({'code': 1, 'msg': '监控关键词不存在'})
+    
+    db.session.delete(monitor)
+    db.session.commit()
+    
+    return jsonify({'code': 0, 'msg': '删除成功'})
+
+
+@main_bp.route('/api/monitors/<int:monitor_id>/run', methods=['POST'])
+@login_required
+def run_monitor_now(monitor_id):
+    """立即爬取监控关键词（在调度线程下次扫描时入队）"""
+    from datetime import datetime
+    from app import db
+    from app.models import MonitoredKeyword
+    
+    monitor = db.session.get(MonitoredKeyword, monitor_id)
+    if monitor is None:
+        return jsonify({'code': 1, 'msg': '监控关键词不存在'})
+    
+    monitor.next_run_at = datetime.utcnow()
+    db.session.commit()
+    
+    return jsonify({'code': 0, 'msg': '已安排爬取'})
+
+
+# ==================== 数据采集管理 API ====================
 
 @main_bp.route('/api/collect/start', methods=['POST'])
 @login_required
 def start_collect():
-    """启动数据采集任务"""
+    """提交数据采集任务，由后台任务队列执行"""
     import uuid
-    import threading
     from app import db
-    from app.models import CollectedData
-    from app.crawler import SearchCrawler
+    from app.jobs import queue
+    from app.progress import progress
     
     data = request.get_json()
     keyword = data.get('keyword', '').strip()
     engine = data.get('engine', 'bing')
     pages = data.get('pages', 1)
+    priority = request_priority(data)
     
     if not keyword:
         return jsonify({'code': 1, 'msg': '请输入采集关键词'})
@@ -278,96 +596,60 @@ def start_collect():
     # 生成任务ID
     task_id = str(uuid.uuid4())[:8]
     
-    # 初始化任务状态
-    collect_tasks[task_id] = {
-        'status': 'running',
-        'progress': 0,
-        'message': '正在初始化...',
-        'keyword': keyword,
-        'engine': engine,
-        'pages': pages
-    }
-    
-    # 在后台线程执行采集
-    def do_collect():
-        try:
-            from app import create_app
-            app = create_app('development')
-            
-            with app.app_context():
-                collect_tasks[task_id]['progress'] = 10
-                collect_tasks[task_id]['message'] = '正在连接搜索引擎...'
-                
-                crawler = SearchCrawler()
-                
-                collect_tasks[task_id]['progress'] = 20
-                collect_tasks[task_id]['message'] = f'正在搜索"{keyword}"...'
-                
-                results = crawler.search(keyword, engine=engine, pages=pages)
-                
-                collect_tasks[task_id]['progress'] = 60
-                collect_tasks[task_id]['message'] = f'已获取 {len(results)} 条结果，正在处理...'
-                
-                # 保存到临时表
-                for i, item in enumerate(results):
-                    # 尝试提取封面图片
-                    cover = extract_cover_from_url(item.get('link', ''))
-                    
-                    collected = CollectedData(
-                        task_id=task_id,
-                        keyword=keyword,
-                        title=item.get('title', ''),
-                        link=item.get('link', ''),
-                        cover=cover,
-                        source=item.get('source', ''),
-                        abstract=item.get('abstract', ''),
-                        deep_crawled=False,
-                        is_saved=False
-                    )
-                    db.session.add(collected)
-                    
-                    # 更新进度
-                    progress = 60 + int((i + 1) / len(results) * 35)
-                    collect_tasks[task_id]['progress'] = progress
-                    collect_tasks[task_id]['message'] = f'正在保存数据 ({i+1}/{len(results)})...'
-                
-                db.session.commit()
-                
-                collect_tasks[task_id]['progress'] = 100
-                collect_tasks[task_id]['message'] = f'采集完成，共 {len(results)} 条数据'
-                collect_tasks[task_id]['status'] = 'completed'
-                
-        except Exception as e:
-            collect_tasks[task_id]['status'] = 'failed'
-            collect_tasks[task_id]['message'] = str(e)
+    # 初始化任务状态（须在入队前写入，工作线程可能立即开始更新进度）
+    progress.create(
+        task_id,
+        status='pending',
+        progress=0,
+        message='任务排队中...',
+        keyword=keyword,
+        engine=engine,
+        pages=pages
+    )
     
-    thread = threading.Thread(target=do_collect)
-    thread.start()
+    try:
+        job = queue.enqueue('collect', keyword, engine=engine, pages=pages,
+                            payload={'task_id': task_id}, priority=priority)
+        progress.update(task_id, force=True, job_id=job.id)
+    except Exception as e:
+        db.session.rollback()
+        progress.update(task_id, status='failed', message=f'提交任务失败: {str(e)}')
+        return jsonify({'code': 1, 'msg': f'提交任务失败: {str(e)}'})
     
     return jsonify({
         'code': 0,
-        'msg': '采集任务已启动',
-        'data': {'task_id': task_id}
+        'msg': '采集任务已提交',
+        'data': {'task_id': task_id, 'job_id': job.id}
     })
 
 
-def extract_cover_from_url(url):
-    """从URL提取可能的封面图片"""
-    # 简单的封面提取逻辑，可以后续扩展
-    if not url:
-        return None
-    # 返回一个基于域名的占位图或None
-    return None
+@main_bp.route('/api/collect/cancel/<task_id>', methods=['POST'])
+@login_required
+def cancel_collect(task_id):
+    """取消采集任务"""
+    from app.jobs import queue
+    from app.progress import progress
+    
+    task = progress.get(task_id)
+    if not task or 'job_id' not in task or not queue.cancel(task['job_id']):
+        return jsonify({'code': 1, 'msg': '任务不存在或已结束'})
+    
+    if task['status'] == 'pending':
+        progress.update(task_id, status='cancelled', message='任务已取消')
+    
+    return jsonify({'code': 0, 'msg': '已请求取消任务'})
 
 
 @main_bp.route('/api/collect/progress/<task_id>')
 @login_required
 def get_collect_progress(task_id):
     """获取采集进度"""
-    if task_id not in collect_tasks:
+    from app.progress import progress
+    
+    task = progress.get(task_id)
+    if task is None:
         return jsonify({'code': 1, 'msg': '任务不存在'})
     
-    task = collect_tasks[task_id]
     return jsonify({
         'code': 0,
         'data': {
@@ -378,17 +660,152 @@ def get_collect_progress(task_id):
     })
 
 
+def sse_event(event, data, event_id=None):
+    """
+    格式化一条 Server-Sent Events 消息
+    :param event: 事件名
+    :param data: 事件数据（序列化为 JSON）
+    :param event_id: 事件ID，客户端重连时通过 Last-Event-ID 带回
+    """
+    import json
+    
+    message = f'event: {event}\n'
+    if event_id is not None:
+        message += f'id: {event_id}\n'
+    return message + f'data: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+def sse_response(generator):
+    """包装为 SSE 流式响应"""
+    return Response(stream_with_context(generator), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # 关闭反向代理缓冲
+    })
+
+
+def watch_progress(poll, fetch_batch=None, last_id=0):
+    """
+    轮询服务端进度并在变化时推送事件，直到任务结束或连接超时
+    :param poll: 返回当前状态字典 (status/progress/message...)，任务不存在时返回 None
+    :param fetch_batch: 可选，按 last_id 返回新增数据 (行列表, 新的 last_id)
+    :param last_id: 已推送数据的最大ID
+    """
+    import time
+    from app import db
+    from app.progress import TERMINAL_STATUSES
+    
+    interval = current_app.config.get('SSE_POLL_INTERVAL', 0.5)
+    heartbeat = current_app.config.get('SSE_HEARTBEAT', 15)
+    deadline = time.monotonic() + current_app.config.get('SSE_TIMEOUT', 300)
+    last_state = None
+    last_sent = time.monotonic()
+    
+    # 让客户端在断线后 3 秒重连
+    yield 'retry: 3000\n\n'
+    
+    while time.monotonic() < deadline:
+        state = poll()
+        if state is None:
+            yield sse_event('missing', {'msg': '任务不存在'})
+            return
+        
+        if fetch_batch:
+            rows, last_id = fetch_batch(last_id)
+            if rows:
+                yield sse_event('batch', rows, event_id=last_id)
+                last_sent = time.monotonic()
+        
+        # 结束本轮读事务，避免长连接持有数据库快照
+        db.session.rollback()
+        
+        if state.get('status') in TERMINAL_STATUSES:
+            yield sse_event('done', state)
+            return
+        
+        if state != last_state:
+            last_state = state
+            yield sse_event('progress', state)
+            last_sent = time.monotonic()
+        
+        if time.monotonic() - last_sent >= heartbeat:
+            yield ': keep-alive\n\n'
+            last_sent = time.monotonic()
+        
+        time.sleep(interval)
+
+
+@main_bp.route('/api/collect/stream/<task_id>')
+@login_required
+def stream_collect_progress(task_id):
+    """采集进度推送 (SSE)：进度、分批数据和完成事件"""
+    from app.models import CollectedData
+    from app.progress import progress
+    
+    def poll():
+        doc = progress.get(task_id)
+        if doc is None:
+            return None
+        return {'status': doc.get('status'), 'progress': doc.get('progress', 0), 'message': doc.get('message', '')}
+    
+    def fetch_batch(last_id):
+        rows = CollectedData.query.filter(
+            CollectedData.task_id == task_id, CollectedData.id > last_id
+        ).order_by(CollectedData.id.asc()).limit(100).all()
+        if not rows:
+            return [], last_id
+        return [r.to_dict() for r in rows], rows[-1].id
+    
+    last_id = request.headers.get('Last-Event-ID', 0, type=int)
+    return sse_response(watch_progress(poll, fetch_batch, last_id))
+
+
+@main_bp.route('/api/crawl/stream/<int:task_id>')
+@login_required
+def stream_crawl_progress(task_id):
+    """爬取任务进度推送 (SSE)；任务最终状态以 crawl_tasks 表为准"""
+    from app import db
+    from app.models import CrawlTask
+    from app.progress import progress
+    from app.tasks import crawl_progress_id
+    
+    def poll():
+        task = db.session.get(CrawlTask, task_id)
+        if task is None:
+            return None
+        doc = progress.get(crawl_progress_id(task_id)) or {}
+        return {
+            'status': task.status,
+            'progress': doc.get('progress', 0),
+            'message': doc.get('message') or ('任务排队中...' if task.status == 'pending' else ''),
+            'result_count': task.result_count,
+            'error_msg': task.error_msg
+        }
+    
+    return sse_response(watch_progress(poll))
+
+
 @main_bp.route('/api/collect/data/<task_id>')
 @login_required
 def get_collect_data(task_id):
-    """获取采集的数据列表"""
+    """获取采集的数据列表，近似重复的正文按组归并（collapse=1 时只返回每组代表）"""
     from app.models import CollectedData
+    from app.fingerprint import group_duplicates
+    
+    collapse = request.args.get('collapse', 0, type=int)
     
     data = CollectedData.query.filter_by(task_id=task_id).order_by(CollectedData.id.asc()).all()
     
+    result = []
+    for head, duplicates in group_duplicates(data):
+        for item in [head] if collapse else [head] + duplicates:
+            row = item.to_dict()
+            row['group_id'] = head.id
+            row['dup_count'] = len(duplicates) if item is head else 0
+            result.append(row)
+    
     return jsonify({
         'code': 0,
-        'data': [d.to_dict() for d in data]
+        'data': result
     })
 
 
@@ -396,10 +813,10 @@ def get_collect_data(task_id):
 @login_required
 def deep_collect(data_id):
     """深度采集单条数据"""
-    import requests
-    from bs4 import BeautifulSoup
     from app import db
     from app.models import CollectedData
+    from app.article import fetch_article, apply_article
+    from app.fingerprint import register
     
     data = CollectedData.query.get(data_id)
     if not data:
@@ -409,74 +826,11 @@ def deep_collect(data_id):
         return jsonify({'code': 1, 'msg': '已经深度采集过了'})
     
     try:
-        # 请求原始页面
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36'
-        }
-        response = requests.get(data.link, headers=headers, timeout=10)
-        response.encoding = response.apparent_encoding or 'utf-8'
+        # 请求原始页面并提取正文
+        apply_article(data, fetch_article(data.link))
         
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 提取正文内容
-        content = ''
-        # 尝试多种选择器
-        content_selectors = ['article', '.article-content', '.content', '.post-content', '#content', 'main', '.main-content']
-        for selector in content_selectors:
-            elem = soup.select_one(selector)
-            if elem:
-                content = elem.get_text(strip=True, separator='\n')
-                break
-        
-        if not content:
-            # 提取body中的所有p标签
-            paragraphs = soup.select('p')
-            content = '\n'.join([p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 20])
-        
-        # 提取封面图片
-        cover = None
-        og_image = soup.select_one('meta[property="og:image"]')
-        if og_image:
-            cover = og_image.get('content')
-        else:
-            # 尝试找第一张大图
-            imgs = soup.select('img[src]')
-            for img in imgs:
-                src = img.get('src', '')
-                if src and not 'logo' in src.lower() and not 'icon' in src.lower():
-                    if src.startswith('//'):
-                        src = 'https:' + src
-                    elif src.startswith('/'):
-                        from urllib.parse import urlparse
-                        parsed = urlparse(data.link)
-                        src = f"{parsed.scheme}://{parsed.netloc}{src}"
-                    cover = src
-                    break
-        
-        # 提取发布时间
-        publish_time = None
-        time_selectors = ['time', '.time', '.date', '.publish-time', 'meta[property="article:published_time"]']
-        for selector in time_selectors:
-            elem = soup.select_one(selector)
-            if elem:
-                publish_time = elem.get('datetime') or elem.get('content') or elem.get_text(strip=True)
-                break
-        
-        # 提取作者
-        author = None
-        author_selectors = ['.author', '.writer', 'meta[name="author"]', '.byline']
-        for selector in author_selectors:
-            elem = soup.select_one(selector)
-            if elem:
-                author = elem.get('content') or elem.get_text(strip=True)
-                break
-        
-        # 更新数据
-        data.content = content[:5000] if content else ''  # 限制长度
-        data.cover = cover or data.cover
-        data.publish_time = publish_time
-        data.author = author
-        data.deep_crawled = True
+        # 正文指纹，标记近似重复
+        register(data)
         
         db.session.commit()
         
@@ -487,7 +841,8 @@ def deep_collect(data_id):
                 'content': data.content[:200] + '...' if len(data.content) > 200 else data.content,
                 'cover': data.cover,
                 'publish_time': data.publish_time,
-                'author': data.author
+                'author': data.author,
+                'dup_of': data.dup_of
             }
         })
         
@@ -495,12 +850,104 @@ def deep_collect(data_id):
         return jsonify({'code': 1, 'msg': f'深度采集失败: {str(e)}'})
 
 
+@main_bp.route('/api/collect/deep_batch', methods=['POST'])
+@login_required
+def deep_collect_batch():
+    """
+    批量深度采集：按批次 task_id 或 ids 列表选取未深度采集的数据，
+    线程池并发抓取（按主机限速由出站客户端保证），以 SSE 逐条推送完成情况，结果分批提交
+    会修改数据，只接受 POST（JSON 或表单），前端用 fetch 读取流式响应；表单中的 ids 为逗号分隔的ID
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from itertools import zip_longest
+    from urllib.parse import urlparse
+    from app import db
+    from app.models import CollectedData
+    from app.article import fetch_article, apply_article
+    from app.fingerprint import register
+    from app.database import begin_write
+    
+    params = request.get_json(silent=True) or request.form
+    task_id = params.get('task_id')
+    ids = params.get('ids') or []
+    if isinstance(ids, str):
+        ids = [int(i) for i in ids.split(',') if i.strip().isdigit()]
+    
+    if not task_id and not ids:
+        return jsonify({'code': 1, 'msg': '请指定采集批次或数据ID'})
+    
+    query = CollectedData.query.filter(CollectedData.deep_crawled.is_not(True))
+    if task_id:
+        query = query.filter(CollectedData.task_id == task_id)
+    if ids:
+        query = query.filter(CollectedData.id.in_(ids))
+    items = {d.id: d for d in query.order_by(CollectedData.id.asc()).all()}
+    
+    # 按主机轮流排列提交顺序，避免同一主机的限速等待占满线程池
+    by_host = {}
+    for d in items.values():
+        by_host.setdefault(urlparse(d.link or '').hostname, []).append(d.id)
+    order = [data_id for group in zip_longest(*by_host.values()) for data_id in group if data_id is not None]
+    
+    workers = current_app.config.get('DEEP_COLLECT_WORKERS', 8)
+    commit_every = current_app.config.get('DEEP_COLLECT_COMMIT_EVERY', 10)
+    
+    def generate():
+        yield sse_event('start', {'total': len(items)})
+        
+        done = failed = pending = 0
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            # 工作线程只做抓取和解析，数据库写入都在当前线程
+            futures = {executor.submit(fetch_article, items[data_id].link): data_id for data_id in order}
+            for future in as_completed(futures):
+                data = items[futures[future]]
+                try:
+                    article = future.result()
+                    # 每条数据一个保存点，登记指纹失败时撤销已写入对象的提取结果，不随下一批提交；
+                    # 保存点须在显式开启的事务内，否则释放时立即提交，无法分批
+                    begin_write()
+                    with db.session.begin_nested():
+                        apply_article(data, article)
+                        register(data)
+                    pending += 1
+                    done += 1
+                    result = {
+                        'id': data.id, 'ok': True, 'dup_of': data.dup_of,
+                        'content': data.content[:200] + '...' if len(data.content) > 200 else data.content
+                    }
+                except Exception as e:
+                    failed += 1
+                    result = {'id': data.id, 'ok': False, 'msg': f'深度采集失败: {str(e)}'}
+                
+                if pending >= commit_every:
+                    db.session.commit()
+                    pending = 0
+                
+                yield sse_event('item', result)
+            
+            db.session.commit()
+            yield sse_event('done', {'total': len(items), 'done': done, 'failed': failed})
+        except GeneratorExit:
+            # 客户端断开，保留已完成的结果
+            db.session.commit()
+            raise
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            # 客户端断开时取消尚未开始的抓取
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    return sse_response(generate())
+
+
 @main_bp.route('/api/collect/save', methods=['POST'])
 @login_required
 def save_collect_data():
-    """保存采集数据到正式数据库"""
+    """保存采集数据到正式数据库（批量读取、插入和标记）"""
     from app import db
-    from app.models import CollectedData, ArticleData
+    from app.bulk import save_collected
     from app.crawler import SentimentAnalyzer
     
     data = request.get_json()
@@ -509,37 +956,8 @@ def save_collect_data():
     if not ids:
         return jsonify({'code': 1, 'msg': '请选择要保存的数据'})
     
-    analyzer = SentimentAnalyzer()
-    saved_count = 0
-    
     try:
-        for data_id in ids:
-            collected = CollectedData.query.get(data_id)
-            if collected and not collected.is_saved:
-                # 情感分析
-                text = (collected.title or '') + ' ' + (collected.abstract or '')
-                sentiment_result = analyzer.analyze(text)
-                
-                # 创建正式数据
-                article = ArticleData(
-                    keyword=collected.keyword,
-                    title=collected.title,
-                    link=collected.link,
-                    cover=collected.cover,
-                    source=collected.source,
-                    abstract=collected.abstract,
-                    content=collected.content,
-                    publish_time=collected.publish_time,
-                    author=collected.author,
-                    sentiment=sentiment_result['sentiment'],
-                    sentiment_score=sentiment_result['score']
-                )
-                db.session.add(article)
-                
-                # 标记已保存
-                collected.is_saved = True
-                saved_count += 1
-        
+        saved_count = save_collected(ids, SentimentAnalyzer())
         db.session.commit()
         
         return jsonify({
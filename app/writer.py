@@ -0,0 +1,123 @@
+"""
+串行写入模块 - 后台任务的写操作经由单个写线程排队执行
+SQLite 同一时刻只允许一个写事务，多个工作线程各自写入时会互相等待锁，等待超时即报 database is locked；
+改为一个线程按顺序执行后，进程内不再有写锁竞争，WAL 模式下读请求也不会被写入阻塞。
+写线程把排队中的多个写操作合并到一个事务中提交（每个操作用 SAVEPOINT 隔离，失败只回滚该操作），减少提交和 fsync 次数
+"""
+import queue as queue_module
+import threading
+from concurrent.futures import Future
+from sqlalchemy import text
+from app import db
+
+
+class SerializedWriter:
+    """单写入线程"""
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.max_batch = 50
+        self._queue = queue_module.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        """绑定应用并读取配置，首次提交写操作时启动写线程"""
+        self.app = app
+        self.enabled = app.config.get('DB_WRITER_ENABLED', self.enabled)
+        self.max_batch = app.config.get('DB_WRITER_BATCH', self.max_batch)
+
+    def in_writer(self):
+        """当前线程是否为写线程"""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, func, *args, **kwargs):
+        """
+        写操作排队，由写线程在其会话 (db.session) 中执行并提交
+        :param func: 写操作函数，使用 db.session 执行语句，不要自行提交
+        :return: Future，结果为 func 的返回值
+        """
+        self._start()
+        future = Future()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def run(self, func, *args, **kwargs):
+        """
+        执行写操作并等待提交完成
+        未启用时在当前线程执行并提交当前会话；在写线程内调用时直接执行，随所在事务一起提交
+        :return: func 的返回值
+        """
+        if self.in_writer():
+            return func(*args, **kwargs)
+        if not self.enabled:
+            result = func(*args, **kwargs)
+            db.session.commit()
+            return result
+        return self.submit(func, *args, **kwargs).result()
+
+    def pending(self):
+        """排队中的写操作数"""
+        return self._queue.qsize()
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self._thread.start()
+
+    def _take(self):
+        """取出一批写操作：阻塞等待第一个，再取走已排队的其余操作"""
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue_module.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            with self.app.app_context():
+                try:
+                    self._execute(batch)
+                finally:
+                    db.session.remove()
+
+    def _execute(self, batch):
+        done = []
+        try:
+            # 直接以写事务开始，避免读事务中途升级为写事务时因锁冲突立即失败
+            if db.engine.dialect.name == 'sqlite':
+                db.session.execute(text('BEGIN IMMEDIATE'))
+
+            for future, func, args, kwargs in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with db.session.begin_nested():
+                        done.append((future, func(*args, **kwargs)))
+                except Exception as e:
+                    future.set_exception(e)
+
+            db.session.commit()
+        except Exception as e:
+            print(f'写入事务提交失败: {e}')
+            db.session.rollback()
+            for future, _result in done:
+                future.set_exception(e)
+            for future, _func, _args, _kwargs in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result in done:
+            future.set_result(result)
+
+
+# 全局写入实例
+writer = SerializedWriter()
@@ -0,0 +1,130 @@
+"""
+HTML 解析基准测试 - 对比各解析后端及结果容器过滤 (SoupStrainer) 的耗时
+
+用法:
+    python benchmarks/bench_parsing.py [--fixtures DIR] [--repeat N] [--json]
+
+fixtures 目录中的页面按文件名前缀区分: baidu_*.html / bing_*.html 为搜索结果页，
+article*.html 为文章页。自带的样例按百度/必应结果页和新闻页的结构生成（含内联脚本、导航、侧栏等），
+也可以把浏览器另存的真实页面放进去一起测试。
+基线为改造前的 html.parser 全量解析，各组合的解析结果须与基线一致
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import parsing  # noqa: E402
+from app.article import extract_article  # noqa: E402
+from app.crawler import SearchCrawler  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixtures(directory):
+    """:return: [(文件名, 页面类型, HTML)]"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.html'))):
+        name = os.path.basename(path)
+        kind = 'baidu' if name.startswith('baidu') else 'bing' if name.startswith('bing') else 'article'
+        with open(path, encoding='utf-8') as f:
+            pages.append((name, kind, f.read()))
+    return pages
+
+
+def parse(kind, html):
+    """按页面类型调用实际的解析函数"""
+    crawler = SearchCrawler()
+    if kind == 'baidu':
+        results = crawler.parse_baidu(html, 'bench')
+    elif kind == 'bing':
+        results = crawler.parse_bing(html, 'bench')
+    else:
+        return extract_article(html, 'https://example.com/news/1')
+    # 抓取时间不参与比较
+    return [{k: v for k, v in item.items() if k != 'crawl_time'} for item in results]
+
+
+class use:
+    """临时切换解析后端及是否启用结果容器过滤"""
+
+    def __init__(self, backend, strain):
+        self.backend = backend
+        self.strain = strain
+
+    def __enter__(self):
+        self.saved = parsing.parser, dict(parsing.SERP_STRAINERS)
+        parsing.parser = self.backend
+        if not self.strain:
+            parsing.SERP_STRAINERS.clear()
+
+    def __exit__(self, *exc):
+        parsing.parser = self.saved[0]
+        parsing.SERP_STRAINERS.clear()
+        parsing.SERP_STRAINERS.update(self.saved[1])
+
+
+def measure(kind, html, configs, repeat):
+    """
+    各组合轮流执行，机器负载波动对各组合的影响相同
+    :param configs: [(后端, 是否过滤)]
+    :return: [(单次耗时中位数毫秒, 解析结果)]
+    """
+    results = []
+    for config in configs:
+        with use(*config):
+            results.append(parse(kind, html))
+            parse(kind, html)  # 预热
+
+    timings = [[] for _ in configs]
+    for _ in range(repeat):
+        for i, config in enumerate(configs):
+            with use(*config):
+                start = time.perf_counter()
+                parse(kind, html)
+                timings[i].append((time.perf_counter() - start) * 1000)
+    return [(statistics.median(t), r) for t, r in zip(timings, results)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTML 解析基准测试')
+    parser.add_argument('--fixtures', default=FIXTURES, help='HTML 页面目录')
+    parser.add_argument('--repeat', type=int, default=20, help='每个组合重复次数')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    args = parser.parse_args()
+
+    backends = [b for b in parsing.PARSERS if parsing._installed(b)]
+    rows = []
+    for name, kind, html in load_fixtures(args.fixtures):
+        # 文章页没有结果容器，只比较解析后端
+        modes = [False] if kind == 'article' else [False, True]
+        configs = [('html.parser', False)] + [(b, m) for b in backends for m in modes]
+        measured = measure(kind, html, configs, args.repeat)
+        base_ms, expected = measured[0]
+        for (backend, strain), (ms, result) in zip(configs[1:], measured[1:]):
+            rows.append({
+                'fixture': name,
+                'backend': backend,
+                'strainer': strain,
+                'ms': round(ms, 2),
+                'speedup': round(base_ms / ms, 2),
+                'same_result': result == expected,
+            })
+
+    if args.json:
+        print(json.dumps({'backends': backends, 'repeat': args.repeat, 'results': rows}, ensure_ascii=False, indent=2))
+        return
+
+    print(f'{"页面":<20}{"后端":<14}{"过滤":<8}{"毫秒":>10}{"加速比":>10}  结果一致')
+    for row in rows:
+        print(f'{row["fixture"]:<20}{row["backend"]:<14}{"是" if row["strainer"] else "否":<8}'
+              f'{row["ms"]:>10.2f}{row["speedup"]:>10.2f}  {"是" if row["same_result"] else "否"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""
+离线基准测试套件 - 爬取、正文提取、情感分析、入库的端到端吞吐量
+
+用法:
+    python benchmarks/bench_suite.py [--latency 50] [--sizes 10000,100000,1000000] [--output result.json]
+    python benchmarks/bench_suite.py --only analyze,persist
+
+爬取和正文提取通过共享 HTTP 客户端请求本地服务器 (fixture_server)，默认放开本地主机的限速，
+只测量抓取、解析本身（--rate-limits 保留应用配置中的限速策略）；
+入库在临时 SQLite 文件上执行，包含全文索引和情感汇总触发器的开销。
+结果以 JSON 输出，便于不同版本之间对比
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import config, DevelopmentConfig  # noqa: E402
+from fixture_server import FixtureServer  # noqa: E402
+from app import create_app, db, parsing  # noqa: E402
+from app.article import extract_article, fetch_article  # noqa: E402
+from app.crawler import SearchCrawler, SentimentAnalyzer, POSITIVE_WORDS, NEGATIVE_WORDS  # noqa: E402
+from app.ratelimit import scheduler  # noqa: E402
+
+SECTIONS = ('crawl', 'extract', 'analyze', 'persist')
+
+# 生成测试文本用的常用字
+_CHARS = '的一是不了人我在有他这为之大来以个中上们到说国和地也子时道出而要于就下得可你年生自会那后能对着事其里所去行过家十用发天如然作方成者多日都三小军二无同么经法当起与好看学进种将还分此心前面又定见只主没公从'
+
+
+def timed(func, *args, **kwargs):
+    """:return: (返回值, 耗时秒数)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def make_app(path, http_cache=False):
+    """
+    创建使用临时数据库的应用，加载与正式运行相同的扩展和限速配置
+    :param http_cache: 是否启用出站响应缓存（存放在临时数据库旁）
+    """
+    class BenchConfig(DevelopmentConfig):
+        DEBUG = False
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+        HTTP_CACHE_ENABLED = http_cache
+        HTTP_CACHE_DIR = os.path.join(os.path.dirname(path), 'http_cache')
+
+    config['bench'] = BenchConfig
+    return create_app('bench')
+
+
+def open_local_limits(url):
+    """放开本地服务器的限速，只测量抓取和解析"""
+    host = url.split('://', 1)[1]
+    scheduler.configure(scheduler.default, dict(scheduler.hosts, **{
+        host: {'rate': 1e6, 'burst': 1e6, 'concurrency': 1000, 'backoff_base': 0, 'backoff_max': 0}
+    }))
+
+
+def bench_crawl(server, args):
+    """SearchCrawler.search 的吞吐量：每轮两个引擎各抓取 --pages 页"""
+    crawler = SearchCrawler(base_urls={'baidu': server.url, 'bing': server.url})
+    crawler.search('基准测试', engine='all', pages=1)  # 预热连接
+
+    results, elapsed = timed(lambda: [
+        len(crawler.search(f'基准测试{i}', engine='all', pages=args.pages)) for i in range(args.rounds)
+    ])
+    pages = args.rounds * args.pages * 2
+    return {
+        'rounds': args.rounds,
+        'pages': pages,
+        'results': sum(results),
+        'seconds': round(elapsed, 3),
+        'pages_per_sec': round(pages / elapsed, 2),
+        'results_per_sec': round(sum(results) / elapsed, 2),
+    }
+
+
+def bench_extract(server, args):
+    """深度采集：单页提取的 CPU 耗时，以及按批量深度采集的方式并发抓取+提取的吞吐量"""
+    html = server.pages['article'][0].decode('utf-8')
+    extract_article(html, server.url)
+    _, elapsed = timed(lambda: [extract_article(html, server.url) for _ in range(args.extract_parse)])
+
+    fetch_article(f'{server.url}/article/0')  # 预热连接
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        def run():
+            futures = [executor.submit(fetch_article, f'{server.url}/article/{i}') for i in range(args.articles)]
+            return sum(1 for future in as_completed(futures) if future.result()['content'])
+        extracted, fetch_elapsed = timed(run)
+
+    return {
+        'parser': parsing.parser,
+        'page_bytes': len(html.encode('utf-8')),
+        'extract_ms': round(elapsed / args.extract_parse * 1000, 3),
+        'articles': args.articles,
+        'workers': args.workers,
+        'extracted': extracted,
+        'seconds': round(fetch_elapsed, 3),
+        'articles_per_sec': round(args.articles / fetch_elapsed, 2),
+    }
+
+
+def make_texts(count, length=120, seed=1):
+    """生成带情感词的测试文本（约每 15 字一个情感词）"""
+    rng = random.Random(seed)
+    lexicon = POSITIVE_WORDS + NEGATIVE_WORDS
+    texts = []
+    for _ in range(count):
+        parts = []
+        while sum(len(p) for p in parts) < length:
+            parts.append(''.join(rng.choice(_CHARS) for _ in range(14)))
+            parts.append(rng.choice(lexicon))
+        texts.append(''.join(parts))
+    return texts
+
+
+def bench_analyze(args):
+    """SentimentAnalyzer.analyze 的吞吐量"""
+    analyzer = SentimentAnalyzer()
+    texts = make_texts(args.texts)
+    analyzer.analyze_many(texts[:100])
+    _, elapsed = timed(analyzer.analyze_many, texts)
+    chars = sum(len(t) for t in texts)
+    return {
+        'texts': len(texts),
+        'chars': chars,
+        'seconds': round(elapsed, 3),
+        'texts_per_sec': round(len(texts) / elapsed, 2),
+        'chars_per_sec': round(chars / elapsed, 2),
+    }
+
+
+def bench_persist(args):
+    """
+    入库吞吐量：在空库中批量 upsert N 行 search_results（含全文索引和情感汇总触发器），
+    再按相同链接重复写入一次（重复爬取的更新路径），最后测量游标分页深翻页的耗时
+    """
+    from app.bulk import bulk_insert, search_result_rows, upsert_search_results
+    from app.models import SearchResult
+    from app.pagination import keyset_paginate
+
+    analyzer = SentimentAnalyzer()
+    results = []
+    for size in args.sizes:
+        directory = tempfile.mkdtemp(prefix='bench-')
+        path = os.path.join(directory, 'bench.db')
+        with make_app(path).app_context():
+            keywords = [f'关键词{i}' for i in range(50)]
+            texts = make_texts(min(size, 10000), length=60)
+            items = [{
+                'title': texts[i % len(texts)][:30],
+                'link': f'https://news.example.com/{i}',
+                'abstract': texts[i % len(texts)],
+                'source': 'news.example.com',
+                'engine': 'bing' if i % 2 else 'baidu',
+            } for i in range(size)]
+
+            def write():
+                total = 0
+                for offset in range(0, size, args.batch):
+                    batch = items[offset:offset + args.batch]
+                    rows = search_result_rows(keywords[(offset // args.batch) % len(keywords)], batch, analyzer)
+                    total += bulk_insert(SearchResult, rows, stmt=upsert_search_results())
+                    db.session.commit()
+                return total
+
+            _, insert_elapsed = timed(write)
+            _, upsert_elapsed = timed(write)
+
+            query = SearchResult.query
+            keyset_paginate(query, [SearchResult.crawl_time, SearchResult.id], 1, 20, key=('bench',))
+            deep_page = max(1, size // 20 // 2)
+            _, page_elapsed = timed(keyset_paginate, query, [SearchResult.crawl_time, SearchResult.id],
+                                    deep_page, 20, key=('bench',))
+
+            stored = db.session.query(SearchResult).count()
+            db.session.remove()
+            db.engine.dispose()
+
+        results.append({
+            'rows': size,
+            'stored': stored,
+            'batch': args.batch,
+            'insert_seconds': round(insert_elapsed, 3),
+            'insert_rows_per_sec': round(size / insert_elapsed, 2),
+            'upsert_seconds': round(upsert_elapsed, 3),
+            'upsert_rows_per_sec': round(size / upsert_elapsed, 2),
+            'deep_page': deep_page,
+            'deep_page_ms': round(page_elapsed * 1000, 3),
+            'db_bytes': os.path.getsize(path),
+        })
+        shutil.rmtree(directory)
+    return results
+
+
+def metadata(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'parser': parsing.parser,
+        'latency_ms': args.latency,
+        'rate_limits': args.rate_limits,
+        'http_cache': args.http_cache,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线基准测试套件')
+    parser.add_argument('--only', default=','.join(SECTIONS), help=f'要运行的项目，逗号分隔: {",".join(SECTIONS)}')
+    parser.add_argument('--latency', type=float, default=50, help='本地服务器响应延迟（毫秒）')
+    parser.add_argument('--jitter', type=float, default=10, help='随机附加延迟上限（毫秒）')
+    parser.add_argument('--rate-limits', action='store_true', help='保留应用配置中的限速策略')
+    parser.add_argument('--http-cache', action='store_true', help='启用出站响应缓存（默认关闭，只测量真实抓取）')
+    parser.add_argument('--rounds', type=int, default=5, help='爬取轮数')
+    parser.add_argument('--pages', type=int, default=3, help='每轮每个引擎的页数')
+    parser.add_argument('--articles', type=int, default=50, help='并发深度采集的文章数')
+    parser.add_argument('--workers', type=int, default=8, help='深度采集并发数')
+    parser.add_argument('--extract-parse', type=int, default=20, help='单页提取重复次数')
+    parser.add_argument('--texts', type=int, default=20000, help='情感分析文本数')
+    parser.add_argument('--sizes', default='10000,100000', help='入库行数，逗号分隔，如 10000,100000,1000000')
+    parser.add_argument('--batch', type=int, default=1000, help='每次爬取写入的行数')
+    parser.add_argument('--output', help='结果写入文件，默认输出到标准输出')
+    args = parser.parse_args()
+    args.sizes = [int(s) for s in args.sizes.split(',') if s]
+    sections = [s for s in args.only.split(',') if s]
+
+    report = {'meta': metadata(args)}
+    if 'crawl' in sections or 'extract' in sections:
+        # 与应用一样先加载配置，再按需放开本地主机限速
+        directory = tempfile.mkdtemp(prefix='bench-')
+        make_app(os.path.join(directory, 'bench.db'), args.http_cache)
+        with FixtureServer(latency=args.latency / 1000, jitter=args.jitter / 1000) as server:
+            if not args.rate_limits:
+                open_local_limits(server.url)
+            if 'crawl' in sections:
+                report['crawl'] = bench_crawl(server, args)
+            if 'extract' in sections:
+                report['extract'] = bench_extract(server, args)
+            report['meta']['server_requests'] = server.requests
+        shutil.rmtree(directory)
+    if 'analyze' in sections:
+        report['analyze'] = bench_analyze(args)
+    if 'persist' in sections:
+        report['persist'] = bench_persist(args)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+本地基准测试服务器 - 用录制的 HTML 页面模拟搜索引擎和新闻站点
+
+路由:
+    /s?wd=...&pn=...           百度结果页 (fixtures/baidu_*.html)
+    /search?q=...&first=...    必应结果页 (fixtures/bing_*.html)
+    /article/<n>               文章页 (fixtures/article*.html)
+
+用法:
+    python benchmarks/fixture_server.py [--port 8800] [--latency 100] [--jitter 20]
+
+配合 CRAWLER_BASE_URLS = {'baidu': 'http://127.0.0.1:8800', 'bing': 'http://127.0.0.1:8800'}
+可以让整个应用在离线环境下跑通爬取流程
+"""
+import argparse
+import glob
+import hashlib
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_pages(directory, pattern):
+    """:return: 匹配的页面内容列表（UTF-8 字节）"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, pattern))):
+        with open(path, 'rb') as f:
+            pages.append(f.read())
+    return pages
+
+
+class FixtureServer:
+    """在后台线程运行的页面服务器"""
+
+    def __init__(self, fixtures=FIXTURES, latency=0.0, jitter=0.0, host='127.0.0.1', port=0):
+        """
+        :param fixtures: 页面目录
+        :param latency: 每个响应的固定延迟（秒）
+        :param jitter: 随机附加延迟上限（秒）
+        :param port: 监听端口，0 表示随机分配
+        """
+        self.pages = {
+            'baidu': load_pages(fixtures, 'baidu_*.html'),
+            'bing': load_pages(fixtures, 'bing_*.html'),
+            'article': load_pages(fixtures, 'article*.html'),
+        }
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # 支持长连接，与真实站点一致
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                query = parse_qs(parts.query)
+                if parts.path == '/s':
+                    body = server.pick('baidu', int(query.get('pn', ['0'])[0]) // 10)
+                elif parts.path == '/search':
+                    body = server.pick('bing', (int(query.get('first', ['1'])[0]) - 1) // 10)
+                elif parts.path.startswith('/article/'):
+                    body = server.pick('article', int(parts.path.rsplit('/', 1)[-1] or 0))
+                else:
+                    body = None
+
+                server.delay()
+                if body is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                # 页面内容不变，支持条件请求
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def pick(self, kind, index):
+        """按序号轮流返回同类页面"""
+        with self._lock:
+            self.requests += 1
+        pages = self.pages[kind]
+        return pages[index % len(pages)] if pages else None
+
+    def delay(self):
+        wait = self.latency + random.uniform(0, self.jitter)
+        if wait > 0:
+            time.sleep(wait)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地基准测试服务器')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--latency', type=float, default=100, help='固定延迟（毫秒）')
+    parser.add_argument('--jitter', type=float, default=0, help='随机附加延迟上限（毫秒）')
+    parser.add_argument('--fixtures', default=FIXTURES)
+    args = parser.parse_args()
+
+    server = FixtureServer(args.fixtures, args.latency / 1000, args.jitter / 1000, port=args.port)
+    print(f'服务已启动: {server.url}')
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
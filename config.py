@@ -17,6 +17,110 @@ class Config:
         'sqlite:///' + os.path.join(BASE_DIR, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # 爬虫限速配置 - 按主机的令牌桶（每秒令牌数/桶容量/最大并发/退避秒数）
+    CRAWLER_RATE_DEFAULT = {'rate': 0.5, 'burst': 2, 'concurrency': 2, 'backoff_base': 2.0, 'backoff_max': 60.0}
+    CRAWLER_RATE_LIMITS = {
+        'www.baidu.com': {'rate': 0.5, 'burst': 2, 'concurrency': 2},
+        'cn.bing.com': {'rate': 1.0, 'burst': 3, 'concurrency': 3},
+    }
+    
+    # 搜索引擎站点地址覆盖 - 如 {'baidu': 'http://127.0.0.1:8800'}，用于指向本地基准测试服务器
+    CRAWLER_BASE_URLS = None
+    
+    # 出站连接池配置 - 缓存的主机连接池数、每主机最大连接数、(连接, 读取) 超时、
+    # 重试次数（总数/连接错误/读取超时，每次重试都经过限速调度器，间隔由调度器的退避决定）
+    HTTP_POOL_CONNECTIONS = 50
+    HTTP_POOL_MAXSIZE = 10
+    HTTP_TIMEOUT = (5, 15)
+    HTTP_RETRIES = {'total': 2, 'connect': 2, 'read': 1}
+    
+    # 出站响应缓存 - 是否启用、存储目录（默认 instance/http_cache）、总大小上限（字节，超出后淘汰最久未访问的）、
+    # 各类请求的新鲜期（秒）：新鲜期内直接使用缓存，过期后带 If-None-Match/If-Modified-Since 重新验证
+    HTTP_CACHE_ENABLED = True
+    HTTP_CACHE_DIR = None
+    HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024
+    HTTP_CACHE_TTL = {'baidu': 600, 'bing': 600, 'article': 86400}
+    
+    # HTML 解析后端 - 默认 None 自动选择（优先 lxml，未安装时使用 html.parser）
+    HTML_PARSER = None
+    
+    # 后台任务队列配置 - 工作线程数、空闲轮询间隔（秒）、运行超时后视为遗留任务的秒数
+    JOB_WORKERS = 2
+    JOB_POLL_INTERVAL = 2.0
+    JOB_STALE_SECONDS = 600
+    
+    # 任务进度存储 - 后端 (database/memory)、保留秒数、批量落库间隔（秒）
+    PROGRESS_BACKEND = 'database'
+    PROGRESS_TTL = 86400
+    PROGRESS_FLUSH_INTERVAL = 0.5
+    
+    # 进度推送 (SSE) - 服务端轮询间隔、心跳间隔、单个连接最长保持秒数（超时后客户端自动重连）
+    SSE_POLL_INTERVAL = 0.5
+    SSE_HEARTBEAT = 15
+    SSE_TIMEOUT = 300
+    
+    # 列表分页 - 总数缓存及页码书签的有效秒数（过期后后台刷新总数）
+    PAGINATION_CACHE_TTL = 60
+    
+    # 批量写入 - 每条 executemany / IN 查询处理的行数
+    BULK_CHUNK_SIZE = 500
+    
+    # 批量深度采集 - 并发抓取线程数、每完成多少条提交一次
+    DEEP_COLLECT_WORKERS = 8
+    DEEP_COLLECT_COMMIT_EVERY = 10
+    
+    # SQLite 连接参数 - 每个新连接执行的 PRAGMA，空表示使用 SQLite 默认值
+    SQLITE_PRAGMAS = {}
+    
+    # 关键词监控 - 是否启用定时调度、扫描到期关键词的间隔（秒）、每次扫描最多入队数、队列积压超过多少时暂停入队、
+    # 爬取间隔的随机抖动比例、最短爬取间隔（秒）、监控任务优先级（低于手动提交的任务）、某页已入库结果达到多少比例时停止翻页
+    MONITOR_ENABLED = True
+    MONITOR_POLL_INTERVAL = 30
+    MONITOR_BATCH = 20
+    MONITOR_MAX_PENDING = 50
+    MONITOR_JITTER = 0.1
+    MONITOR_MIN_INTERVAL = 300
+    MONITOR_PRIORITY = -1
+    MONITOR_STOP_RATIO = 0.8
+    
+    # 串行写入 - 后台任务的写操作是否经由单个写线程排队执行、每个事务最多合并的写操作数
+    DB_WRITER_ENABLED = False
+    DB_WRITER_BATCH = 50
+    
+    # 运行指标 - 是否启用请求/SQL/出站请求计时（/metrics 导出）；抓取 /metrics 的令牌，None 表示需要登录
+    METRICS_ENABLED = True
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # 采样分析器 - 默认关闭；采样间隔（秒）、保存调用栈的慢请求阈值（毫秒）、保存目录（默认 instance/profiles）、最多保留文件数
+    PROFILER_ENABLED = False
+    PROFILER_INTERVAL = 0.005
+    PROFILER_SLOW_MS = 1000
+    PROFILER_DIR = None
+    PROFILER_MAX_FILES = 200
+    
+    # 周期维护 - 是否启用维护线程、检查到期任务的间隔（秒）
+    MAINTENANCE_ENABLED = True
+    MAINTENANCE_POLL_INTERVAL = 60
+    
+    # 情感趋势 - 小时桶保留天数（之后压缩为日桶）、日桶保留天数（之后压缩为周桶）、压缩间隔（秒）、
+    # 默认最多返回的点数（超过时降采样）、单次查询的桶数上限
+    ROLLUP_HOUR_DAYS = 14
+    ROLLUP_DAY_DAYS = 400
+    ROLLUP_COMPACT_INTERVAL = 3600
+    TREND_MAX_POINTS = 500
+    TREND_MAX_BUCKETS = 20000
+    
+    # 数据保留 - 采集临时表的保留期（小时，按批次最后一次采集时间）、清理前是否归档未保存的数据、
+    # 归档目录（默认 instance/archive/collected）、清理间隔（秒，0 表示不自动清理）、每次最多清理的批次数、
+    # 每块删除的行数、增量回收时每个事务回收的页数
+    COLLECT_RETENTION_HOURS = 72
+    COLLECT_ARCHIVE_ENABLED = True
+    COLLECT_ARCHIVE_DIR = None
+    RETENTION_INTERVAL = 3600
+    RETENTION_MAX_BATCHES = 200
+    RETENTION_CHUNK_SIZE = 1000
+    RETENTION_VACUUM_PAGES = 2000
+    
     # 其他配置
     DEBUG = False
     TESTING = False
@@ -30,12 +134,40 @@ class DevelopmentConfig(Config):
 class ProductionConfig(Config):
     """生产环境配置"""
     DEBUG = False
+    
+    # WAL 日志读写互不阻塞；WAL 下 synchronous=NORMAL 只在检查点时同步，掉电最多丢失最近提交但不会损坏；
+    # 锁被占用时最多等待 5 秒；64MB 页缓存（负数单位为 KB）、256MB 内存映射读、临时表放在内存
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -65536,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+        # 只对新建的数据库生效，已有数据库用 manage.py retention --convert 切换
+        'auto_vacuum': 'INCREMENTAL',
+    }
+    
+    # 连接池 - 常驻连接数覆盖请求线程、任务工作线程和写线程，高峰时允许临时溢出
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_timeout': 30,
+        'pool_recycle': 3600,
+    }
+    
+    DB_WRITER_ENABLED = True
 
 
 class TestingConfig(Config):
     """测试环境配置"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    HTTP_CACHE_ENABLED = False
+    # 测试中不启动后台任务、监控调度和周期维护线程
+    JOB_WORKERS = 0
+    MONITOR_ENABLED = False
+    MAINTENANCE_ENABLED = False
 
 
 # 配置映射
@@ -0,0 +1,109 @@
+"""
+运维命令脚本
+
+用法:
+    python manage.py rescore [--table search_results|article_data|all] [--chunk-size N] [--workers N]
+    python manage.py reindex [--table search_results|article_data|all]
+    python manage.py rollup
+    python manage.py dedup [--table search_results|collected_data|article_data|all] [--dry-run]
+    python manage.py retention [--ttl-hours N] [--dry-run] [--convert]
+"""
+import argparse
+from app import create_app
+
+
+def cmd_rescore(args):
+    """批量重算情感"""
+    from app.models import SearchResult, ArticleData
+    from app.rescore import rescore_table
+
+    models = {
+        'search_results': [SearchResult],
+        'article_data': [ArticleData],
+        'all': [SearchResult, ArticleData],
+    }
+    for model in models[args.table]:
+        rescore_table(model, chunk_size=args.chunk_size, workers=args.workers)
+
+
+def cmd_reindex(args):
+    """重建全文索引"""
+    from app.search_index import FTS_TABLES, rebuild
+
+    tables = list(FTS_TABLES) if args.table == 'all' else [args.table]
+    for table in tables:
+        total = rebuild(table, log=print)
+        print(f'[{table}] 全文索引重建完成，共 {total} 行')
+
+
+def cmd_rollup(args):
+    """重建情感汇总表"""
+    from app.rollup import backfill
+
+    print(f'情感汇总表重建完成，共 {backfill()} 行')
+
+
+def cmd_dedup(args):
+    """按规范化链接去重"""
+    from app.dedup import DEDUP_TABLES, migrate
+
+    tables = list(DEDUP_TABLES) if args.table == 'all' else [args.table]
+    removed = migrate(tables, dry_run=args.dry_run, log=print)
+    if args.dry_run:
+        print(f'共 {sum(removed.values())} 行重复数据将被删除（未执行），建议先备份数据库')
+    else:
+        print(f'去重完成，共删除 {sum(removed.values())} 行')
+
+
+def cmd_retention(args):
+    """清理过期的采集批次"""
+    from app import retention
+
+    if args.convert:
+        print('正在切换为 auto_vacuum=INCREMENTAL（执行完整 VACUUM）...')
+        retention.convert_to_incremental()
+    summary = retention.run(ttl_hours=args.ttl_hours, dry_run=args.dry_run, log=print)
+    action = '过期' if args.dry_run else '清理'
+    print(f'{action}批次 {summary["batches"]} 个，共 {summary["purged"]} 行，归档 {summary["archived"]} 行')
+    if summary['vacuumed'] is not None:
+        print(f'回收空闲页 {summary["vacuumed"]} 页')
+    print(retention.stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='后台管理系统运维命令')
+    parser.add_argument('--config', default='development', help='配置名称 (development, production, testing)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    rescore = subparsers.add_parser('rescore', help='按当前情感词典重算已入库数据')
+    rescore.add_argument('--table', choices=['search_results', 'article_data', 'all'], default='all')
+    rescore.add_argument('--chunk-size', type=int, default=2000)
+    rescore.add_argument('--workers', type=int, default=None)
+    rescore.set_defaults(func=cmd_rescore)
+
+    reindex = subparsers.add_parser('reindex', help='重建全文索引')
+    reindex.add_argument('--table', choices=['search_results', 'article_data', 'all'], default='all')
+    reindex.set_defaults(func=cmd_reindex)
+
+    rollup = subparsers.add_parser('rollup', help='从 search_results 重建情感汇总表')
+    rollup.set_defaults(func=cmd_rollup)
+
+    dedup = subparsers.add_parser('dedup', help='按规范化链接合并删除重复数据并回填链接哈希')
+    dedup.add_argument('--table', choices=['search_results', 'collected_data', 'article_data', 'all'], default='all')
+    dedup.add_argument('--dry-run', action='store_true', help='只统计重复行数，不删除')
+    dedup.set_defaults(func=cmd_dedup)
+
+    retention = subparsers.add_parser('retention', help='归档并清理过期的采集临时数据，回收空闲空间')
+    retention.add_argument('--ttl-hours', type=int, default=None, help='保留期（小时），默认读取配置')
+    retention.add_argument('--dry-run', action='store_true', help='只统计过期批次，不归档和删除')
+    retention.add_argument('--convert', action='store_true', help='先把数据库切换为增量回收模式（锁库执行 VACUUM）')
+    retention.set_defaults(func=cmd_retention)
+
+    args = parser.parse_args()
+    app = create_app(args.config)
+    with app.app_context():
+        args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+"""
+测试公共夹具 - 每个测试使用临时目录中的独立 SQLite 数据库
+"""
+import pytest
+from config import TestingConfig
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """使用临时数据库的应用（后台线程只在处理请求时启动，测试中不会运行）"""
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setattr(TestingConfig, 'COLLECT_ARCHIVE_DIR', str(tmp_path / 'archive'), raising=False)
+
+    from app import create_app, db
+    app = create_app('testing')
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,64 @@
+"""
+批量持久化测试 - 采集结果的批量写入与保存为文章的幂等性
+"""
+from app import db
+from app.bulk import bulk_insert, collected_rows, insert_collected, save_collected
+from app.crawler import SentimentAnalyzer
+from app.models import ArticleData, CollectedData
+
+
+def collect(task_id, links):
+    """写入一批采集数据，:return: 实际写入行数"""
+    results = [{'title': f'标题{i}', 'link': link, 'abstract': '摘要', 'source': 'test'} for i, link in enumerate(links)]
+    count = bulk_insert(CollectedData, collected_rows(task_id, '关键词', results), stmt=insert_collected())
+    db.session.commit()
+    return count
+
+
+def test_bulk_insert_skips_duplicate_links_in_batch(app):
+    # 规范化后相同的链接只写入一次，没有链接的行不参与去重
+    written = collect('t1', ['http://a.com/1', 'http://A.com/1/', 'http://a.com/2', '', ''])
+
+    assert written == 4
+    assert CollectedData.query.filter_by(task_id='t1').count() == 4
+
+
+def test_save_collected_is_idempotent(app):
+    collect('t1', ['http://a.com/1', 'http://a.com/2', ''])
+    ids = [row.id for row in CollectedData.query.order_by(CollectedData.id)]
+    analyzer = SentimentAnalyzer()
+
+    assert save_collected(ids, analyzer) == 3
+    db.session.commit()
+    assert save_collected(ids, analyzer) == 0
+    db.session.commit()
+
+    assert ArticleData.query.count() == 3
+    assert all(row.is_saved for row in CollectedData.query)
+
+
+def test_save_collected_same_link_from_two_batches(app):
+    collect('t1', ['http://a.com/1'])
+    collect('t2', ['http://a.com/1?utm_source=x'])
+    ids = [row.id for row in CollectedData.query]
+
+    save_collected(ids[:1], SentimentAnalyzer())
+    save_collected(ids[1:], SentimentAnalyzer())
+    db.session.commit()
+
+    assert ArticleData.query.count() == 1
+
+
+def test_run_collect_returns_saved_count(app, monkeypatch):
+    from app import tasks
+    from app.jobs import JobContext, new_task
+
+    results = [{'title': '标题', 'link': link, 'abstract': '', 'source': 'test', 'engine': 'baidu'}
+               for link in ('http://a.com/1', 'http://a.com/1#top', 'http://a.com/2')]
+    monkeypatch.setattr(tasks.SearchCrawler, 'search', lambda self, keyword, engine='baidu', pages=1: results)
+    task = new_task('collect', '关键词', payload={'task_id': 'batch-1'})
+    db.session.add(task)
+    db.session.commit()
+
+    assert tasks.run_collect(JobContext(task)) == 2
+    assert CollectedData.query.filter_by(task_id='batch-1').count() == 2
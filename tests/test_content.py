@@ -0,0 +1,125 @@
+"""
+正文存储测试 - 压缩编码、正文分表的懒加载与级联删除、正文在采集表与文章表之间的复制
+"""
+from sqlalchemy import insert, text
+from app import db
+from app.bulk import copy_article_content
+from app.dedup import url_hash
+from app.content import COMPRESS_MIN_BYTES, RAW, ZLIB, compress_text, decompress_text
+from app.models import ArticleContent, ArticleData, CollectedContent, CollectedData
+
+LONG = '舆情监测正文内容。' * 200
+
+
+def raw_content(table, key, row_id):
+    return db.session.execute(text(f'SELECT content FROM {table} WHERE {key} = :id'), {'id': row_id}).scalar()
+
+
+def add_collected(link, content):
+    data = CollectedData(task_id='t', keyword='k', title='标题', link=link, url_hash=url_hash(link))
+    data.content = content
+    db.session.add(data)
+    db.session.flush()
+    return data
+
+
+def test_compress_round_trip():
+    assert compress_text(None) is None
+    assert compress_text('短文本')[:1] == RAW
+    encoded = compress_text(LONG)
+    assert encoded[:1] == ZLIB and len(encoded) < len(LONG.encode('utf-8')) // 5
+    assert decompress_text(encoded) == LONG
+    assert decompress_text(compress_text('x' * (COMPRESS_MIN_BYTES - 1))) == 'x' * (COMPRESS_MIN_BYTES - 1)
+    # 迁移前的旧文本原样返回
+    assert decompress_text('旧文本') == '旧文本'
+
+
+def test_content_is_stored_compressed_and_loaded_lazily(app):
+    data = add_collected('http://a.com/1', LONG)
+    db.session.commit()
+
+    assert raw_content('collected_content', 'data_id', data.id)[:1] == ZLIB
+    assert db.session.execute(text('SELECT zdecompress(content) FROM collected_content')).scalar() == LONG
+    db.session.expire_all()
+    assert 'content' not in data.to_dict()
+    assert data.to_dict(include_content=True)['content'] == LONG
+
+
+def test_deleting_main_row_removes_content(app):
+    orm = add_collected('http://a.com/1', LONG)
+    raw = add_collected('http://a.com/2', LONG)
+    db.session.commit()
+
+    db.session.delete(orm)
+    db.session.execute(text('DELETE FROM collected_data WHERE id = :id'), {'id': raw.id})
+    db.session.commit()
+    assert CollectedContent.query.count() == 0
+
+
+def test_copy_article_content_copies_compressed_bytes(app):
+    data = add_collected('http://a.com/1', LONG)
+    article_id = db.session.execute(
+        insert(ArticleData).values(keyword='k', title='标题', link=data.link, url_hash=data.url_hash)
+        .returning(ArticleData.id)
+    ).scalar_one()
+    db.session.commit()
+
+    assert copy_article_content([data.id]) == 1
+    assert raw_content('article_content', 'article_id', article_id) == raw_content(
+        'collected_content', 'data_id', data.id)
+
+    # 已有正文时覆盖
+    data.content = '新的正文' * 100
+    db.session.flush()
+    copy_article_content([data.id])
+    db.session.commit()
+    assert db.session.get(ArticleData, article_id).content == '新的正文' * 100
+
+
+def test_copy_article_content_for_unlinked_rows(app):
+    data = add_collected('', LONG)
+    article_id = db.session.execute(
+        insert(ArticleData).values(keyword='k', title='标题', link='').returning(ArticleData.id)
+    ).scalar_one()
+
+    assert copy_article_content([data.id]) == 0
+    assert copy_article_content([data.id], {data.id: article_id}) == 1
+    db.session.commit()
+    assert db.session.get(ArticleData, article_id).content == LONG
+
+
+def test_save_collected_carries_content(app):
+    from app.bulk import save_collected
+    from app.crawler import SentimentAnalyzer
+
+    linked = add_collected('http://a.com/1', LONG)
+    unlinked = add_collected('', '没有链接的正文' * 50)
+    db.session.commit()
+
+    assert save_collected([linked.id, unlinked.id], SentimentAnalyzer()) == 2
+    db.session.commit()
+    contents = {article.link: article.content for article in ArticleData.query}
+    assert contents == {'http://a.com/1': LONG, '': '没有链接的正文' * 50}
+
+
+def test_article_content_is_searchable(app):
+    from app.search_index import build_match
+
+    article = ArticleData(keyword='k', title='标题', link='http://a.com/1')
+    article.content = LONG + '独角兽企业'
+    db.session.add(article)
+    db.session.commit()
+
+    def search(word):
+        return db.session.execute(text('SELECT rowid FROM article_data_fts WHERE article_data_fts MATCH :m'),
+                                  {'m': build_match(word)}).scalars().all()
+
+    assert search('独角兽') == [article.id]
+    article.content = '另一段正文，讲的是麒麟'
+    db.session.commit()
+    assert search('独角兽') == []
+    assert search('麒麟') == [article.id]
+    db.session.delete(article)
+    db.session.commit()
+    assert search('麒麟') == []
+    assert ArticleContent.query.count() == 0
@@ -0,0 +1,97 @@
+"""
+链接去重测试 - URL 规范化、启动时的哈希回填及显式去重迁移
+"""
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import text
+from app import db
+from app.dedup import backfill, migrate, normalize_url, url_hash
+from app.models import SearchResult
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('HTTP://Example.COM:80/a/', 'http://example.com/a'),
+    ('https://example.com:443', 'https://example.com/'),
+    ('https://example.com:8443/a', 'https://example.com:8443/a'),
+    ('https://example.com/a?b=2&a=1#frag', 'https://example.com/a?a=1&b=2'),
+    ('https://example.com/a?utm_source=x&spm=1&id=3', 'https://example.com/a?id=3'),
+    ('https://example.com/a?q=', 'https://example.com/a?q='),
+    ('  ', None),
+    (None, None),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+
+def test_url_hash_matches_equivalent_links():
+    assert url_hash('http://a.com/x/?utm_medium=m') == url_hash('HTTP://A.COM/x')
+    assert url_hash('http://a.com/x') != url_hash('http://a.com/y')
+    assert url_hash('') is None
+
+
+def add_legacy_rows(rows):
+    """写入没有 url_hash 的旧数据（模拟刚补齐 url_hash 列的旧库）"""
+    for keyword, link, crawl_time, engine in rows:
+        db.session.execute(text(
+            'INSERT INTO search_results (keyword, title, link, engine, crawl_time) '
+            'VALUES (:keyword, :title, :link, :engine, :crawl_time)'
+        ), {'keyword': keyword, 'title': link, 'link': link, 'engine': engine, 'crawl_time': crawl_time})
+    db.session.commit()
+
+
+@pytest.fixture
+def legacy(app):
+    now = datetime(2024, 1, 1)
+    add_legacy_rows([
+        ('k', 'http://a.com/1', now, 'baidu'),
+        ('k', 'http://A.com/1/', now + timedelta(hours=1), 'bing'),
+        ('k', 'http://a.com/2', now, 'baidu'),
+        ('other', 'http://a.com/1', now, 'baidu'),
+        ('k', '', now, 'baidu'),
+    ])
+    return now
+
+
+def test_backfill_never_deletes_and_skips_duplicates(legacy):
+    filled, groups = backfill('search_results')
+
+    assert (filled, groups) == (2, 1)
+    assert SearchResult.query.count() == 5
+    hashed = {(row.keyword, row.link) for row in SearchResult.query.filter(SearchResult.url_hash.isnot(None))}
+    assert hashed == {('k', 'http://a.com/2'), ('other', 'http://a.com/1')}
+
+
+def test_migrate_dry_run_reports_without_deleting(legacy):
+    assert migrate(['search_results'], dry_run=True) == {'search_results': 1}
+    assert SearchResult.query.count() == 5
+
+
+def test_migrate_merges_duplicates(legacy):
+    backfill('search_results')
+
+    assert migrate(['search_results']) == {'search_results': 1}
+    kept = SearchResult.query.filter_by(keyword='k', url_hash=url_hash('http://a.com/1')).one()
+    assert kept.link == 'http://a.com/1'
+    assert kept.crawl_time == legacy + timedelta(hours=1)
+    assert set(kept.engines.split(',')) == {'baidu', 'bing'}
+    assert SearchResult.query.count() == 4
+    assert SearchResult.query.filter(SearchResult.url_hash.is_(None)).count() == 1  # 空链接
+
+
+def test_startup_backfills_legacy_table_without_deleting(app):
+    # 模拟升级前的库：search_results 没有 url_hash 列
+    with db.engine.begin() as conn:
+        conn.execute(text('DROP INDEX ux_search_results_url'))
+        conn.execute(text('ALTER TABLE search_results DROP COLUMN url_hash'))
+    add_legacy_rows([
+        ('k', 'http://a.com/1', datetime(2024, 1, 1), 'baidu'),
+        ('k', 'http://a.com/1/', datetime(2024, 1, 2), 'bing'),
+        ('k', 'http://a.com/2', datetime(2024, 1, 1), 'baidu'),
+    ])
+    db.session.remove()
+
+    from app import create_app
+    create_app('testing')
+
+    assert SearchResult.query.count() == 3
+    assert SearchResult.query.filter(SearchResult.url_hash.isnot(None)).count() == 1
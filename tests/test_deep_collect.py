@@ -0,0 +1,86 @@
+"""
+批量深度采集测试 - 只接受 POST、分批提交、单条失败时撤销该条的修改
+"""
+import json
+import sqlite3
+import pytest
+from sqlalchemy import select
+from app import db
+from app.models import CollectedData
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    from app import article
+
+    monkeypatch.setattr(article, 'fetch_article', lambda url: {
+        'content': f'{url} 的正文。' + '城市更新计划涉及老旧小区改造和道路拓宽等多个方面。' * 5,
+        'cover': None, 'publish_time': '2024-01-01', 'author': '作者',
+    })
+    for i in range(4):
+        db.session.add(CollectedData(task_id='t', keyword='k', title=f'标题{i}', link=f'http://h{i}.com/a'))
+    db.session.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    return client
+
+
+def events(response):
+    """逐条解析流式响应中的 SSE 事件"""
+    buffer = ''
+    for chunk in response.response:
+        buffer += chunk.decode() if isinstance(chunk, bytes) else chunk
+        while '\n\n' in buffer:
+            message, buffer = buffer.split('\n\n', 1)
+            lines = dict(line.split(': ', 1) for line in message.splitlines())
+            yield lines['event'], json.loads(lines['data'])
+
+
+def committed_deep_crawled(app):
+    """从另一个连接读取已提交的深度采集标记"""
+    path = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')
+    with sqlite3.connect(path) as conn:
+        return conn.execute('SELECT count(*) FROM collected_data WHERE deep_crawled = 1').fetchone()[0]
+
+
+def test_get_is_not_allowed(client):
+    assert client.get('/api/collect/deep_batch?task_id=t').status_code == 405
+
+
+def test_results_are_committed_in_batches(app, client):
+    app.config['DEEP_COLLECT_COMMIT_EVERY'] = 3
+    response = client.post('/api/collect/deep_batch', json={'task_id': 't'}, buffered=False)
+    stream = events(response)
+
+    assert next(stream)[0] == 'start'
+    for expected_committed in (0, 0, 3, 3):
+        assert next(stream)[0] == 'item'
+        assert committed_deep_crawled(app) == expected_committed
+    assert next(stream)[1]['done'] == 4
+    assert committed_deep_crawled(app) == 4
+
+
+def test_failed_item_is_rolled_back(app, client, monkeypatch):
+    from app import fingerprint
+
+    register = fingerprint.register
+
+    def flaky(data):
+        register(data)
+        if data.title == '标题2':
+            raise RuntimeError('索引写入失败')
+        return data.dup_of
+
+    monkeypatch.setattr(fingerprint, 'register', flaky)
+    response = client.post('/api/collect/deep_batch', json={'task_id': 't'})
+    body = response.get_data(as_text=True)
+    assert body.count('"ok": true') == 3 and body.count('"ok": false') == 1
+
+    db.session.expire_all()
+    failed = db.session.execute(select(CollectedData).where(CollectedData.title == '标题2')).scalar_one()
+    assert not failed.deep_crawled
+    assert failed.simhash is None
+    assert failed.body is None
+    assert committed_deep_crawled(app) == 3
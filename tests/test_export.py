@@ -0,0 +1,35 @@
+"""
+流式导出测试 - 按 Accept-Encoding 的 q 值决定是否 gzip 压缩
+"""
+import gzip
+import pytest
+from app import db
+from app.models import SearchResult
+
+
+@pytest.fixture
+def client(app):
+    db.session.add(SearchResult(keyword='k', title='标题', link='http://a.com/1'))
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    return client
+
+
+@pytest.mark.parametrize('accept, compressed', [
+    ('gzip, deflate', True),
+    ('deflate, gzip;q=0.5', True),
+    ('gzip;q=0', False),
+    ('gzip;q=0, *;q=0.5', False),
+    ('identity', False),
+    (None, False),
+])
+def test_gzip_follows_accept_encoding(client, accept, compressed):
+    headers = {'Accept-Encoding': accept} if accept else {}
+    response = client.get('/api/export/search_results?format=ndjson&fields=title', headers=headers)
+    body = response.get_data()
+
+    assert (response.headers.get('Content-Encoding') == 'gzip') is compressed
+    text = (gzip.decompress(body) if compressed else body).decode('utf-8')
+    assert '标题' in text
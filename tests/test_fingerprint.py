@@ -0,0 +1,49 @@
+"""
+近似重复检测测试 - SimHash 指纹、分段索引查重
+"""
+from app import db
+from app.fingerprint import BANDS, MAX_DISTANCE, bands, distance, register, simhash
+from app.models import CollectedData, SimhashBand
+
+TEXT = ('近日，某市发布了新一轮城市更新计划，涉及老旧小区改造、道路拓宽和公共服务设施建设等多个方面，'
+        '预计将惠及数十万居民。相关负责人表示，项目将分三期推进，优先解决群众反映强烈的停车难和出行难问题。')
+
+
+def add_collected(content):
+    data = CollectedData(task_id='t', keyword='k', title='标题', link=f'http://a.com/{CollectedData.query.count()}')
+    data.content = content
+    db.session.add(data)
+    db.session.flush()
+    return data
+
+
+def test_simhash_is_stable_and_tolerates_small_edits():
+    assert simhash(TEXT) == simhash(TEXT)
+    # 标点不参与指纹，末尾追加一句只改变少量位
+    assert simhash(TEXT + '。') == simhash(TEXT)
+    assert distance(simhash(TEXT), simhash(TEXT + '新增一句话。')) <= MAX_DISTANCE
+    assert distance(simhash(TEXT), simhash('完全不同的一段文字，讲述的是体育赛事的比赛结果和球员表现。' * 3)) > MAX_DISTANCE
+    assert simhash('太短') is None
+
+
+def test_bands_cover_the_whole_fingerprint():
+    value = simhash(TEXT)
+    parts = bands(value)
+    assert len(parts) == BANDS
+    assert sum(part << (band * 64 // BANDS) for band, part in parts) == value % (1 << 64)
+
+
+def test_register_marks_near_duplicates(app):
+    first = add_collected(TEXT)
+    second = add_collected(TEXT + '新增一句话。')
+    other = add_collected('完全不同的一段文字，讲述的是体育赛事的比赛结果和球员表现，以及赛后的采访内容。' * 2)
+
+    assert register(first) is None
+    assert register(second) == first.id
+    assert register(other) is None
+    db.session.commit()
+
+    assert SimhashBand.query.filter_by(data_id=second.id).count() == BANDS
+    # 重新登记时替换旧的分段索引
+    assert register(second) == first.id
+    assert SimhashBand.query.filter_by(data_id=second.id).count() == BANDS
@@ -0,0 +1,115 @@
+"""
+出站响应缓存测试 - 新鲜期命中、ETag/Last-Modified 重新验证与内容去重
+"""
+import os
+import threading
+import pytest
+import requests
+from app.http_cache import ResponseCache
+
+URL = 'http://example.com/page'
+
+
+def make_response(body=b'', status=200, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response.headers.update(headers or {})
+    return response
+
+
+class Origin:
+    """模拟源站：带 If-None-Match 且与当前 ETag 相同时返回 304"""
+
+    def __init__(self, body=b'<html>hello</html>', etag='"v1"'):
+        self.body = body
+        self.etag = etag
+        self.requests = []
+
+    def send(self, validators):
+        self.requests.append(validators)
+        if validators.get('If-None-Match') == self.etag:
+            return make_response(status=304, headers={'ETag': self.etag})
+        return make_response(self.body, headers={'ETag': self.etag, 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT',
+                                                 'Content-Type': 'text/html'})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache()
+    cache.enabled = True
+    cache.directory = str(tmp_path / 'http_cache')
+    cache.ttl = {'page': 0, 'fresh': 3600}
+    return cache
+
+
+def test_etag_revalidation_round_trip(cache):
+    origin = Origin()
+
+    first = cache.fetch(URL, 'page', origin.send)
+    assert first.content == origin.body
+    assert getattr(first, 'from_cache', None) is None
+
+    second = cache.fetch(URL, 'page', origin.send)
+    assert second.from_cache == 'revalidated'
+    assert second.content == origin.body
+    assert second.headers['Content-Type'] == 'text/html'
+    assert origin.requests[1] == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+
+
+def test_changed_etag_replaces_cached_body(cache):
+    origin = Origin()
+    cache.fetch(URL, 'page', origin.send)
+    origin.body, origin.etag = b'<html>changed</html>', '"v2"'
+
+    response = cache.fetch(URL, 'page', origin.send)
+    assert getattr(response, 'from_cache', None) is None
+    assert response.content == b'<html>changed</html>'
+    assert cache.lookup(URL)['etag'] == '"v2"'
+    assert cache.stats()['objects'] == 1
+
+
+def test_fresh_entry_is_served_without_request(cache):
+    origin = Origin()
+    cache.fetch(URL, 'fresh', origin.send)
+
+    response = cache.fetch(URL, 'fresh', origin.send)
+    assert response.from_cache == 'hit'
+    assert len(origin.requests) == 1
+    # max_age=0 强制重新验证
+    assert cache.fetch(URL, 'fresh', origin.send, max_age=0).from_cache == 'revalidated'
+
+
+def test_missing_object_file_triggers_full_request(cache):
+    origin = Origin()
+    cache.fetch(URL, 'page', origin.send)
+    os.remove(cache._path(cache.lookup(URL)['digest']))
+
+    response = cache.fetch(URL, 'page', origin.send)
+    assert response.content == origin.body
+    assert origin.requests[-1] == {}
+
+
+def test_identical_bodies_share_one_object(cache):
+    body = b'same body' * 100
+    threads = [threading.Thread(target=cache.store, args=(f'{URL}/{i}', make_response(body)))
+               for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert (stats['entries'], stats['objects']) == (10, 1)
+    leftovers = [name for _, _, files in os.walk(cache.directory) for name in files if name.endswith('.tmp')]
+    assert leftovers == []
+
+
+def test_eviction_keeps_total_under_limit(cache):
+    cache.max_bytes = 2000
+    for i in range(20):
+        cache.store(f'{URL}/{i}', make_response(os.urandom(300)))
+
+    assert cache.stats()['bytes'] <= 2000
+    assert cache.lookup(f'{URL}/19') is not None
+    assert cache.lookup(f'{URL}/0') is None
@@ -0,0 +1,126 @@
+"""
+后台任务队列测试 - 任务失败、取消及执行后处理失败时的状态与工作线程存活
+"""
+import time
+import pytest
+from app import db
+from app import jobs
+from app.jobs import JobCancelled, JobQueue, job_handler, new_task
+from app.models import CrawlTask
+
+
+@job_handler('test-ok')
+def _ok(ctx):
+    return 3
+
+
+@job_handler('test-fail')
+def _fail(ctx):
+    raise RuntimeError('boom')
+
+
+@job_handler('test-cancel')
+def _cancel(ctx):
+    raise JobCancelled()
+
+
+@pytest.fixture
+def queue(app):
+    queue = JobQueue()
+    queue.init_app(app)
+    queue.workers = 1
+    queue.poll_interval = 0.05
+    return queue
+
+
+def add_task(kind, keyword='kw', priority=0):
+    """直接写入排队任务（enqueue 会启动工作线程）"""
+    task = new_task(kind, keyword, priority=priority)
+    db.session.add(task)
+    db.session.commit()
+    return task
+
+
+def wait_finished(task_ids, timeout=5):
+    """等待任务离开 pending/running 状态，:return: {任务ID: 任务}"""
+    deadline = time.monotonic() + timeout
+    while True:
+        db.session.expire_all()
+        tasks = {task.id: task for task in CrawlTask.query.filter(CrawlTask.id.in_(task_ids))}
+        if all(task.status not in ('pending', 'running') for task in tasks.values()):
+            return tasks
+        if time.monotonic() > deadline:
+            pytest.fail(f'任务未完成: {[(t.id, t.status) for t in tasks.values()]}')
+        time.sleep(0.05)
+
+
+def test_execute_records_final_status(queue):
+    tasks = [add_task(kind) for kind in ('test-ok', 'test-fail', 'test-cancel', 'no-such-kind')]
+    for task in tasks:
+        queue._execute(queue._claim())
+
+    db.session.expire_all()
+    ok, failed, cancelled, unknown = [db.session.get(CrawlTask, task.id) for task in tasks]
+    assert (ok.status, ok.result_count) == ('completed', 3)
+    assert (failed.status, failed.error_msg) == ('failed', 'boom')
+    assert cancelled.status == 'cancelled'
+    assert unknown.status == 'failed' and 'no-such-kind' in unknown.error_msg
+
+
+def test_claim_takes_higher_priority_first(queue):
+    low = add_task('test-ok', 'low', priority=-1)
+    high = add_task('test-ok', 'high', priority=5)
+
+    assert queue._claim().id == high.id
+    assert queue._claim().id == low.id
+    assert queue._claim() is None
+
+
+def test_worker_survives_post_processing_failure(queue, monkeypatch):
+    calls = []
+
+    def record_job(kind, status, elapsed):
+        calls.append(status)
+        if len(calls) == 1:
+            raise RuntimeError('metrics down')
+
+    monkeypatch.setattr(jobs, 'record_job', record_job)
+    ids = [add_task('test-ok').id, add_task('test-ok').id]
+    db.session.remove()
+
+    queue.start()
+    tasks = wait_finished(ids)
+
+    assert (tasks[ids[0]].status, tasks[ids[0]].error_msg) == ('failed', 'metrics down')
+    assert tasks[ids[1]].status == 'completed'
+    assert queue._threads[0].is_alive()
+
+
+def test_testing_config_starts_no_background_threads(app):
+    from app.jobs import queue
+    from app.maintenance import maintenance
+    from app.monitor import monitors
+
+    app.test_client().get('/')
+    queue.notify()
+    assert queue._threads == []
+    assert monitors._thread is None
+    assert maintenance._thread is None
+
+
+@pytest.mark.parametrize('role, sent, stored', [
+    ('user', 5, 0),
+    ('admin', 5, 5),
+    ('admin', 1e9, 10),
+    ('admin', -1e9, -10),
+    ('admin', 'high', 0),
+])
+def test_requested_priority_is_validated(app, role, sent, stored):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+        session['role'] = role
+
+    response = client.post('/api/crawl', json={'keyword': 'kw', 'priority': sent})
+    task = db.session.get(CrawlTask, response.get_json()['data']['task_id'])
+    assert task.priority == stored
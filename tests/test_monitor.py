@@ -0,0 +1,109 @@
+"""
+关键词监控测试 - 增量爬取只保存新结果、失败记录与退避、调度领取
+"""
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app import tasks
+from app.crawler import SearchCrawler
+from app.jobs import JobCancelled, JobContext, new_task
+from app.monitor import monitors
+from app.models import CrawlTask, MonitoredKeyword, SearchResult
+
+
+def page_of(links):
+    return [{'title': f'标题{i}', 'link': link, 'abstract': '', 'source': 'baidu', 'engine': 'baidu'}
+            for i, link in enumerate(links)]
+
+
+@pytest.fixture
+def monitor(app):
+    monitors.register(['监控词'], engine='baidu', max_pages=3, interval=600)
+    db.session.commit()
+    return MonitoredKeyword.query.one()
+
+
+def run(monitor):
+    task = new_task('monitor', monitor.keyword, monitor.engine, monitor.max_pages, payload={'monitor_id': monitor.id})
+    db.session.add(task)
+    db.session.commit()
+    return tasks.run_monitor(JobContext(task))
+
+
+def test_second_run_stops_at_known_page(monitor, monkeypatch):
+    pages = {0: page_of([f'http://a.com/{i}' for i in range(5)]),
+             1: page_of([f'http://a.com/{i}' for i in range(5, 10)])}
+    fetched = []
+
+    def fetch(self, keyword, page):
+        fetched.append(page)
+        return pages.get(page, [])
+
+    monkeypatch.setattr(SearchCrawler, 'fetch_baidu_page', fetch)
+    assert run(monitor) == 10
+    assert fetched == [0, 1, 2]
+
+    fetched.clear()
+    pages[0] = page_of(['http://a.com/new'] + [f'http://a.com/{i}' for i in range(5)])
+    assert run(monitor) == 1
+    assert fetched == [0]
+    db.session.expire_all()
+    assert (monitor.last_pages, monitor.last_new_count, monitor.failures) == (1, 1, 0)
+
+
+def test_results_without_link_are_all_kept(monitor, monkeypatch):
+    monkeypatch.setattr(SearchCrawler, 'fetch_baidu_page',
+                        lambda self, keyword, page: page_of(['', '', 'http://a.com/1']) if page == 0 else [])
+
+    assert run(monitor) == 3
+    assert SearchResult.query.count() == 3
+
+
+def test_failed_run_is_recorded_and_backed_off(monitor, monkeypatch):
+    def fetch(self, keyword, page):
+        raise RuntimeError('engine down')
+
+    monkeypatch.setattr(SearchCrawler, 'fetch_baidu_page', fetch)
+    for failures in (1, 2):
+        before = datetime.utcnow()
+        with pytest.raises(RuntimeError):
+            run(monitor)
+        db.session.expire_all()
+        assert monitor.failures == failures
+        assert monitor.last_error == 'engine down'
+        assert monitor.last_run_at >= before
+        # 间隔按连续失败次数成倍推迟（含 10% 抖动）
+        assert monitor.next_run_at >= before + timedelta(seconds=600 * 2 ** failures * 0.9)
+
+
+def test_tick_claims_due_keywords_once(monitor, monkeypatch):
+    from app.jobs import queue
+
+    # 只检查入队，不启动工作线程
+    monkeypatch.setattr(queue, 'notify', lambda: None)
+    later = datetime.utcnow() + timedelta(hours=1)
+
+    assert monitors.tick(later) == 1
+    db.session.commit()
+    assert monitors.tick(later) == 0
+    db.session.expire_all()
+    assert CrawlTask.query.filter_by(kind='monitor').count() == 1
+    assert monitor.next_run_at > later
+
+
+def test_cancelled_run_keeps_previous_state(monitor, monkeypatch):
+    def fetch(self, keyword, page):
+        raise RuntimeError('engine down')
+
+    monkeypatch.setattr(SearchCrawler, 'fetch_baidu_page', fetch)
+    with pytest.raises(RuntimeError):
+        run(monitor)
+    db.session.expire_all()
+    state = (monitor.failures, monitor.last_error, monitor.last_run_at)
+
+    monkeypatch.setattr(SearchCrawler, 'fetch_baidu_page', lambda self, keyword, page: page_of(['http://a.com/1']))
+    monkeypatch.setattr(JobContext, 'cancelled', lambda self: True)
+    with pytest.raises(JobCancelled):
+        run(monitor)
+    db.session.expire_all()
+    assert (monitor.failures, monitor.last_error, monitor.last_run_at) == state
@@ -0,0 +1,72 @@
+"""
+分页测试 - 游标分页、页码书签（含切换每页条数）与总数缓存
+"""
+import time
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app.models import SearchResult
+from app.pagination import bookmarks, count_cache, keyset_paginate
+
+COLUMNS = [SearchResult.crawl_time, SearchResult.id]
+KEY = ('search_results', 'test')
+
+
+@pytest.fixture
+def rows(app):
+    """100 行，按 crawl_time 降序时第 n 行的标题为 row-n（从 1 开始）"""
+    count_cache._values.clear()
+    bookmarks._lists.clear()
+    start = datetime(2024, 1, 1)
+    for i in range(100):
+        db.session.add(SearchResult(keyword='k', title=f'row-{100 - i}', link=f'http://a.com/{i}',
+                                    crawl_time=start + timedelta(minutes=i)))
+    db.session.commit()
+
+
+def titles(page, limit, cursor=None):
+    result = keyset_paginate(SearchResult.query, COLUMNS, page, limit, cursor=cursor, key=KEY)
+    return [row.title for row in result['items']], result
+
+
+def expected(first, last):
+    return [f'row-{n}' for n in range(first, last + 1)]
+
+
+def test_sequential_pages_and_cursor(rows):
+    page1, result = titles(1, 10)
+    assert page1 == expected(1, 10)
+    assert titles(2, 10)[0] == expected(11, 20)
+    assert titles(1, 10, cursor=result['next_cursor'])[0] == expected(11, 20)
+
+
+def test_jump_to_far_page(rows):
+    assert titles(7, 10)[0] == expected(61, 70)
+    assert titles(10, 10)[0] == expected(91, 100)
+    assert titles(11, 10)[0] == []
+
+
+def test_changing_page_size_uses_own_bookmarks(rows):
+    for page in range(1, 5):
+        titles(page, 10)
+
+    assert titles(3, 20)[0] == expected(41, 60)
+    assert titles(2, 20)[0] == expected(21, 40)
+    assert titles(5, 10)[0] == expected(41, 50)
+
+
+def test_count_is_cached_until_ttl(rows, monkeypatch):
+    assert titles(1, 10)[1]['total'] == 100
+
+    db.session.add(SearchResult(keyword='k', title='row-0', link='http://a.com/new', crawl_time=datetime(2025, 1, 1)))
+    db.session.commit()
+    assert titles(1, 10)[1]['total'] == 100
+
+    # 过期后先返回旧值，后台刷新完成后返回新值
+    monkeypatch.setattr(count_cache, 'ttl', 0)
+    assert titles(1, 10)[1]['total'] == 100
+    deadline = time.monotonic() + 5
+    while count_cache._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    monkeypatch.setattr(count_cache, 'ttl', 60)
+    assert titles(1, 10)[1]['total'] == 101